@@ -0,0 +1,71 @@
+"""
+Item analysis of the training dataset or of assessment export files
+Run this script from the project root directory
+
+    python analyze_items.py                                     # the training dataset
+    python analyze_items.py assessments.parquet older.csv --json items.json
+
+Counts every file's respondents x questions option matrix at once and
+reports, per question, the p-value (share of full marks), the point-biserial
+discrimination and the flags of GET /api/analytics/items. Export files are
+read through their answers column.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+
+from config.settings import settings
+from src.core.item_analysis import add_counts, answer_key_from_sheet, count_items, empty_counts, frame_answers, \
+    item_statistics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('files', nargs='*', help="CSV or Parquet files; the training dataset when omitted")
+    parser.add_argument('--json', dest='json_output', help="also write the full statistics to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        answer_key = answer_key_from_sheet(settings.get_absolute_path(settings.ANSWER_SHEET_PATH))
+    except FileNotFoundError as e:
+        print(f"❌ Answer sheet not found: {e}")
+        return 1
+
+    files = [Path(f) for f in args.files] or [settings.get_absolute_path(settings.MOBILE_APP_PERMISSION_CSV)]
+    counts = empty_counts(answer_key)
+    for path in files:
+        try:
+            frame = pd.read_parquet(path) if path.suffix.lower() == '.parquet' else pd.read_csv(path)
+        except (OSError, ImportError, ValueError) as e:
+            print(f"❌ Could not read {path}: {e}")
+            return 1
+        add_counts(counts, count_items(answer_key, frame_answers(answer_key, frame)))
+        print(f"📁 {path}: {len(frame)} responses")
+
+    statistics = item_statistics(answer_key, counts)
+    print(f"\n{'Question':<10} {'n':>7} {'p':>7} {'r_pb':>7}  Flags")
+    for item in statistics['questions']:
+        p_value = '-' if item['p_value'] is None else f"{item['p_value']:.3f}"
+        point_biserial = '-' if item['point_biserial'] is None else f"{item['point_biserial']:.3f}"
+        flags = f"⚠️ {', '.join(item['flags'])}" if item['flags'] else ''
+        print(f"{item['question_id']:<10} {item['responses']:>7} {p_value:>7} {point_biserial:>7}  {flags}")
+
+    flagged = sum(1 for item in statistics['questions'] if item['flags'])
+    print(f"\n✅ Analyzed {statistics['total_questions']} questions, {flagged} flagged")
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(statistics, f, indent=2, ensure_ascii=False)
+        print(f"📁 Statistics written to {args.json_output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,6 +27,26 @@ class Settings(BaseSettings):
     
     # MongoDB Configuration
     MONGO_URI: str = "mongodb://localhost:27017/gamification?replicaSet=rs0"
+    MONGO_COLLECTION: str = "appperm_assessments"
+    MONGO_ROLLUP_COLLECTION: str = "appperm_assessment_rollups"
+    MONGO_LEADERBOARD_COLLECTION: str = "appperm_leaderboard"
+    MONGO_ITEM_ROLLUP_COLLECTION: str = "appperm_item_rollups"
+    
+    # MongoDB Circuit Breaker (writes spool to MONGO_FALLBACK_PATH while it is open)
+    MONGO_BREAKER_WINDOW: int = 20
+    MONGO_BREAKER_MIN_CALLS: int = 5
+    MONGO_BREAKER_FAILURE_RATE: float = 0.5
+    MONGO_BREAKER_SLOW_CALL_MS: float = 2000
+    MONGO_BREAKER_SLOW_CALL_RATE: float = 0.8
+    MONGO_BREAKER_OPEN_SECONDS: float = 30
+    MONGO_BREAKER_HALF_OPEN_PROBES: int = 2
+    MONGO_FALLBACK_PATH: str = "data/pending_assessments.jsonl"
+    MONGO_READ_CACHE_TTL_SECONDS: float = 600
+    
+    # MongoDB fault-injection stand-in for testing the breaker (never enable in production)
+    MONGO_FAULT_INJECTION: bool = False
+    MONGO_FAULT_ERROR_RATE: float = 0.0
+    MONGO_FAULT_LATENCY_MS: float = 0
     
     # Model Files
     MODEL_PATH: str = "models/app_permissions_model.pkl"
@@ -36,9 +56,79 @@ class Settings(BaseSettings):
     # Data Files
     ANSWER_SHEET_PATH: str = "data/answer_sheetappper.json"
     EXPLANATION_BANK_PATH: str = "data/ExplanationBankappper.json"
+    EXPLANATION_STORE_PATH: str = "data/ExplanationBankappper.bin"
     ASSESSMENT_DB_PATH: str = "data/app_permissions_assessment_database.json"
     ASSESSMENT_RESULTS_PATH: str = "data/app_permissions_assessment_results.json"
     
+    # Batch Assessment
+    BATCH_MAX_SUBMISSIONS: int = 5000
+    BATCH_CHUNK_SIZE: int = 500
+    UPLOAD_CHUNK_ROWS: int = 1000
+    
+    # Worker Pool (CPU-bound and blocking work off the event loop)
+    WORKER_THREADS: int = 8
+    WORKER_PROCESSES: int = 0
+    
+    # Event Loop Monitor
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: float = 100
+    LOOP_MONITOR_THRESHOLD_MS: float = 250
+    
+    # Admission Control (assessment endpoints; 0 in-flight disables it)
+    ADMISSION_MAX_IN_FLIGHT: int = 16
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_QUEUE_TIMEOUT_MS: float = 2000
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    
+    # Request Deadline (per-request budget for /api/assess; 0 disables it)
+    REQUEST_DEADLINE_MS: float = 1500
+    REQUEST_DEADLINE_MAX_MS: float = 10000
+    DEFERRED_DRAIN_SECONDS: float = 10
+    
+    # Idempotent Submissions (Idempotency-Key header, or profile + answers within a time window)
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_WINDOW_SECONDS: float = 60
+    IDEMPOTENCY_TTL_SECONDS: float = 600
+    
+    # Statistics (/api/stats is recomputed by MongoDB at most once per TTL)
+    STATS_CACHE_TTL_SECONDS: float = 30
+    
+    # Percentile Ranks (in-memory score histograms, resynced from the statistics rollups)
+    PERCENTILE_SYNC_SECONDS: float = 300
+    PERCENTILE_MIN_SAMPLE: int = 10
+    PERCENTILE_SNAPSHOT_PATH: str = "data/score_distribution.json"
+    
+    # Leaderboard (latest score per user; the top k of recently read organizations stay in memory)
+    LEADERBOARD_TOP_K: int = 100
+    LEADERBOARD_CACHE_ORGANIZATIONS: int = 1000
+    LEADERBOARD_CACHE_TTL_SECONDS: float = 30
+    
+    # User History (keyset-paginated through the email + created_at index)
+    HISTORY_MAX_PAGE_SIZE: int = 100
+    
+    # Exports (server-side cursor batch; rows per CSV block / Parquet row group)
+    EXPORT_BATCH_SIZE: int = 1000
+    EXPORT_CHUNK_ROWS: int = 5000
+    
+    # Archive (archive_assessments.py moves older assessments to Parquet segments; history and exports read them too)
+    ARCHIVE_DIR: str = "data/archive"
+    ARCHIVE_AFTER_DAYS: int = 180
+    ARCHIVE_SEGMENT_ROWS: int = 100000
+    ARCHIVE_ROW_GROUP_ROWS: int = 10000
+    
+    # Item Analysis (GET /api/analytics/items is recomputed at most once per TTL)
+    ITEM_ANALYSIS_CACHE_TTL_SECONDS: float = 300
+    
+    # Caching (in-memory LRU tier + shared SQLite disk tier)
+    CACHE_NAMESPACE: str = "app-permissions"
+    CACHE_MEMORY_MAX_ENTRIES: int = 10000
+    CACHE_DISK_ENABLED: bool = True
+    CACHE_DISK_PATH: str = "data/assessment_cache.sqlite3"
+    CACHE_DISK_MAX_MB: int = 256
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 10000
+    RESULT_CACHE_TTL_SECONDS: float = 3600
+    
     # Dataset
     MOBILE_APP_PERMISSION_CSV: str = "data/mobile_app_permission.csv"
     
@@ -0,0 +1,56 @@
+"""
+Create the MongoDB indexes of the assessment collection and check the read paths use them
+Run this script from the project root directory
+
+    python migrate_indexes.py           # create missing indexes (the service also does this at startup)
+    python migrate_indexes.py --check   # then explain() every read query shape; exit 1 on a collection scan
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from pymongo import MongoClient
+
+from config.settings import settings
+from src.core.indexes import ensure_indexes, explain_query_shapes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--check', action='store_true', help="explain() each read query shape")
+    args = parser.parse_args()
+
+    # Talk to MongoDB directly: no circuit breaker or fault injection for a migration
+    client = MongoClient(settings.MONGO_URI)
+    collection = client.get_default_database()[settings.MONGO_COLLECTION]
+    try:
+        client.admin.command('ping')
+    except Exception as e:
+        print(f"❌ MongoDB not reachable: {e}")
+        return 1
+
+    print(f"📁 Collection: {collection.full_name}")
+    for name in ensure_indexes(collection):
+        print(f"✅ Index {name}")
+
+    if not args.check:
+        return 0
+
+    failed = 0
+    for shape, plan in explain_query_shapes(collection).items():
+        if not plan['uses_index']:
+            failed += 1
+            print(f"❌ {shape}: {' <- '.join(plan['stages'])} (no index)")
+        else:
+            sort_note = " + in-memory sort" if plan['in_memory_sort'] else ""
+            print(f"✅ {shape}: {', '.join(plan['indexes'])}{sort_note}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -41,15 +41,15 @@ class RequestLoggerMiddleware(BaseHTTPMiddleware):
         
         # Store request body for logging (if applicable)
         request_body = None
-        if method in ["POST", "PUT", "PATCH"]:
+        # Only JSON bodies are captured - uploads are streamed by their handlers
+        content_type = request.headers.get("content-type", "")
+        if method in ["POST", "PUT", "PATCH"] and "json" in content_type:
             try:
+                # BaseHTTPMiddleware caches the body and replays it to the route handler,
+                # so the receive channel is left untouched (streaming responses rely on it)
                 body = await request.body()
                 if body:
                     request_body = body.decode('utf-8')
-                    # Store it back for the actual route handler
-                    async def receive() -> Message:
-                        return {"type": "http.request", "body": body}
-                    request._receive = receive
             except Exception:
                 pass
         
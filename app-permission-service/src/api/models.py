@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Literal, Union
 from datetime import datetime
 
 
@@ -53,6 +53,15 @@ class QuestionFeedback(BaseModel):
     enhancement_advice: str
 
 
+class PreviousAttempt(BaseModel):
+    """The user's latest attempt saved before this one"""
+    assessment_id: str
+    total_score: int
+    percentage: float
+    overall_knowledge_level: Optional[str] = None
+    assessed_at: str
+
+
 class AssessmentResult(BaseModel):
     """Complete assessment result with ML-based predictions"""
     timestamp: str
@@ -62,16 +71,75 @@ class AssessmentResult(BaseModel):
     percentage: float
     overall_knowledge_level: str
     detailed_feedback: List[QuestionFeedback]
-    ml_awareness_level: Optional[str] = None
+    ml_awareness_level: Optional[str] = Field(
+        None, description="ML awareness level, or 'pending' while inference finishes in the background"
+    )
     ml_confidence: Optional[float] = None
     ml_recommendations: Optional[List[str]] = None
-    saved_to_database: bool
+    percentile_rank: Optional[float] = Field(
+        None, description="Percentage of saved assessments in this category that scored below this one"
+    )
+    previous_attempt: Optional[PreviousAttempt] = None
+    improvement: Optional[float] = Field(
+        None, description="Percentage points gained over the previous attempt"
+    )
+    saved_to_database: Union[bool, Literal["deferred"]] = Field(
+        ..., description="'deferred' while the save finishes in the background"
+    )
     message: str
 
 
+class BatchAssessmentResult(BaseModel):
+    """Results for a batch of assessment submissions"""
+    total_submissions: int
+    saved_count: int
+    results: List[AssessmentResult]
+
+
+class CompactAssessmentSubmission(BaseModel):
+    """Index-based assessment submission: question ids and option indices instead of texts"""
+    question_set_version: Optional[str] = Field(
+        None, description="X-Question-Set-Version returned by /api/questions"
+    )
+    user_profile: UserProfile
+    question_ids: List[str]
+    option_indices: List[int]
+
+
+class CompactQuestionFeedback(BaseModel):
+    """Feedback for a single question, referencing question and option texts by id and index"""
+    question_id: str
+    option_index: int
+    score: int
+    max_score: int
+    level: str
+    explanation: str
+    enhancement_advice: str
+
+
+class CompactAssessmentResult(BaseModel):
+    """Assessment result without the echoed profile and question/option texts"""
+    question_set_version: str
+    timestamp: str
+    email: str
+    total_score: int
+    max_score: int
+    percentage: float
+    overall_knowledge_level: str
+    feedback: List[CompactQuestionFeedback]
+    ml_awareness_level: Optional[str] = None
+    ml_confidence: Optional[float] = None
+    ml_recommendations: Optional[List[str]] = None
+    percentile_rank: Optional[float] = None
+    previous_attempt: Optional[PreviousAttempt] = None
+    improvement: Optional[float] = None
+    saved_to_database: Union[bool, Literal["deferred"]]
+
+
 class HealthCheck(BaseModel):
     """API health check response"""
     status: str
     timestamp: str
     model_loaded: bool
     components_status: Dict[str, bool]
+    database_circuit: Optional[str] = Field(None, description="MongoDB circuit breaker state")
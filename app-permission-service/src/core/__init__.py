@@ -1,4 +1,8 @@
 """Core business logic and services"""
 from .service import ModelService, model_service
+from .content_store import ExplanationStore, compile_explanation_bank, open_explanation_store
 
-__all__ = ["ModelService", "model_service"]
+__all__ = [
+    "ModelService", "model_service",
+    "ExplanationStore", "compile_explanation_bank", "open_explanation_store"
+]
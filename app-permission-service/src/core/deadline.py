@@ -0,0 +1,117 @@
+"""
+Per-request deadline budget and deferred background work
+
+Every assessment request gets a time budget, from settings or tightened or
+extended (up to a cap) by the client's X-Request-Deadline-Ms header, and the
+clock starts before the request waits for admission. Optional stages - ML
+inference and the MongoDB write - are only waited on for whatever budget is
+left. A stage that overruns is not cancelled: it is handed to the deferred
+work tracker and finishes in the background, while the response goes out
+with the rule-based score and the stage marked as pending / deferred. That
+bounds the tail latency of /api/assess by the budget instead of by the
+slowest dependency.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional, Set, Tuple
+
+from config.settings import settings
+
+ML_PENDING = "pending"
+SAVE_DEFERRED = "deferred"
+
+
+class Deadline:
+    """Monotonic time budget for one request; a budget of 0 means no deadline"""
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = max(0.0, budget_ms)
+        self.started = time.monotonic()
+
+    @classmethod
+    def for_request(cls, requested_ms: Optional[float] = None) -> "Deadline":
+        """Settings budget, overridden by a positive client value capped at REQUEST_DEADLINE_MAX_MS"""
+        budget_ms = settings.REQUEST_DEADLINE_MS
+        if requested_ms is not None and requested_ms > 0:
+            budget_ms = min(requested_ms, settings.REQUEST_DEADLINE_MAX_MS)
+        return cls(budget_ms)
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_ms > 0
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.started) * 1000
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a deadline"""
+        if not self.enabled:
+            return None
+        return max(0.0, self.budget_ms / 1000 - (time.monotonic() - self.started))
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    async def run(self, stage: Awaitable) -> Tuple[bool, Any]:
+        """
+        Await a stage for at most the remaining budget.
+
+        Returns ``(True, result)`` when it finished in time, otherwise
+        ``(False, task)`` with the still-running task so the caller can
+        defer it; the stage itself is never cancelled by the deadline.
+        """
+        task = asyncio.ensure_future(stage)
+        try:
+            return True, await asyncio.wait_for(asyncio.shield(task), self.remaining())
+        except asyncio.TimeoutError:
+            return False, task
+
+
+class DeferredWork:
+    """Keeps background continuations alive, counts them and drains them on shutdown"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self.deferred: Dict[str, int] = {}
+        self.completed = 0
+        self.failed = 0
+
+    def defer(self, kind: str, work: Awaitable) -> asyncio.Task:
+        task = asyncio.ensure_future(work)
+        self.deferred[kind] = self.deferred.get(kind, 0) + 1
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled() or task.exception() is not None:
+            self.failed += 1
+            if not task.cancelled():
+                print(f"❌ Deferred assessment work failed: {task.exception()}")
+        else:
+            self.completed += 1
+
+    async def drain(self, timeout: float):
+        """Give in-flight deferred work a chance to finish before shutdown"""
+        if not self._tasks:
+            return
+        print(f"⏳ Waiting for {len(self._tasks)} deferred assessment tasks...")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            print(f"⚠️ {len(pending)} deferred assessment tasks did not finish before shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'budget_ms': settings.REQUEST_DEADLINE_MS,
+            'max_budget_ms': settings.REQUEST_DEADLINE_MAX_MS,
+            'in_progress': len(self._tasks),
+            'deferred': dict(self.deferred),
+            'completed': self.completed,
+            'failed': self.failed,
+        }
+
+
+# Global tracker for work deferred past a request's deadline
+deferred_work = DeferredWork()
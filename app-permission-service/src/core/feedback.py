@@ -0,0 +1,95 @@
+"""
+Compact persisted form of the per-question feedback
+
+Stored assessments used to be meant to carry the full feedback list, whose
+personalized explanation and advice strings are identical across thousands
+of users and make up nearly all of a document. A stored assessment instead
+keeps, per question, only what the texts are derived from:
+
+    {'q': question id, 'o': option index, 's': score, 'l': level, 'e': explanation key}
+
+next to the versions of the explanation bank (``bank``) and answer sheet
+(``key``) it was graded against. The explanation key is the option letter
+the bank is keyed on together with the question id; the profile part of the
+bank key is the document's own user_profile. Texts are rehydrated on read
+through the explanation index, so they cost nothing to store. Feedback saved
+under an older bank is rehydrated from the current one - the only bank a
+service has loaded.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.core.answer_key import AnswerKey
+
+
+def compact_feedback(answer_key: AnswerKey, bank_version: str, answers: Sequence,
+                     grades: Iterable[Tuple[int, str]],
+                     resolved: Optional[Iterable[Tuple[int, int]]] = None) -> Dict[str, Any]:
+    """
+    Compact feedback of graded answers.
+
+    ``answers`` are the submitted UserAnswers, ``grades`` their (score, level)
+    and ``resolved`` their answer sheet (row, col), resolved here when omitted.
+    Answers that did not resolve keep their submitted texts, the answer sheet
+    cannot rehydrate them.
+    """
+    if resolved is None:
+        resolved = [answer_key.resolve(answer.question_id, answer.question_text,
+                                       answer.selected_option_index, answer.selected_option)
+                    for answer in answers]
+    items = []
+    for answer, (score, level), (row, col) in zip(answers, grades, resolved):
+        row, col = int(row), int(col)
+        item = {
+            'q': answer_key.question_id_for(row, answer.question_id),
+            'o': col if row >= 0 and col >= 0 else answer.selected_option_index,
+            's': int(score),
+            'l': level,
+            'e': answer_key.option_label(row, col, answer.selected_option_index),
+        }
+        if row < 0 or col < 0:
+            item['t'] = [answer.question_text, answer.selected_option]
+        items.append(item)
+    return {'bank': bank_version, 'key': answer_key.version, 'items': items}
+
+
+def rehydrate_feedback(compact: Dict[str, Any], user_profile: Dict, answer_key: AnswerKey,
+                       explain: Callable[[str, str, Dict], str],
+                       advise: Callable[[str, str], str]) -> List[Dict[str, Any]]:
+    """Full per-question feedback of a compact form, with ``explain`` and ``advise`` supplying the texts"""
+    feedback = []
+    for item in compact.get('items') or []:
+        if 't' in item:
+            question_text, selected_option = item['t']
+        else:
+            # Resolved by id, so feedback saved under an older answer sheet still finds its question
+            row = answer_key.row_for(item['q'])
+            col = item['o'] if row >= 0 and 0 <= item['o'] < answer_key.option_counts[row] else -1
+            question_text = answer_key.question_texts[row] if row >= 0 else ''
+            selected_option = answer_key.option_text(row, col)
+        feedback.append({
+            'question_id': item['q'],
+            'question_text': question_text,
+            'selected_option': selected_option,
+            'score': item['s'],
+            'level': item['l'],
+            'explanation': explain(item['q'], item['e'], user_profile),
+            'enhancement_advice': advise(question_text, item['l']),
+        })
+    return feedback
+
+
+def encode_answers(compact: Optional[Dict[str, Any]]) -> Optional[str]:
+    """The chosen options of a compact feedback as text, ``Q1=0;Q2=3``, for export files"""
+    if not compact:
+        return None
+    return ';'.join(f"{item['q']}={item['o']}" for item in compact.get('items') or [])
+
+
+def decode_answers(answers: str) -> List[Tuple[str, int]]:
+    """``(question id, option index)`` pairs of an encode_answers text; malformed pairs are skipped"""
+    pairs = []
+    for pair in (answers or '').split(';'):
+        question_id, _, option_index = pair.partition('=')
+        if question_id and option_index.lstrip('-').isdigit():
+            pairs.append((question_id, int(option_index)))
+    return pairs
@@ -90,48 +90,36 @@ def check_files():
 
 def view_assessment_database():
     """View and analyze the assessment database"""
-    database_file = 'app_permissions_assessment_database.json'
+    from app_permissions_assessment_store import AssessmentStore
 
     try:
-        with open(database_file, 'r', encoding='utf-8') as f:
-            database = json.load(f)
+        with AssessmentStore() as store:
+            stats = store.stats()
+            recent_assessments = store.history(limit=5)
 
-        assessments = database.get('assessments', [])
-
-        if not assessments:
-            print("📊 No assessments found in database.")
+        if not stats['total']:
+            print("📊 No assessments found in database. Take an assessment first!")
             return
 
         print(f"\n📊 ASSESSMENT DATABASE SUMMARY")
         print("=" * 60)
-        print(f"Total Assessments: {len(assessments)}")
-        print(
-            f"Database Created: {database.get('metadata', {}).get('created', 'Unknown')}")
+        print(f"Total Assessments: {stats['total']}")
+        print(f"Database: {store.path}")
 
         # Statistics
-        scores = [a['percentage'] for a in assessments]
-        levels = [a['overall_knowledge_level'] for a in assessments]
-
         print(f"\nSCORE STATISTICS:")
-        print(f"Average Score: {sum(scores)/len(scores):.1f}%")
-        print(f"Highest Score: {max(scores):.1f}%")
-        print(f"Lowest Score: {min(scores):.1f}%")
+        print(f"Average Score: {stats['average']:.1f}%")
+        print(f"Highest Score: {stats['highest']:.1f}%")
+        print(f"Lowest Score: {stats['lowest']:.1f}%")
 
         print(f"\nKNOWLEDGE LEVEL DISTRIBUTION:")
-        level_counts = {}
-        for level in levels:
-            level_counts[level] = level_counts.get(level, 0) + 1
-
-        for level, count in sorted(level_counts.items()):
+        for level, count in stats['levels'].items():
             print(f"  {level}: {count} users")
 
         print(f"\nRECENT ASSESSMENTS:")
         print("-" * 40)
 
         # Show last 5 assessments
-        recent_assessments = sorted(
-            assessments, key=lambda x: x['timestamp'], reverse=True)[:5]
-
         for i, assessment in enumerate(recent_assessments, 1):
             email_or_name = assessment.get(
                 'email', assessment.get('name', 'Unknown'))
@@ -143,8 +131,6 @@ def view_assessment_database():
                 f"   Profile: {assessment['gender']}, {assessment['education_level']}, {assessment['proficiency']}")
             print()
 
-    except FileNotFoundError:
-        print("📊 No assessment database found. Take an assessment first!")
     except Exception as e:
         print(f"❌ Error reading database: {e}")
 
@@ -167,6 +153,8 @@ def main():
         from app_permissions_model_trainer import AppPermissionsModelTrainer
         from app_permissions_user_tester import AppPermissionsTester
         from app_permissions_educational_resources import AppPermissionsEducationalManager
+        from app_permissions_assessment_store import AssessmentStore, remove_legacy_database
+        from app_permissions_result_log import compact_logs
     except ImportError as e:
         print(f"❌ Import error: {e}")
         traceback.print_exc()
@@ -247,22 +235,12 @@ def main():
                 print("❌ Email is required. Returning to menu.")
                 continue
 
-            database_file = 'app_permissions_assessment_database.json'
             existing_assessment = None
-            if os.path.exists(database_file):
-                try:
-                    with open(database_file, 'r', encoding='utf-8') as f:
-                        database = json.load(f)
-                    assessments = database.get('assessments', [])
-                    # Filter by email and sort by timestamp descending to get latest
-                    user_assessments = [a for a in assessments if a.get(
-                        'email', '').lower() == email]
-                    if user_assessments:
-                        user_assessments.sort(
-                            key=lambda x: x['timestamp'], reverse=True)
-                        existing_assessment = user_assessments[0]  # Latest one
-                except Exception as e:
-                    print(f"❌ Error checking database: {e}")
+            try:
+                with AssessmentStore() as store:
+                    existing_assessment = store.latest(email)
+            except Exception as e:
+                print(f"❌ Error checking database: {e}")
 
             # Initialize tester
             try:
@@ -451,9 +429,10 @@ def main():
             print("\nDatabase Options:")
             print("A. Export database to CSV")
             print("B. Clear database")
-            print("C. Return to main menu")
+            print("C. Compact the results log (rewrites the legacy results JSON file)")
+            print("D. Return to main menu")
 
-            sub_choice = input("\nEnter your choice (A/B/C): ").strip().upper()
+            sub_choice = input("\nEnter your choice (A/B/C/D): ").strip().upper()
 
             if sub_choice == 'A':
                 try:
@@ -465,12 +444,18 @@ def main():
                     "⚠️ Are you sure you want to clear all assessment data? (yes/no): ")
                 if confirm.lower() == 'yes':
                     try:
-                        os.remove('app_permissions_assessment_database.json')
+                        with AssessmentStore() as store:
+                            store.clear()
+                        # The legacy files would otherwise be imported again with --force
+                        remove_legacy_database()
                         print("✅ Database cleared successfully!")
-                    except FileNotFoundError:
-                        print("ℹ️ Database was already empty.")
                     except Exception as e:
                         print(f"❌ Error clearing database: {e}")
+            elif sub_choice == 'C':
+                try:
+                    compact_logs()
+                except Exception as e:
+                    print(f"❌ Error compacting: {e}")
 
         elif choice == '8':
             print(
@@ -486,42 +471,39 @@ def export_database_to_csv():
     """Export assessment database to CSV format"""
     import csv
     import datetime
+    from app_permissions_assessment_store import AssessmentStore
 
     try:
-        with open('app_permissions_assessment_database.json', 'r', encoding='utf-8') as f:
-            database = json.load(f)
-
-        assessments = database.get('assessments', [])
-
-        if not assessments:
-            print("📊 No data to export.")
-            return
-
-        csv_filename = f"app_permissions_assessments_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-
-        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = [
-                'Timestamp', 'Email', 'Gender', 'Education_Level', 'Proficiency',
-                'Total_Score', 'Percentage', 'Overall_Knowledge_Level', 'Category'
-            ]
-
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for assessment in assessments:
-                email_or_name = assessment.get(
-                    'email', assessment.get('name', ''))
-                writer.writerow({
-                    'Timestamp': assessment['timestamp'],
-                    'Email': email_or_name,
-                    'Gender': assessment['gender'],
-                    'Education_Level': assessment['education_level'],
-                    'Proficiency': assessment['proficiency'],
-                    'Total_Score': assessment['total_score'],
-                    'Percentage': assessment['percentage'],
-                    'Overall_Knowledge_Level': assessment['overall_knowledge_level'],
-                    'Category': assessment['category']
-                })
+        with AssessmentStore() as database:
+            if not database.has_records():
+                print("📊 No data to export.")
+                return
+
+            csv_filename = f"app_permissions_assessments_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+            with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+                fieldnames = [
+                    'Timestamp', 'Email', 'Gender', 'Education_Level', 'Proficiency',
+                    'Total_Score', 'Percentage', 'Overall_Knowledge_Level', 'Category'
+                ]
+
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer.writeheader()
+
+                for assessment in database:
+                    email_or_name = assessment.get(
+                        'email', assessment.get('name', ''))
+                    writer.writerow({
+                        'Timestamp': assessment['timestamp'],
+                        'Email': email_or_name,
+                        'Gender': assessment['gender'],
+                        'Education_Level': assessment['education_level'],
+                        'Proficiency': assessment['proficiency'],
+                        'Total_Score': assessment['total_score'],
+                        'Percentage': assessment['percentage'],
+                        'Overall_Knowledge_Level': assessment['overall_knowledge_level'],
+                        'Category': assessment['category']
+                    })
 
         print(f"✅ Database exported to: {csv_filename}")
 
@@ -530,60 +512,17 @@ def export_database_to_csv():
 
 
 def save_assessment_result(result):
-    """Save the assessment result to the database and file"""
-    database_file = 'app_permissions_assessment_database.json'
-    results_file = 'app_permissions_assessment_results.json'
+    """Save the assessment result to the assessment store and the results log"""
+    from app_permissions_assessment_store import AssessmentStore
+    from app_permissions_result_log import results_file
 
     try:
-        # Load existing database
-        if os.path.exists(database_file):
-            with open(database_file, 'r', encoding='utf-8') as f:
-                database = json.load(f)
-        else:
-            database = {"assessments": [], "metadata": {}}
-
-        # Add new assessment result
-        database['assessments'].append(result)
-
-        # Save back to database file
-        with open(database_file, 'w', encoding='utf-8') as f:
-            json.dump(database, f, ensure_ascii=False, indent=4)
-
+        with AssessmentStore() as store:
+            store.add(result)
         print(f"✅ Assessment result saved to database.")
 
-        # Also save to results file
-        if os.path.exists(results_file):
-            with open(results_file, 'r+', encoding='utf-8') as f:
-                # Lock file for writing
-                fcntl.flock(f, fcntl.LOCK_EX)
-
-                # Load existing results
-                try:
-                    results_data = json.load(f)
-                except json.JSONDecodeError:
-                    results_data = {"assessments": []}
-
-                # Append new result
-                results_data['assessments'].append(result)
-
-                # Move cursor to beginning of file
-                f.seek(0)
-
-                # Truncate file to current size
-                f.truncate()
-
-                # Write updated results
-                json.dump(results_data, f, ensure_ascii=False, indent=4)
-
-                # Unlock file
-                fcntl.flock(f, fcntl.LOCK_UN)
-
-            print(f"✅ Assessment result saved to results file.")
-        else:
-            with open(results_file, 'w', encoding='utf-8') as f:
-                json.dump({"assessments": [result]},
-                          f, ensure_ascii=False, indent=4)
-            print(f"✅ Assessment result saved to new results file.")
+        results_file().append(result)
+        print(f"✅ Assessment result saved to results file.")
 
     except Exception as e:
         print(f"❌ Error saving assessment result: {e}")
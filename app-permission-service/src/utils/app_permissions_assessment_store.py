@@ -0,0 +1,274 @@
+"""
+SQLite store of the assessment CLI's database records
+
+Replaces scanning the assessment database file for every question the CLI
+asks of it. Records live in an embedded SQLite database (WAL mode, so the
+viewer can read while an assessment is being saved) indexed by email,
+organization and timestamp; the leaderboard reads a latest-assessment-per-
+user table kept current on every insert. Leaderboard, history and
+statistics are single indexed queries however many results an offline
+install collects.
+
+The first open imports the legacy database - the JSON Lines log it was
+last kept in, or the JSON file before that - once, reading it only;
+`python app_permissions_assessment_store.py import --force` replaces the
+store's records with it again.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+from app_permissions_result_log import legacy_records, read_log
+
+STORE_FILE = 'app_permissions_assessment_database.sqlite3'
+LEGACY_DATABASE_FILE = 'app_permissions_assessment_database.json'
+LEGACY_DATABASE_LOG = 'app_permissions_assessment_database.jsonl'
+RECORD_FIELDS = ('timestamp', 'email', 'name', 'organization', 'gender', 'education_level', 'proficiency',
+                 'total_score', 'percentage', 'overall_knowledge_level', 'category')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    email TEXT,
+    name TEXT,
+    organization TEXT,
+    gender TEXT,
+    education_level TEXT,
+    proficiency TEXT,
+    total_score INTEGER,
+    percentage REAL,
+    overall_knowledge_level TEXT,
+    category TEXT,
+    email_key TEXT NOT NULL,
+    organization_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_assessments_email ON assessments (email_key, timestamp);
+CREATE INDEX IF NOT EXISTS idx_assessments_organization ON assessments (organization_key, timestamp);
+CREATE INDEX IF NOT EXISTS idx_assessments_timestamp ON assessments (timestamp);
+
+-- Latest assessment of each user (name, else email), as the leaderboard ranks them
+CREATE TABLE IF NOT EXISTS latest_assessments (
+    user_key TEXT PRIMARY KEY,
+    assessment_id INTEGER NOT NULL,
+    organization_key TEXT NOT NULL,
+    percentage REAL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_latest_organization ON latest_assessments (organization_key, percentage DESC);
+CREATE INDEX IF NOT EXISTS idx_latest_percentage ON latest_assessments (percentage DESC);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _key(value):
+    return (value or '').strip().lower()
+
+
+class AssessmentStore:
+    """Indexed SQLite store of assessment database records"""
+
+    def __init__(self, path=STORE_FILE, import_legacy=True):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if import_legacy and self._meta('legacy_imported') is None:
+            self.import_legacy()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, record):
+        """Insert one record and update its user's latest assessment"""
+        self.add_many([record])
+
+    def add_many(self, records):
+        """Insert records in a single transaction, returning how many were added"""
+        added = 0
+        with self._transaction():
+            for record in records:
+                self._insert(record)
+                added += 1
+        return added
+
+    def _insert(self, record):
+        values = [record.get(field) for field in RECORD_FIELDS]
+        values[0] = values[0] or ''
+        organization_key = _key(record.get('organization'))
+        cursor = self._conn.execute(
+            f"INSERT INTO assessments ({', '.join(RECORD_FIELDS)}, email_key, organization_key)"
+            f" VALUES ({', '.join('?' * len(RECORD_FIELDS))}, ?, ?)",
+            values + [_key(record.get('email')), organization_key]
+        )
+        user_key = _key(record.get('name')) or _key(record.get('email'))
+        if user_key:
+            # Ties on timestamp go to the later insert, as the JSON leaderboard did
+            self._conn.execute(
+                "INSERT INTO latest_assessments (user_key, assessment_id, organization_key, percentage, timestamp)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (user_key) DO UPDATE SET assessment_id = excluded.assessment_id,"
+                " organization_key = excluded.organization_key, percentage = excluded.percentage,"
+                " timestamp = excluded.timestamp WHERE excluded.timestamp >= latest_assessments.timestamp",
+                (user_key, cursor.lastrowid, organization_key, record.get('percentage') or 0, values[0])
+            )
+
+    def has_records(self):
+        return self._conn.execute("SELECT 1 FROM assessments LIMIT 1").fetchone() is not None
+
+    def has_email(self, email):
+        row = self._conn.execute(
+            "SELECT 1 FROM assessments WHERE email_key = ? LIMIT 1", (_key(email),)
+        ).fetchone()
+        return row is not None
+
+    def latest(self, email):
+        """Most recent record of an email, or None"""
+        history = self.history(email, limit=1)
+        return history[0] if history else None
+
+    def history(self, email=None, limit=None):
+        """Records newest first, of one email or of everyone"""
+        query = "SELECT * FROM assessments"
+        params = []
+        if email is not None:
+            query += " WHERE email_key = ?"
+            params.append(_key(email))
+        query += " ORDER BY timestamp DESC, id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [self._record(row) for row in self._conn.execute(query, params)]
+
+    def leaderboard(self, top_n=10, organization=None):
+        """Latest record of each user, best percentage first"""
+        query = ("SELECT a.* FROM latest_assessments l JOIN assessments a ON a.id = l.assessment_id")
+        params = []
+        if organization:
+            query += " WHERE l.organization_key = ?"
+            params.append(_key(organization))
+        query += " ORDER BY l.percentage DESC LIMIT ?"
+        params.append(top_n)
+        return [self._record(row) for row in self._conn.execute(query, params)]
+
+    def stats(self, organization=None):
+        """Count, average, highest and lowest percentage and the knowledge level distribution"""
+        where, params = ("WHERE organization_key = ?", [_key(organization)]) if organization else ("", [])
+        row = self._conn.execute(
+            f"SELECT COUNT(*) AS total, AVG(percentage) AS average, MAX(percentage) AS highest,"
+            f" MIN(percentage) AS lowest FROM assessments {where}", params
+        ).fetchone()
+        levels = self._conn.execute(
+            f"SELECT overall_knowledge_level AS level, COUNT(*) AS count FROM assessments {where}"
+            f" GROUP BY overall_knowledge_level ORDER BY overall_knowledge_level", params
+        )
+        return dict(row, levels={level['level']: level['count'] for level in levels})
+
+    def __iter__(self):
+        """Stream every record in insertion order"""
+        for row in self._conn.execute("SELECT * FROM assessments ORDER BY id"):
+            yield self._record(row)
+
+    def clear(self):
+        with self._transaction():
+            self._conn.execute("DELETE FROM assessments")
+            self._conn.execute("DELETE FROM latest_assessments")
+
+    def import_legacy(self, force=False):
+        """
+        Import the records of the legacy database, once.
+        With ``force`` the store's records are replaced by them even if that was done before.
+        """
+        if not force and self._meta('legacy_imported') is not None:
+            return 0
+        with self._transaction():
+            if force:
+                self._conn.execute("DELETE FROM assessments")
+                self._conn.execute("DELETE FROM latest_assessments")
+            imported = 0
+            for record in legacy_database_records():
+                self._insert(record)
+                imported += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('legacy_imported', ?)", (str(imported),)
+            )
+        if imported:
+            print(f"📥 Imported {imported} legacy database assessments into '{self.path}'")
+        return imported
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _record(row):
+        return {field: row[field] for field in RECORD_FIELDS}
+
+
+def legacy_database_records():
+    """Records of the legacy database: its log if it had one, else the JSON file"""
+    if os.path.exists(LEGACY_DATABASE_LOG):
+        yield from read_log(LEGACY_DATABASE_LOG)
+        return
+    try:
+        with open(LEGACY_DATABASE_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not import '{LEGACY_DATABASE_FILE}': {e}")
+        return
+    yield from legacy_records(data)
+
+
+def remove_legacy_database():
+    """Delete the legacy database files, so an import --force does not bring their records back"""
+    removed = False
+    for path in (LEGACY_DATABASE_LOG, LEGACY_DATABASE_FILE):
+        try:
+            os.remove(path)
+            removed = True
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the assessment store")
+    parser.add_argument('command', choices=['import'],
+                        help="import: load the legacy database file and log into the store")
+    parser.add_argument('--force', action='store_true', help="replace the store's records even if already imported")
+    args = parser.parse_args()
+    with AssessmentStore(import_legacy=False) as store:
+        imported = store.import_legacy(force=args.force)
+        print(f"✅ {imported} assessments imported into '{store.path}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,6 +20,11 @@ try:
 except Exception:
     AppPermissionsTester = None
 
+try:
+    from app_permissions_result_log import results_file
+except Exception:
+    results_file = None
+
 
 class AppPermissionsModelTrainer:
     def __init__(self, dataset_path, answer_sheet_path, assessment_results_path='app_permissions_assessment_results.json'):
@@ -147,6 +152,13 @@ class AppPermissionsModelTrainer:
          - file contains {'results': [...]} list
          - file contains {'assessments': [...]} or other similar shapes
         """
+        # Results saved by the tester are streamed from the log next to the legacy file
+        if results_file is not None and self.assessment_results_path:
+            log = results_file(self.assessment_results_path)
+            if os.path.exists(log.path):
+                print(f"✅ Loading assessment results from log: {log.path}")
+                return self._results_dataframe(log)
+
         # Try the explicitly provided path first
         data = None
         tried_paths = []
@@ -211,8 +223,10 @@ class AppPermissionsModelTrainer:
             return pd.DataFrame()
 
         print(f"Loading {len(results)} assessment results from JSON...")
+        return self._results_dataframe(results)
 
-        # Convert JSON results to DataFrame rows
+    def _results_dataframe(self, results):
+        """Convert an iterable of result dicts to DataFrame rows"""
         rows = []
         for result in results:
             row = {}
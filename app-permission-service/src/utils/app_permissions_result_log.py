@@ -0,0 +1,201 @@
+"""
+Append-only JSON Lines log for the assessment CLI results
+
+The individual results file used to be a JSON document that was loaded,
+extended by one record and rewritten on every save - O(n) per save and
+unsafe with two writers. It is now a log next to the legacy file (same
+name, .jsonl): a save is a single O_APPEND write of one line, so records
+from concurrent writers never interleave, and readers stream records one
+line at a time. A legacy JSON file found without its log is imported once.
+(The assessment database records live in the SQLite store,
+app_permissions_assessment_store.py, which reads the old database files
+itself.) `compact` rewrites the log without torn lines and writes the
+legacy JSON document on demand:
+
+    python app_permissions_result_log.py compact
+"""
+import argparse
+import json
+import os
+import sys
+
+try:
+    import fcntl
+except ImportError:  # Windows: O_APPEND alone keeps appends whole
+    fcntl = None
+
+RESULTS_FILE = 'app_permissions_assessment_results.json'
+
+
+class ResultLog:
+    """Append-only JSON Lines log replacing a legacy JSON results file"""
+
+    def __init__(self, legacy_path, key='results'):
+        self.legacy_path = legacy_path
+        self.path = os.path.splitext(legacy_path)[0] + '.jsonl'
+        self.key = key
+        self.skipped = 0
+
+    def exists(self):
+        return os.path.exists(self.path) or os.path.exists(self.legacy_path)
+
+    def append(self, record):
+        """Append one record with a single O_APPEND write"""
+        self._import_legacy()
+        line = (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                self._lock(fd, shared=True)
+                # A compaction may have replaced the file while we waited for the lock
+                if os.fstat(fd).st_ino != os.stat(self.path).st_ino:
+                    continue
+                written = 0
+                while written < len(line):
+                    written += os.write(fd, line[written:])
+                return
+            except FileNotFoundError:
+                continue
+            finally:
+                os.close(fd)
+
+    def __iter__(self):
+        """Stream the records in the order they were saved"""
+        self._import_legacy()
+        self.skipped = 0
+        yield from read_log(self.path, self)
+
+    def clear(self):
+        """Delete the log and its legacy file"""
+        removed = False
+        for path in (self.path, self.legacy_path):
+            try:
+                os.remove(path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def compact(self):
+        """
+        Rewrite the log without torn or corrupt lines, then write the legacy
+        JSON document from it. Appends wait until the log is swapped.
+        """
+        self._import_legacy()
+        if not os.path.exists(self.path):
+            return {'records': 0, 'dropped': 0}
+        with open(self.path, 'rb') as log:
+            self._lock(log.fileno(), shared=False)
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            records = 0
+            with open(temporary, 'wb') as out:
+                for record in self:
+                    out.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+                    records += 1
+                out.flush()
+                os.fsync(out.fileno())
+            dropped = self.skipped
+            os.replace(temporary, self.path)
+        self._write_legacy()
+        return {'records': records, 'dropped': dropped}
+
+    def _write_legacy(self):
+        # Streamed record by record so compaction never holds the whole log in memory
+        temporary = f"{self.legacy_path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write('{\n')
+            f.write(f'  "{self.key}": [')
+            for position, record in enumerate(self):
+                f.write(',' if position else '')
+                f.write('\n    ' + json.dumps(record, ensure_ascii=False))
+            f.write('\n  ]\n}\n')
+        os.replace(temporary, self.legacy_path)
+
+    def _import_legacy(self):
+        """Move the records of a legacy JSON file into a new log, once"""
+        if os.path.exists(self.path) or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not import '{self.legacy_path}': {e}")
+            return
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            for record in legacy_records(data):
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        try:
+            # link() never overwrites, so a log another process created meanwhile wins
+            os.link(temporary, self.path)
+            print(f"📥 Imported '{self.legacy_path}' into '{self.path}'")
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temporary)
+
+    @staticmethod
+    def _lock(fd, shared):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+
+def read_log(path, counter=None):
+    """
+    Stream the records of a JSON Lines log file, read-only; lines torn by a
+    crash or still being written are skipped and counted on ``counter.skipped``
+    """
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                # A line without its newline is a write still in progress or torn by a crash
+                if not line.endswith(b'\n'):
+                    if counter is not None:
+                        counter.skipped += 1
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    if counter is not None:
+                        counter.skipped += 1
+    except FileNotFoundError:
+        return
+
+
+def legacy_records(data):
+    """Records of any shape the legacy files were written in"""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for key in ('assessments', 'results'):
+            if isinstance(data.get(key), list):
+                return data[key]
+        # A single result, as the first versions of the tester wrote it
+        if data:
+            return [data]
+    return []
+
+
+def results_file(path=RESULTS_FILE):
+    return ResultLog(path, key='results')
+
+
+def compact_logs():
+    """Compact the results log, printing what it kept"""
+    log = results_file()
+    counts = log.compact()
+    print(f"✅ {log.path}: {counts['records']} records, {counts['dropped']} torn lines dropped "
+          f"-> {log.legacy_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the assessment result logs")
+    parser.add_argument('command', choices=['compact'],
+                        help="compact: drop torn lines from the results log and write its legacy JSON file")
+    parser.parse_args()
+    compact_logs()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,8 @@ import os
 import requests
 import re
 from app_permissions_knowledge_enhancer import AppPermissionsKnowledgeEnhancer
+from app_permissions_assessment_store import AssessmentStore
+from app_permissions_result_log import results_file
 
 
 class AppPermissionsTester:
@@ -93,17 +95,12 @@ class AppPermissionsTester:
                 print("Please enter a valid email address!")
                 continue
             # Check uniqueness in database
-            try:
-                with open('app_permissions_assessment_database.json', 'r', encoding='utf-8') as f:
-                    database = json.load(f)
-                existing_emails = [assessment.get('email', assessment.get(
-                    'name', '')).lower() for assessment in database.get('assessments', [])]
-                if email.lower() in existing_emails:
-                    print(
-                        "This email is already registered. Please use a different email!")
-                    continue
-            except FileNotFoundError:
-                pass  # No database yet, allow
+            with AssessmentStore() as store:
+                registered = store.has_email(email)
+            if registered:
+                print(
+                    "This email is already registered. Please use a different email!")
+                continue
             break
 
         # Collect Full Name
@@ -354,11 +351,9 @@ class AppPermissionsTester:
         )
 
     def save_to_assessment_database(self, user_data):
-        """Save assessment results to a structured database file"""
+        """Save assessment results to the assessment store"""
         import datetime
 
-        database_file = 'app_permissions_assessment_database.json'
-
         # Create assessment record (without detailed responses and scores)
         assessment_record = {
             "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -374,31 +369,12 @@ class AppPermissionsTester:
             "category": "App Permissions"
         }
 
-        # Load existing database or create new one
-        try:
-            with open(database_file, 'r', encoding='utf-8') as f:
-                database = json.load(f)
-        except FileNotFoundError:
-            database = {
-                "metadata": {
-                    "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "category": "Mobile App Permissions Security Assessment",
-                    "description": "Assessment results database for app permissions security awareness"
-                },
-                "assessments": []
-            }
-
-        # Add new assessment
-        database["assessments"].append(assessment_record)
-
-        # Save updated database
-        with open(database_file, 'w', encoding='utf-8') as f:
-            json.dump(database, f, indent=2, ensure_ascii=False)
-
-        print(f"📊 Assessment saved to database: {database_file}")
-        print(f"Total assessments in database: {len(database['assessments'])}")
-
-        return database_file
+        with AssessmentStore() as store:
+            store.add(assessment_record)
+
+        print(f"📊 Assessment saved to database: {store.path}")
+
+        return store.path
 
     def provide_feedback(self, user_scores, overall_level, percentage):
         """Provide detailed feedback and recommendations - now returns data instead of printing"""
@@ -500,15 +476,9 @@ Profile: {self.user_profile['gender']}, {self.user_profile['education']}, {self.
     def compare_with_last_score(self):
         """Compare current score with last score from database"""
         try:
-            with open('app_permissions_assessment_database.json', 'r', encoding='utf-8') as f:
-                database = json.load(f)
-            assessments = database.get('assessments', [])
-            user_assessments = [a for a in assessments if a.get(
-                'email', '').lower() == self.user_profile['email'].lower()]
-            if user_assessments:
-                user_assessments.sort(
-                    key=lambda x: x['timestamp'], reverse=True)
-                last_assessment = user_assessments[0]  # Most recent
+            with AssessmentStore() as store:
+                last_assessment = store.latest(self.user_profile['email'])
+            if last_assessment:
                 last_score = last_assessment['percentage']
                 current_score = self.current_percentage
                 diff = current_score - last_score
@@ -529,59 +499,18 @@ Profile: {self.user_profile['gender']}, {self.user_profile['education']}, {self.
         Deduplicate by user (name preferred, fallback to email) and keep only the latest entry.
         """
         try:
-            database_file = 'app_permissions_assessment_database.json'
-            if not os.path.exists(database_file):
-                print("📊 No assessment database found to build leaderboard.")
-                return
-
-            with open(database_file, 'r', encoding='utf-8') as f:
-                database = json.load(f)
-
-            assessments = database.get('assessments', [])
-            if not assessments:
-                print("📊 No assessments available in database.")
-                return
-
-            # Apply organization filter if provided
-            if organization:
-                org_norm = organization.strip().lower()
-                filtered = [a for a in assessments if (
-                    a.get('organization') or '').strip().lower() == org_norm]
-                source = f"Organization '{organization}'"
-            else:
-                filtered = assessments
-                source = "All organizations"
+            # Latest entry per user is kept by the store, so this is one indexed query
+            with AssessmentStore() as store:
+                sorted_assessments = store.leaderboard(top_n, organization)
+            source = f"Organization '{organization}'" if organization else "All organizations"
 
-            if not filtered:
+            if not sorted_assessments:
                 print(f"📊 No assessments found for {source}.")
                 return
 
-            # Deduplicate by user (prefer name, else email) and keep latest by timestamp
-            latest_by_user = {}
-            for a in filtered:
-                name = (a.get('name') or '').strip()
-                email = (a.get('email') or '').strip()
-                key = (name or email).lower()
-                if not key:
-                    continue
-                # if no timestamp, treat as empty string (won't overwrite a real timestamp)
-                ts = a.get('timestamp', '')
-                existing = latest_by_user.get(key)
-                if existing is None or ts > (existing.get('timestamp', '')):
-                    latest_by_user[key] = a
-
-            unique_entries = list(latest_by_user.values())
-            if not unique_entries:
-                print(f"📊 No valid user entries found for {source}.")
-                return
-
-            # Sort by percentage descending
-            sorted_assessments = sorted(
-                unique_entries, key=lambda a: a.get('percentage', 0), reverse=True)
-
             print(f"\n🏆 LEADERBOARD - Top {top_n} ({source})")
             print("=" * 60)
-            for i, a in enumerate(sorted_assessments[:top_n], start=1):
+            for i, a in enumerate(sorted_assessments, start=1):
                 display_name = a.get('name') or a.get('email') or "Unknown"
                 perc = a.get('percentage', 0.0)
                 # Only show name and score (no timestamp)
@@ -591,47 +520,14 @@ Profile: {self.user_profile['gender']}, {self.user_profile['education']}, {self.
             print(f"❌ Error building leaderboard: {e}")
 
     def append_to_results_file(self, user_data, results_path='app_permissions_assessment_results.json'):
-        """Append a single user's full result to a shared JSON file under key 'results'.
-        Handles existing file shapes:
-          - missing file -> create {'results': [user_data]}
-          - dict with 'results' list -> append
-          - dict representing a single previous result -> convert to {'results': [old, new]}
-          - list -> treat as list of results and append
+        """Append a single user's full result to the shared results log.
+        The log sits next to ``results_path`` (as .jsonl); `app_permissions_result_log.py compact`
+        writes ``results_path`` itself in its legacy {'results': [...]} shape.
         """
         try:
-            # Read existing content if present
-            if os.path.exists(results_path):
-                with open(results_path, 'r', encoding='utf-8') as f:
-                    try:
-                        data = json.load(f)
-                    except json.JSONDecodeError:
-                        data = None
-            else:
-                data = None
-
-            if data is None:
-                new_data = {'results': [user_data]}
-            elif isinstance(data, dict):
-                # If already has results list, append
-                if 'results' in data and isinstance(data['results'], list):
-                    data['results'].append(user_data)
-                    new_data = data
-                else:
-                    # Convert existing dict (single object) into results list
-                    new_data = {'results': [data, user_data]}
-            elif isinstance(data, list):
-                # Old format: plain list of results
-                new_data = {'results': data + [user_data]}
-            else:
-                # Fallback
-                new_data = {'results': [user_data]}
-
-            # Write back atomically (simple overwrite)
-            with open(results_path, 'w', encoding='utf-8') as f:
-                json.dump(new_data, f, indent=2, ensure_ascii=False)
-
-            print(
-                f"✅ Individual result appended to '{results_path}' (total: {len(new_data.get('results', []))})")
+            log = results_file(results_path)
+            log.append(user_data)
+            print(f"✅ Individual result appended to '{log.path}'")
             return True
         except Exception as e:
             print(f"❌ Error appending individual result: {e}")
@@ -709,7 +605,7 @@ Profile: {self.user_profile['gender']}, {self.user_profile['education']}, {self.
                 # Save and exit
                 database_file = self.save_to_assessment_database(user_data)
                 print(
-                    f"\n📄 Individual results saved to 'app_permissions_assessment_results.json'")
+                    f"\n📄 Individual results saved to '{results_file().path}'")
                 print(
                     f"📊 Results added to assessment database: {database_file}")
                 print("Thank you for completing the assessment!")
@@ -0,0 +1,199 @@
+"""
+Compiled answer sheet
+
+The answer sheet is compiled at load time into dense NumPy arrays indexed by
+question row and option index, so a whole batch of submissions is scored
+with one fancy-indexing operation instead of per-answer dict lookups.
+
+Answers resolve by question id and option index first; question and option
+texts are only a fallback, matched exactly and then NFKC-normalized so that
+typographic quotes (the survey CSVs use a curly ’) no longer score 0.
+"""
+import hashlib
+import json
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.content_store import canonical_question_id
+
+WRONG_LEVEL = 'wrong'
+
+_TYPOGRAPHIC = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201b': "'", '\u2032': "'",
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u2033': '"',
+    '\u2013': '-', '\u2014': '-', '\u2212': '-',
+})
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """NFKC-normalize text for tolerant matching (quotes, dashes, case and spacing)"""
+    text = unicodedata.normalize('NFKC', text or '').translate(_TYPOGRAPHIC)
+    return ' '.join(text.split()).casefold()
+
+
+class AnswerKey:
+    """Dense, index-addressed view of the answer sheet"""
+
+    def __init__(self, questions: Sequence[Dict]):
+        # Content hash of the answer sheet; compact submissions are pinned to it
+        self.version = hashlib.blake2b(
+            json.dumps(list(questions), sort_keys=True, ensure_ascii=False).encode('utf-8'), digest_size=8
+        ).hexdigest()
+        
+        self.question_ids: List[str] = []
+        self.question_texts: List[str] = []
+        self.option_texts: List[List[str]] = []
+
+        n_questions = len(questions)
+        n_options = max((len(q.get('options', [])) for q in questions), default=0)
+
+        # Level code 0 is reserved for unanswered / unmatched answers
+        self.level_names: List[str] = [WRONG_LEVEL]
+        level_codes: Dict[str, int] = {}
+
+        self.weights = np.zeros((n_questions, n_options), dtype=np.int32)
+        self.levels = np.zeros((n_questions, n_options), dtype=np.int16)
+        self.option_counts = np.zeros(n_questions, dtype=np.int16)
+
+        self._row_by_id: Dict[str, int] = {}
+        self._row_by_text: Dict[str, int] = {}
+        self._row_by_normalized: Dict[str, int] = {}
+        self._col_by_text: Dict[Tuple[int, str], int] = {}
+        self._col_by_normalized: Dict[Tuple[int, str], int] = {}
+
+        for row, q_item in enumerate(questions):
+            question_text = q_item.get('question')
+            question_id = q_item.get('questionId', f"Q{row + 1:02d}")
+            self.question_ids.append(question_id)
+            self.question_texts.append(question_text)
+            self._row_by_id[canonical_question_id(question_id)] = row
+            self._row_by_text[question_text] = row
+            self._row_by_normalized[normalize_text(question_text)] = row
+
+            options = q_item.get('options', [])
+            self.option_counts[row] = len(options)
+            texts = []
+            for col, option in enumerate(options):
+                text = option.get('text')
+                level = option.get('level')
+                if level not in level_codes:
+                    level_codes[level] = len(self.level_names)
+                    self.level_names.append(level)
+                self.weights[row, col] = option.get('marks') or 0
+                self.levels[row, col] = level_codes[level]
+                self._col_by_text[(row, text)] = col
+                self._col_by_normalized[(row, normalize_text(text))] = col
+                texts.append(text)
+            self.option_texts.append(texts)
+
+        self.max_score = self.weights.max(axis=1) if n_options else np.zeros(n_questions, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def row_for(self, question_id: Optional[str] = None, question_text: Optional[str] = None) -> int:
+        """Answer sheet row by question id, then exact text, then normalized text; -1 when unknown"""
+        if question_id:
+            row = self._row_by_id.get(canonical_question_id(question_id))
+            if row is not None:
+                return row
+        if question_text is not None:
+            row = self._row_by_text.get(question_text)
+            if row is None:
+                row = self._row_by_normalized.get(normalize_text(question_text))
+            if row is not None:
+                return row
+        return -1
+
+    def row_for_text(self, question_text: str) -> int:
+        """Answer sheet row for a question text, -1 when unknown"""
+        return self.row_for(question_text=question_text)
+
+    def resolve_option(self, row: int, selected_option: Optional[str] = None,
+                       option_index: Optional[int] = None) -> int:
+        """Option index within a row: a valid index wins, then exact and normalized text; -1 when unknown"""
+        if option_index is not None and 0 <= option_index < self.option_counts[row]:
+            return option_index
+        if selected_option is None:
+            return -1
+        col = self._col_by_text.get((row, selected_option))
+        if col is None:
+            col = self._col_by_normalized.get((row, normalize_text(selected_option)), -1)
+        return col
+
+    def resolve(self, question_id: Optional[str], question_text: Optional[str],
+                option_index: Optional[int], selected_option: Optional[str]) -> Tuple[int, int]:
+        """Map an answer to (row, col); -1 marks an unknown question or option"""
+        row = self.row_for(question_id, question_text)
+        if row < 0:
+            return -1, -1
+        return row, self.resolve_option(row, selected_option, option_index)
+
+    def resolve_batch(self, answer_lists: Sequence[Sequence[Tuple]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Resolve many submissions at once.
+
+        Each answer is a (question_id, question_text, option_index, selected_option)
+        tuple. Returns (rows, cols) arrays of shape (n_submissions, max_answers),
+        padded with -1 for missing answers.
+        """
+        width = max((len(answers) for answers in answer_lists), default=0)
+        rows = np.full((len(answer_lists), width), -1, dtype=np.int32)
+        cols = np.full((len(answer_lists), width), -1, dtype=np.int32)
+        for i, answers in enumerate(answer_lists):
+            for j, answer in enumerate(answers):
+                rows[i, j], cols[i, j] = self.resolve(*answer)
+        return rows, cols
+
+    def question_id_for(self, row: int, default: str = '') -> str:
+        """Answer sheet id of a resolved question, or the default when unresolved"""
+        return self.question_ids[row] if row >= 0 else default
+
+    def option_text(self, row: int, col: int, default: str = '') -> str:
+        """Canonical answer sheet text of a resolved option, or the default when unresolved"""
+        if row >= 0 and col >= 0:
+            return self.option_texts[row][col]
+        return default
+
+    def option_label(self, row: int, col: int, option_index: int) -> str:
+        """Option letter (A, B, ...) of a resolved option, falling back to the submitted index"""
+        return chr(65 + (col if row >= 0 and col >= 0 else option_index))
+
+    def score(self, rows: np.ndarray, cols: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Score resolved answers.
+
+        Returns per-answer ``scores``, ``level_codes`` and ``question_max``
+        (same shape as the input), plus per-submission ``total_score`` and
+        ``max_score``. Unknown questions contribute nothing to either total,
+        matched questions with an unknown option score 0 at the 'wrong' level.
+        """
+        known_question = rows >= 0
+        matched = known_question & (cols >= 0)
+        safe_rows = np.where(known_question, rows, 0)
+        safe_cols = np.where(matched, cols, 0)
+
+        if self.weights.size:
+            scores = np.where(matched, self.weights[safe_rows, safe_cols], 0)
+            level_codes = np.where(matched, self.levels[safe_rows, safe_cols], 0)
+            question_max = np.where(known_question, self.max_score[safe_rows], 0)
+        else:
+            scores = np.zeros(rows.shape, dtype=np.int32)
+            level_codes = np.zeros(rows.shape, dtype=np.int16)
+            question_max = np.zeros(rows.shape, dtype=np.int32)
+
+        return {
+            'scores': scores,
+            'level_codes': level_codes,
+            'question_max': question_max,
+            'total_score': scores.sum(axis=1),
+            'max_score': question_max.sum(axis=1),
+        }
+
+    @staticmethod
+    def percentages(total_score: np.ndarray, max_score: np.ndarray) -> np.ndarray:
+        """Vectorized percentage with 0 for submissions without a max score"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(max_score > 0, total_score / np.maximum(max_score, 1) * 100, 0.0)
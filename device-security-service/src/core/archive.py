@@ -0,0 +1,340 @@
+"""
+Archive of old assessments in compressed columnar segments on local disk
+
+archive_assessments.py moves assessments older than ARCHIVE_AFTER_DAYS out
+of MongoDB into zstd-compressed Parquet segments, so the hot collection -
+and the working set MongoDB has to keep cached - stays the size of the
+recent traffic. Segments are partitioned by category and month:
+
+    <ARCHIVE_DIR>/category=<category>/month=<YYYY-MM>/segment-<archived at>-<pid>.parquet
+
+Rows in a segment are sorted by email, then created_at, so the per row
+group statistics let a user's history skip every row group they are not
+in. A segment is written, fsynced and renamed into place before its
+documents are deleted from MongoDB; a run that crashed in between is
+finished by the next one, which only deletes the documents already
+archived. The statistics rollups and the leaderboard stay in MongoDB.
+
+History, the previous attempt lookup and exports read through to the
+archive and merge it with the hot collection. manifest.json records the
+cutoff of the latest run: assessments saved after it are never archived,
+so a history page filled from MongoDB with newer attempts skips the
+archive.
+"""
+import heapq
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PROFILE_FIELDS = ('name', 'email', 'organization', 'gender', 'education_level', 'proficiency')
+# Stored as JSON text: the feedback is read back whole, never filtered on
+JSON_COLUMNS = ('feedback', 'detailed_feedback')
+SEGMENT_SORT = [('email', 'ascending'), ('created_at', 'ascending')]
+MANIFEST_FILE = 'manifest.json'
+
+
+class ArchiveError(RuntimeError):
+    """Raised when the archive cannot be read or written"""
+
+
+def archive_schema():
+    return pa.schema([
+        ('_id', pa.string()),
+        ('created_at', pa.timestamp('us')),
+        ('timestamp', pa.string()),
+        ('email', pa.string()),
+        ('organization', pa.string()),
+        ('total_score', pa.int64()),
+        ('max_score', pa.int64()),
+        ('percentage', pa.float64()),
+        ('overall_knowledge_level', pa.string()),
+        ('ml_awareness_level', pa.string()),
+        ('ml_confidence', pa.float64()),
+        ('idempotency_key', pa.string()),
+        ('user_profile', pa.struct([(field, pa.string()) for field in PROFILE_FIELDS])),
+        ('feedback', pa.string()),
+        ('detailed_feedback', pa.string()),
+    ])
+
+
+def archive_month(created_at: datetime) -> str:
+    return created_at.strftime('%Y-%m')
+
+
+def archive_row(document: Dict) -> Dict[str, Any]:
+    """Segment row of a stored assessment document"""
+    profile = document.get('user_profile') or {}
+    row = {
+        '_id': str(document['_id']),
+        'created_at': document['created_at'],
+        'timestamp': None if document.get('timestamp') is None else str(document['timestamp']),
+        'user_profile': {field: None if profile.get(field) is None else str(profile[field])
+                         for field in PROFILE_FIELDS},
+    }
+    for field in ('email', 'organization', 'total_score', 'max_score', 'percentage', 'overall_knowledge_level',
+                  'ml_awareness_level', 'ml_confidence', 'idempotency_key'):
+        row[field] = document.get(field)
+    for field in JSON_COLUMNS:
+        row[field] = json.dumps(document[field], separators=(',', ':'), default=str) if document.get(field) else None
+    return row
+
+
+def archived_document(row: Dict, category: str) -> Dict[str, Any]:
+    """Assessment document of a segment row, shaped as MongoDB returns it"""
+    document = {field: value for field, value in row.items() if value is not None and field != 'month'}
+    for field in JSON_COLUMNS:
+        if field in document:
+            document[field] = json.loads(document[field])
+    document['category'] = category
+    return document
+
+
+def merge_documents(streams: Iterable[Iterable[Dict]], newest_first: bool = False) -> Iterator[Dict]:
+    """
+    Merge created_at-sorted streams of documents into one, dropping the
+    second copy of a document that is both archived and still in MongoDB
+    """
+    key = (lambda document: document['created_at'])
+    last_at = None
+    seen: Set[str] = set()
+    for document in heapq.merge(*streams, key=key, reverse=newest_first):
+        if document['created_at'] != last_at:
+            last_at = document['created_at']
+            seen = set()
+        document_id = str(document['_id'])
+        if document_id in seen:
+            continue
+        seen.add(document_id)
+        yield document
+
+
+class AssessmentArchive:
+    """Archived assessments of one category, read and written as Parquet segments"""
+
+    def __init__(self, root, category: str, row_group_rows: int = 10000):
+        self.root = Path(root)
+        self.category = category
+        self.row_group_rows = row_group_rows
+        self.path = self.root / f"category={category}"
+        self.schema = archive_schema()
+        self._dataset = None
+        self._dataset_key = None
+
+    # Reading
+
+    @property
+    def archived_before(self) -> Optional[datetime]:
+        """Cutoff of the latest run - only assessments saved before it can be archived; None before the first"""
+        cutoff = self._manifest().get(self.category, {}).get('archived_before')
+        return datetime.fromisoformat(cutoff) if cutoff else None
+
+    def months(self) -> List[str]:
+        if not self.path.is_dir():
+            return []
+        return sorted(entry.name.split('=', 1)[1] for entry in self.path.iterdir()
+                      if entry.is_dir() and entry.name.startswith('month='))
+
+    def segments(self) -> List[Path]:
+        return sorted(self.path.glob('month=*/*.parquet'))
+
+    def history(self, query: Dict[str, Any], projection: Optional[Dict[str, int]] = None,
+                limit: Optional[int] = None) -> List[Dict]:
+        """Archived documents matching a history query, newest first"""
+        documents = self._read(query, projection)
+        documents.sort(key=lambda document: document['created_at'], reverse=True)
+        return documents[:limit] if limit else documents
+
+    def latest(self, email: str, projection: Optional[Dict[str, int]] = None) -> Optional[Dict]:
+        documents = self.history({'email': email}, projection, limit=1)
+        return documents[0] if documents else None
+
+    def find(self, query: Dict[str, Any], projection: Optional[Dict[str, int]] = None) -> Iterator[Dict]:
+        """
+        Stream archived documents matching ``query`` in created_at order.
+
+        Only one month is held in memory: the months are read in order and
+        each one is sorted on its own.
+        """
+        months = self._months_for(query.get('created_at'))
+        for month in months:
+            documents = self._read(query, projection, [month])
+            documents.sort(key=lambda document: document['created_at'])
+            yield from documents
+
+    def _read(self, query: Dict[str, Any], projection: Optional[Dict[str, int]],
+              months: Optional[List[str]] = None) -> List[Dict]:
+        if query.get('category', self.category) != self.category:
+            return []
+        if months is None:
+            months = self._months_for(query.get('created_at'))
+        if not months:
+            return []
+        dataset = self._open()
+        if dataset is None:
+            return []
+        expression = ds.field('month').isin(months)
+        for field, condition in query.items():
+            if field != 'category':
+                expression = expression & _condition(field, condition)
+        columns = None
+        if projection:
+            columns = [field for field in self.schema.names
+                       if field == '_id' or any(key.split('.')[0] == field for key, keep in projection.items() if keep)]
+        try:
+            table = dataset.to_table(columns=columns, filter=expression)
+        except (OSError, pa.ArrowException) as e:
+            raise ArchiveError(f"Could not read the archive at {self.path}: {e}") from e
+        return [archived_document(row, self.category) for row in table.to_pylist()]
+
+    def _months_for(self, created_at: Any) -> List[str]:
+        months = self.months()
+        if isinstance(created_at, dict):
+            for operator, bound in created_at.items():
+                if not isinstance(bound, datetime):
+                    continue
+                month = archive_month(bound)
+                if operator in ('$lt', '$lte'):
+                    months = [m for m in months if m <= month]
+                elif operator in ('$gt', '$gte'):
+                    months = [m for m in months if m >= month]
+        elif isinstance(created_at, datetime):
+            months = [m for m in months if m == archive_month(created_at)]
+        return months
+
+    def _open(self):
+        """The segments as a dataset, rediscovered only when a run changed them"""
+        try:
+            key = (self._manifest_path().stat().st_mtime_ns, len(self.segments()))
+        except FileNotFoundError:
+            key = (None, len(self.segments()))
+        if not key[1]:
+            return None
+        if key != self._dataset_key:
+            self._dataset = ds.dataset(
+                str(self.path), format='parquet', schema=self.schema.append(pa.field('month', pa.string())),
+                partitioning=ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive')
+            )
+            self._dataset_key = key
+        return self._dataset
+
+    # Writing
+
+    def archived_ids(self, month: str) -> Set[str]:
+        """Ids of the documents already archived in a month"""
+        ids: Set[str] = set()
+        for segment in (self.path / f"month={month}").glob('*.parquet'):
+            ids.update(pq.read_table(segment, columns=['_id']).column('_id').to_pylist())
+        return ids
+
+    def write_segment(self, month: str, documents: List[Dict]) -> Path:
+        """Write documents of one month as a new segment, atomically"""
+        table = pa.Table.from_pylist([archive_row(document) for document in documents], schema=self.schema)
+        table = table.sort_by(SEGMENT_SORT)
+        directory = self.path / f"month={month}"
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"segment-{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{os.getpid()}.parquet"
+        temporary = directory / f".{name}.tmp"
+        with open(temporary, 'wb') as f:
+            pq.write_table(table, f, compression='zstd', row_group_size=self.row_group_rows)
+            f.flush()
+            os.fsync(f.fileno())
+        # The row count is checked before any document may be deleted from MongoDB
+        if pq.ParquetFile(temporary).metadata.num_rows != len(documents):
+            temporary.unlink()
+            raise ArchiveError(f"Segment for {month} did not read back {len(documents)} rows")
+        os.replace(temporary, directory / name)
+        return directory / name
+
+    def record_cutoff(self, cutoff: datetime):
+        """Record the cutoff of a run; an earlier one never replaces a later one"""
+        manifest = self._manifest()
+        entry = manifest.setdefault(self.category, {})
+        previous = entry.get('archived_before')
+        if previous is None or datetime.fromisoformat(previous) < cutoff:
+            entry['archived_before'] = cutoff.isoformat()
+        entry['updated_at'] = datetime.now().isoformat()
+        self.root.mkdir(parents=True, exist_ok=True)
+        temporary = self._manifest_path().with_name(f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+        temporary.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+        os.replace(temporary, self._manifest_path())
+
+    def _manifest_path(self) -> Path:
+        return self.root / MANIFEST_FILE
+
+    def _manifest(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self._manifest_path().read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            raise ArchiveError(f"Corrupt archive manifest {self._manifest_path()}: {e}") from e
+
+
+def _condition(field: str, condition: Any):
+    """pyarrow filter expression of a MongoDB equality or comparison condition"""
+    column = ds.field(*field.split('.'))
+    if not (isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition)):
+        return column == condition
+    expression = None
+    for operator, operand in condition.items():
+        if operator == '$in':
+            term = column.isin(list(operand))
+        else:
+            term = {
+                '$eq': column.__eq__, '$ne': column.__ne__, '$gt': column.__gt__,
+                '$gte': column.__ge__, '$lt': column.__lt__, '$lte': column.__le__,
+            }[operator](operand)
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def archive_assessments(collection, archive: AssessmentArchive, cutoff: datetime, batch_size: int = 1000,
+                        segment_rows: int = 100000, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Move the category's assessments saved before ``cutoff`` into the archive.
+
+    Documents are read in created_at order and written a month - or
+    ``segment_rows`` documents - at a time; each segment is on disk before
+    its documents are deleted, ``batch_size`` ids per delete.
+    """
+    counts = {'archived': 0, 'already_archived': 0, 'deleted': 0, 'segments': 0}
+    query = {'category': archive.category, 'created_at': {'$lt': cutoff}}
+    archived_ids: Dict[str, Set[str]] = {}
+    # Recorded up front: readers look in the archive for anything older from the first deleted document on
+    if not dry_run:
+        archive.record_cutoff(cutoff)
+
+    def flush(month: str, documents: List[Dict]):
+        known = archived_ids.setdefault(month, archive.archived_ids(month))
+        fresh = [document for document in documents if str(document['_id']) not in known]
+        counts['already_archived'] += len(documents) - len(fresh)
+        if dry_run:
+            counts['archived'] += len(fresh)
+            return
+        if fresh:
+            archive.write_segment(month, fresh)
+            known.update(str(document['_id']) for document in fresh)
+            counts['archived'] += len(fresh)
+            counts['segments'] += 1
+        ids = [document['_id'] for document in documents]
+        for start in range(0, len(ids), batch_size):
+            counts['deleted'] += collection.delete_many({'_id': {'$in': ids[start:start + batch_size]}}).deleted_count
+
+    month = None
+    pending: List[Dict] = []
+    for document in collection.find(query, sort=[('created_at', 1)], batch_size=batch_size):
+        document_month = archive_month(document['created_at'])
+        if pending and (document_month != month or len(pending) >= segment_rows):
+            flush(month, pending)
+            pending = []
+        month = document_month
+        pending.append(document)
+    if pending:
+        flush(month, pending)
+    return counts
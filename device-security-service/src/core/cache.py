@@ -0,0 +1,310 @@
+"""
+Two-tier caching for computed payloads
+
+Each named cache keeps an in-memory LRU/TTL tier in front of an optional
+local disk tier. The disk tier is a single SQLite database in WAL mode, so
+it survives restarts and is shared by every uvicorn worker - and, when the
+services point CACHE_DISK_PATH at the same file, by every service on the
+host - without an external cache server. Entries are namespaced per
+service and cache, size-bounded, and stamped with the content version that
+produced them; switching a cache to a new version (answer sheet, bank or
+model reload) drops everything computed under the old one.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+
+def cache_key(*parts: Any) -> str:
+    """Content hash of strings and integer arrays"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(np.ascontiguousarray(part, dtype=np.int32).tobytes())
+        else:
+            digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """Thread-safe LRU cache with a per-entry TTL and hit/miss/eviction counters"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else 0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class DiskCache:
+    """
+    SQLite (WAL) cache tier shared by every process on the host.
+
+    Values are stored as JSON. Once the file grows past ``max_bytes`` the
+    least recently used entries are deleted. Any SQLite error disables the
+    tier for the failing call only - callers just see a miss.
+    """
+
+    EVICT_EVERY = 100
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 256 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        try:
+            self._conn = self._connect()
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Disk cache unavailable at {self.path}: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, version TEXT NOT NULL,"
+            " value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed ON cache_entries (accessed_at)")
+        return conn
+
+    @property
+    def available(self) -> bool:
+        return self._conn is not None
+
+    def get(self, namespace: str, key: str, version: str) -> Optional[Any]:
+        if self._conn is None:
+            return None
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT version, value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (namespace, key)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                if row[0] != version or (row[2] and row[2] < now):
+                    self._conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+                    )
+                    self.misses += 1
+                    return None
+                self._conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key)
+                )
+                self.hits += 1
+            return json.loads(row[1])
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⚠️ Disk cache read failed: {e}")
+            return None
+
+    def put(self, namespace: str, key: str, version: str, value: Any, ttl_seconds: float = 0):
+        if self._conn is None:
+            return
+        now = time.time()
+        try:
+            data = json.dumps(value, separators=(',', ':'))
+        except (TypeError, ValueError) as e:
+            print(f"⚠️ Disk cache skipped a value that is not JSON serializable: {e}")
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries"
+                    " (namespace, key, version, value, size, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, key, version, data, len(data), now + ttl_seconds if ttl_seconds > 0 else 0, now)
+                )
+                self._writes += 1
+                if self._writes % self.EVICT_EVERY == 0:
+                    self._evict(now)
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⚠️ Disk cache write failed: {e}")
+
+    def _evict(self, now: float):
+        """Drop expired entries, then least recently used ones until back under the size bound"""
+        self._conn.execute("DELETE FROM cache_entries WHERE expires_at > 0 AND expires_at < ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Free an extra 10% so eviction does not run on every write once full
+        excess = total - int(self.max_bytes * 0.9)
+        victims = []
+        for rowid, size in self._conn.execute("SELECT rowid, size FROM cache_entries ORDER BY accessed_at"):
+            victims.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM cache_entries WHERE rowid = ?", victims)
+        self.evictions += len(victims)
+
+    def invalidate(self, namespace: str, version: str):
+        """Delete a namespace's entries computed under any other version"""
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND version != ?", (namespace, version)
+                )
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⚠️ Disk cache invalidation failed: {e}")
+
+    def clear(self, namespace: str):
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⚠️ Disk cache clear failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            'available': self.available,
+            'path': str(self.path),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'errors': self.errors,
+        }
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    entries, size = self._conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+                    ).fetchone()
+                stats.update({'entries': entries, 'bytes': size})
+            except sqlite3.Error:
+                pass
+        return stats
+
+
+class TieredCache:
+    """A named cache: memory tier first, then the shared disk tier, keyed by content version"""
+
+    def __init__(self, namespace: str, memory: MemoryCache, disk: Optional[DiskCache] = None):
+        self.namespace = namespace
+        self.memory = memory
+        self.disk = disk
+        self.version = ''
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+    def set_version(self, version: str):
+        """Switch to a new content version, dropping entries computed under the old one"""
+        if version == self.version:
+            return
+        self.version = version
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.invalidate(self.namespace, version)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(self.namespace, key, self.version)
+            if value is None:
+                self.disk_misses += 1
+            else:
+                self.disk_hits += 1
+                self.memory.put(key, value)
+        return value
+
+    def put(self, key: str, value: Any):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(self.namespace, key, self.version, value, self.memory.ttl_seconds)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear(self.namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        lookups = memory['hits'] + memory['misses']
+        hits = memory['hits'] + self.disk_hits
+        return {
+            'namespace': self.namespace,
+            'version': self.version,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'memory': memory,
+            'disk': {'hits': self.disk_hits, 'misses': self.disk_misses} if self.disk is not None else None,
+        }
@@ -0,0 +1,255 @@
+"""
+Streaming bulk grading of survey CSV exports
+
+Survey exports share the training CSV layout: demographic columns (gender,
+proficiency, education) followed by one column per question text whose cells
+hold the selected option text. Uploads are parsed incrementally straight from
+the request body (multipart/form-data or raw text/csv), graded in fixed-size
+chunks with vectorized scoring and one batched model call per chunk, and
+written back as CSV or NDJSON while the upload is still being read - memory
+use stays bounded by the chunk size, not the file size.
+"""
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+DEMOGRAPHIC_COLUMNS = ('gender', 'proficiency', 'education')
+PASSTHROUGH_COLUMNS = ('email', 'name', 'organization')
+
+
+class CsvUploadError(ValueError):
+    """Raised when an upload is not a gradable survey export"""
+
+
+class CsvRecordStream:
+    """Incrementally turn UTF-8 bytes into CSV records, keeping quoted newlines intact"""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._pending = ''
+        self._pending_quotes = 0
+
+    def feed(self, data: bytes, final: bool = False) -> List[List[str]]:
+        text = self._decoder.decode(data, final)
+        lines = text.split('\n')
+        tail = '' if final else lines.pop()
+
+        complete = []
+        for line in lines:
+            self._pending += line + '\n'
+            self._pending_quotes += line.count('"')
+            # A record ends at a newline outside quotes ("" escapes keep the count even)
+            if self._pending_quotes % 2 == 0:
+                complete.append(self._pending)
+                self._pending = ''
+                self._pending_quotes = 0
+
+        if tail:
+            self._pending += tail
+            self._pending_quotes += tail.count('"')
+        if final and self._pending:
+            complete.append(self._pending)
+            self._pending = ''
+            self._pending_quotes = 0
+
+        return [record for record in csv.reader(complete) if any(cell.strip() for cell in record)]
+
+
+class CsvUploadReader:
+    """Pull CSV records out of a streamed request body"""
+
+    def __init__(self, body: AsyncIterator[bytes], content_type: str, field_name: str = 'file'):
+        self._body = body
+        self._records = CsvRecordStream()
+        self._ready: List[List[str]] = []
+        self._file_chunks: List[bytes] = []
+        self._finished = False
+        self._parser = None
+
+        media_type, options = parse_options_header(content_type or '')
+        media_type = media_type.decode('latin-1') if isinstance(media_type, bytes) else media_type
+        if media_type == 'multipart/form-data':
+            boundary = options.get(b'boundary')
+            if not boundary:
+                raise CsvUploadError("Missing multipart boundary")
+            self._parser = self._multipart_parser(boundary, field_name.encode('latin-1'))
+        elif media_type not in ('text/csv', 'application/csv', 'text/plain'):
+            raise CsvUploadError(f"Unsupported content type: {media_type or 'none'}")
+
+    def _multipart_parser(self, boundary: bytes, field_name: bytes):
+        state = {'header_field': b'', 'header_value': b'', 'disposition': b'', 'in_file': False}
+
+        def on_part_begin():
+            state['disposition'] = b''
+            state['in_file'] = False
+
+        def on_header_field(data, start, end):
+            state['header_field'] += data[start:end]
+
+        def on_header_value(data, start, end):
+            state['header_value'] += data[start:end]
+
+        def on_header_end():
+            if state['header_field'].lower() == b'content-disposition':
+                state['disposition'] = state['header_value']
+            state['header_field'] = b''
+            state['header_value'] = b''
+
+        def on_headers_finished():
+            _, params = parse_options_header(state['disposition'])
+            state['in_file'] = params.get(b'name') == field_name or b'filename' in params
+
+        def on_part_data(data, start, end):
+            if state['in_file']:
+                self._file_chunks.append(data[start:end])
+
+        def on_part_end():
+            state['in_file'] = False
+
+        return multipart.MultipartParser(boundary, {
+            'on_part_begin': on_part_begin,
+            'on_header_field': on_header_field,
+            'on_header_value': on_header_value,
+            'on_header_end': on_header_end,
+            'on_headers_finished': on_headers_finished,
+            'on_part_data': on_part_data,
+            'on_part_end': on_part_end,
+        })
+
+    async def _read_chunk(self):
+        """Consume one body chunk (or finish the input), buffering any completed records"""
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            self._finished = True
+            if self._parser is not None:
+                self._parser.finalize()
+            self._ready.extend(self._records.feed(b''.join(self._file_chunks), final=True))
+            self._file_chunks.clear()
+            return
+
+        if self._parser is not None:
+            self._parser.write(chunk)
+            data = b''.join(self._file_chunks)
+            self._file_chunks.clear()
+        else:
+            data = chunk
+        if data:
+            self._ready.extend(self._records.feed(data))
+
+    async def read_header(self) -> List[str]:
+        while not self._ready and not self._finished:
+            await self._read_chunk()
+        if not self._ready:
+            raise CsvUploadError("Uploaded file is empty")
+        return self._ready.pop(0)
+
+    async def batches(self, size: int) -> AsyncIterator[List[List[str]]]:
+        while True:
+            while len(self._ready) < size and not self._finished:
+                await self._read_chunk()
+            if not self._ready:
+                return
+            batch, self._ready = self._ready[:size], self._ready[size:]
+            yield batch
+
+
+class CsvGrader:
+    """Grade survey export rows against the compiled answer sheet"""
+
+    def __init__(self, model_service, header: List[str]):
+        self.model_service = model_service
+        self.answer_key = model_service.answer_key
+
+        normalized = [column.strip().lower() for column in header]
+        self.profile_columns = {
+            name: normalized.index(name)
+            for name in DEMOGRAPHIC_COLUMNS + PASSTHROUGH_COLUMNS
+            if name in normalized
+        }
+
+        # (csv column, answer sheet row) in header order - header order is answer order
+        self.question_columns: List[Tuple[int, int]] = []
+        for col, column in enumerate(header):
+            row = self.answer_key.row_for_text(column.strip())
+            if row >= 0:
+                self.question_columns.append((col, row))
+        if not self.question_columns:
+            raise CsvUploadError("No column header matches an assessment question")
+
+        self.question_ids = [self.answer_key.question_ids[row] for _, row in self.question_columns]
+        self.fieldnames = (
+            ['row']
+            + [name for name in PASSTHROUGH_COLUMNS + DEMOGRAPHIC_COLUMNS if name in self.profile_columns]
+            + ['total_score', 'max_score', 'percentage', 'overall_knowledge_level',
+               'ml_awareness_level', 'ml_confidence']
+            + [f"{qid}_score" for qid in self.question_ids]
+        )
+
+    @staticmethod
+    def _cell(record: List[str], col: int) -> str:
+        return record[col].strip() if col < len(record) else ''
+
+    def grade(self, records: List[List[str]], first_row: int) -> List[Dict]:
+        n = len(records)
+        k = len(self.question_columns)
+        rows = np.tile(np.array([row for _, row in self.question_columns], dtype=np.int32), (n, 1))
+        cols = np.full((n, k), -1, dtype=np.int32)
+        answer_lists = []
+        for i, record in enumerate(records):
+            selected = []
+            for j, (col, row) in enumerate(self.question_columns):
+                option = self._cell(record, col)
+                cols[i, j] = self.answer_key.resolve_option(row, option)
+                selected.append(self.answer_key.option_text(row, cols[i, j], option))
+            answer_lists.append(selected)
+
+        scored = self.answer_key.score(rows, cols)
+        percentages = self.answer_key.percentages(scored['total_score'], scored['max_score'])
+        predictions = self.model_service.predict_awareness_batch(answer_lists)
+
+        results = []
+        for i, record in enumerate(records):
+            percentage = round(float(percentages[i]), 2)
+            ml_awareness_level, ml_confidence = predictions[i]
+            result = {'row': first_row + i}
+            for name in PASSTHROUGH_COLUMNS + DEMOGRAPHIC_COLUMNS:
+                if name in self.profile_columns:
+                    result[name] = self._cell(record, self.profile_columns[name])
+            result.update({
+                'total_score': int(scored['total_score'][i]),
+                'max_score': int(scored['max_score'][i]),
+                'percentage': percentage,
+                'overall_knowledge_level': self.model_service.get_overall_level(percentage),
+                'ml_awareness_level': ml_awareness_level,
+                'ml_confidence': round(ml_confidence, 4) if ml_confidence else None,
+            })
+            for j, qid in enumerate(self.question_ids):
+                result[f"{qid}_score"] = int(scored['scores'][i, j])
+            results.append(result)
+        return results
+
+
+def format_results(results: List[Dict], fieldnames: Optional[List[str]], output_format: str,
+                   include_header: bool = False) -> str:
+    """Serialize graded rows as CSV (optionally with header) or NDJSON"""
+    if output_format == 'ndjson':
+        return ''.join(json.dumps(result) + '\n' for result in results)
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    if include_header:
+        writer.writeheader()
+    writer.writerows(results)
+    return buffer.getvalue()
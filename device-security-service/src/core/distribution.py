@@ -0,0 +1,144 @@
+"""
+In-memory score distribution for percentile ranks
+
+"You scored better than X% of people" without sorting stored assessments:
+the service keeps fixed-bin histograms of the percentage score in memory -
+one over the whole category and one per organization, gender, education
+level and proficiency value - and answers a percentile rank in O(bins).
+Every save adds to them immediately. Periodically they are reloaded from the
+statistics rollups, which pick up the saves of every other worker, and
+written to a local snapshot so a restart without MongoDB still has them.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.core.rollups import rollup_key, score_bin
+from src.core.statistics import SCORE_BINS
+
+GROUP_DIMENSIONS = ('organization', 'gender', 'education_level', 'proficiency')
+OVERALL = 'all'
+
+
+def group_key(dimension: Optional[str] = None, value: Optional[str] = None) -> str:
+    """Histogram key of the whole category, or of one value of a group dimension"""
+    return OVERALL if dimension is None else f"{dimension}={value}"
+
+
+class ScoreDistribution:
+    """Per-group fixed-bin histograms of percentage scores"""
+
+    def __init__(self, snapshot_path: Path, min_sample: int = 1):
+        self.snapshot_path = Path(snapshot_path)
+        self.min_sample = max(1, min_sample)
+        self._histograms: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.source = 'empty'
+        self.loaded_at: Optional[float] = None
+        self.added = 0
+
+    @staticmethod
+    def _group_keys(key: Dict[str, str]) -> List[str]:
+        return [OVERALL] + [group_key(dimension, key[dimension]) for dimension in GROUP_DIMENSIONS]
+
+    def add(self, documents: Iterable[Dict]):
+        """Count newly saved assessment documents"""
+        with self._lock:
+            for document in documents:
+                score = score_bin(float(document.get('percentage') or 0))
+                for key in self._group_keys(rollup_key(document)):
+                    self._histograms.setdefault(key, [0] * SCORE_BINS)[score] += 1
+                self.added += 1
+
+    def load_rollups(self, rollups: Iterable[Dict]) -> int:
+        """Replace the histograms with those of the statistics rollups, returning the assessments counted"""
+        histograms: Dict[str, List[int]] = {}
+        total = 0
+        for rollup in rollups:
+            keys = self._group_keys({dimension: rollup.get(dimension) for dimension in GROUP_DIMENSIONS})
+            for bin_key, count in (rollup.get('histogram') or {}).items():
+                score = score_bin(float(bin_key))
+                for key in keys:
+                    histograms.setdefault(key, [0] * SCORE_BINS)[score] += count
+                total += count
+        self._replace(histograms, 'rollups')
+        return total
+
+    def _replace(self, histograms: Dict[str, List[int]], source: str):
+        with self._lock:
+            self._histograms = histograms
+        self.source = source
+        self.loaded_at = time.time()
+
+    def percentile_rank(self, score: float, dimension: Optional[str] = None,
+                        value: Optional[str] = None) -> Tuple[Optional[float], int]:
+        """
+        Return ``(rank, sample_size)``: the percentage of counted scores below
+        ``score``, with scores in the same bin counting half. The rank is None
+        while the group has fewer than ``min_sample`` scores.
+        """
+        with self._lock:
+            histogram = self._histograms.get(group_key(dimension, value))
+            if histogram is None:
+                return None, 0
+            score = score_bin(score)
+            below = sum(histogram[:score])
+            equal = histogram[score]
+            total = below + equal + sum(histogram[score + 1:])
+        if total < self.min_sample:
+            return None, total
+        return round(100 * (below + 0.5 * equal) / total, 1), total
+
+    def save_snapshot(self):
+        """Write the histograms to the snapshot file, atomically"""
+        with self._lock:
+            snapshot = json.dumps({'saved_at': time.time(), 'histograms': self._histograms})
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.snapshot_path.with_name(f"{self.snapshot_path.name}.{os.getpid()}.tmp")
+        temporary.write_text(snapshot, encoding='utf-8')
+        os.replace(temporary, self.snapshot_path)
+
+    def load_snapshot(self) -> bool:
+        """Load the histograms from the snapshot file, if there is one"""
+        try:
+            snapshot = json.loads(self.snapshot_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        self._replace(snapshot['histograms'], 'snapshot')
+        return True
+
+    def start(self, sync: Callable[[], Awaitable[Any]], interval_seconds: float):
+        """Await ``sync`` every ``interval_seconds``; must be called from the event loop thread"""
+        if self._task is None and interval_seconds > 0:
+            self._task = asyncio.get_running_loop().create_task(self._sync_every(sync, interval_seconds))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sync_every(self, sync: Callable[[], Awaitable[Any]], interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await sync()
+            except Exception as e:
+                print(f"⚠️ Score distribution sync failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            overall = self._histograms.get(OVERALL)
+            groups = len(self._histograms)
+        return {
+            'source': self.source,
+            'loaded_at': self.loaded_at,
+            'assessments': sum(overall) if overall else 0,
+            'groups': groups,
+            'added_since_start': self.added,
+            'min_sample': self.min_sample,
+        }
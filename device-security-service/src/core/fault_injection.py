@@ -0,0 +1,235 @@
+"""
+Fault-injection stand-in for the MongoDB collection
+
+For exercising the circuit breaker and the write fallback without a real
+outage. FaultInjectingCollection wraps a pymongo collection - or, when no
+MongoDB is reachable, a small in-memory stand-in - and makes any fraction of
+calls fail with a pymongo AutoReconnect error and/or adds latency to them.
+Enable it with MONGO_FAULT_INJECTION; error rate and latency can then also
+be changed at runtime through POST /debug/mongo-faults. Never enable it in
+production.
+"""
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+
+class InMemoryCollection:
+    """Just enough of the pymongo Collection API for the assessment and rollup writes and simple reads"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: List[Dict] = []
+        self._unique: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def create_index(self, keys, name: Optional[str] = None, unique: bool = False, **kwargs) -> str:
+        fields = (keys,) if isinstance(keys, str) else tuple(field for field, _ in keys)
+        name = name or '_'.join(f"{field}_1" for field in fields)
+        if unique:
+            self._unique[name] = fields
+        return name
+
+    def create_indexes(self, models: List[Any]) -> List[str]:
+        return [
+            self.create_index(
+                list(model.document['key'].items()), name=model.document['name'],
+                unique=model.document.get('unique', False)
+            )
+            for model in models
+        ]
+
+    def _duplicate_of(self, document: Dict) -> Optional[str]:
+        # Caller holds the lock; documents missing a unique field are skipped, like a partial index
+        for name, fields in self._unique.items():
+            value = tuple(document.get(field) for field in fields)
+            if None in value:
+                continue
+            if any(tuple(d.get(field) for field in fields) == value for d in self._documents):
+                return name
+        return None
+
+    def insert_one(self, document: Dict) -> InsertOneResult:
+        document.setdefault('_id', ObjectId())
+        with self._lock:
+            index = self._duplicate_of(document)
+            if index is not None:
+                raise DuplicateKeyError(f"E11000 duplicate key error index: {index}", 11000)
+            self._documents.append(dict(document))
+        return InsertOneResult(document['_id'], True)
+
+    def insert_many(self, documents: Iterable[Dict], ordered: bool = True) -> InsertManyResult:
+        documents = list(documents)
+        inserted = []
+        errors = []
+        with self._lock:
+            for position, document in enumerate(documents):
+                document.setdefault('_id', ObjectId())
+                index = self._duplicate_of(document)
+                if index is not None:
+                    errors.append({
+                        'index': position, 'code': 11000,
+                        'errmsg': f"E11000 duplicate key error index: {index}"
+                    })
+                    if ordered:
+                        break
+                    continue
+                self._documents.append(dict(document))
+                inserted.append(document['_id'])
+        if errors:
+            raise BulkWriteError({'nInserted': len(inserted), 'writeErrors': errors})
+        return InsertManyResult(inserted, True)
+
+    _OPERATORS = {
+        '$eq': lambda a, b: a == b, '$ne': lambda a, b: a != b, '$in': lambda a, b: a in b,
+        '$gt': lambda a, b: a is not None and a > b, '$gte': lambda a, b: a is not None and a >= b,
+        '$lt': lambda a, b: a is not None and a < b, '$lte': lambda a, b: a is not None and a <= b,
+    }
+
+    @classmethod
+    def _matches(cls, document: Dict, query: Optional[Dict]) -> bool:
+        # Equality or the comparison operators above, per top-level field
+        for field, condition in (query or {}).items():
+            value = document.get(field)
+            if isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+                if not all(cls._OPERATORS[op](value, operand) for op, operand in condition.items()):
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    def find(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None,
+             sort=None, limit: int = 0, **kwargs) -> List[Dict]:
+        with self._lock:
+            documents = [dict(d) for d in self._documents if self._matches(d, filter)]
+        for field, direction in reversed(sort or []):
+            documents.sort(key=lambda d: (d.get(field) is not None, d.get(field)), reverse=direction < 0)
+        if limit:
+            documents = documents[:limit]
+        if projection:
+            # A dotted field keeps its whole top-level subdocument
+            included = {field.split('.')[0] for field, keep in projection.items() if keep}
+            excluded = {field for field, keep in projection.items() if not keep}
+            documents = [
+                {k: v for k, v in d.items() if (not included or k in included or k == '_id') and k not in excluded}
+                for d in documents
+            ]
+        return documents
+
+    def find_one(self, filter: Optional[Dict] = None, *args, **kwargs) -> Optional[Dict]:
+        documents = self.find(filter, *args, limit=1, **kwargs)
+        return documents[0] if documents else None
+
+    def count_documents(self, filter: Optional[Dict] = None, **kwargs) -> int:
+        with self._lock:
+            return sum(1 for d in self._documents if self._matches(d, filter))
+
+    @staticmethod
+    def _apply_update(document: Dict, update: Dict):
+        # $inc, $min, $max and $set on (dotted) field paths
+        for operator, fields in update.items():
+            for path, value in fields.items():
+                *parents, field = path.split('.')
+                target = document
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                current = target.get(field)
+                if operator == '$inc':
+                    target[field] = (current or 0) + value
+                elif operator == '$min':
+                    target[field] = value if current is None else min(current, value)
+                elif operator == '$max':
+                    target[field] = value if current is None else max(current, value)
+                elif operator == '$set':
+                    target[field] = value
+                else:
+                    raise NotImplementedError(f"{operator} is not supported by the in-memory stand-in")
+
+    def update_one(self, filter: Dict, update: Dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        with self._lock:
+            document = next((d for d in self._documents if self._matches(d, filter)), None)
+            upserted_id = None
+            if document is None:
+                if not upsert:
+                    return UpdateResult({'n': 0, 'nModified': 0}, True)
+                # Like MongoDB, an upsert starts from the equality conditions of the filter
+                document = {
+                    field: value for field, value in filter.items()
+                    if not (isinstance(value, dict) and any(op.startswith('$') for op in value))
+                }
+                self._apply_update(document, update)
+                index = self._duplicate_of(document)
+                if index is not None:
+                    raise DuplicateKeyError(f"E11000 duplicate key error index: {index}", 11000)
+                document['_id'] = ObjectId()
+                upserted_id = document['_id']
+                self._documents.append(document)
+            else:
+                self._apply_update(document, update)
+        return UpdateResult({'n': 1, 'nModified': 0 if upserted_id else 1, 'upserted': upserted_id}, True)
+
+    def bulk_write(self, requests: List[Any], ordered: bool = True) -> BulkWriteResult:
+        # Only UpdateOne requests
+        results = []
+        errors = []
+        for position, request in enumerate(requests):
+            try:
+                results.append(self.update_one(request._filter, request._doc, upsert=request._upsert))
+            except DuplicateKeyError as e:
+                errors.append({'index': position, 'code': 11000, 'errmsg': str(e)})
+                if ordered:
+                    break
+        details = {
+            'nMatched': sum(1 for r in results if r.upserted_id is None),
+            'nUpserted': sum(1 for r in results if r.upserted_id is not None),
+        }
+        if errors:
+            raise BulkWriteError(dict(details, writeErrors=errors))
+        return BulkWriteResult(details, True)
+
+
+class FaultInjectingCollection:
+    """Proxy that fails or delays calls to the wrapped collection"""
+
+    def __init__(self, collection: Any, error_rate: float = 0.0, latency_ms: float = 0.0):
+        self._collection = collection
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.injected_errors = 0
+        self.delayed_calls = 0
+
+    def configure(self, error_rate: Optional[float] = None, latency_ms: Optional[float] = None):
+        if error_rate is not None:
+            self.error_rate = min(1.0, max(0.0, error_rate))
+        if latency_ms is not None:
+            self.latency_ms = max(0.0, latency_ms)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def injected(*args, **kwargs):
+            if self.latency_ms:
+                self.delayed_calls += 1
+                time.sleep(self.latency_ms / 1000)
+            if self.error_rate and random.random() < self.error_rate:
+                self.injected_errors += 1
+                raise AutoReconnect(f"Injected fault in {name}")
+            return attr(*args, **kwargs)
+
+        return injected
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': type(self._collection).__name__,
+            'error_rate': self.error_rate,
+            'latency_ms': self.latency_ms,
+            'injected_errors': self.injected_errors,
+            'delayed_calls': self.delayed_calls,
+        }
@@ -0,0 +1,344 @@
+"""
+Item analysis: per-question difficulty and discrimination
+
+For every question of the answer sheet:
+
+    p_value          share of responses that took full marks (classical item difficulty)
+    options          how often each option was chosen
+    point_biserial   correlation of taking full marks with the rest score - the
+                     total of the other questions - so an item is not
+                     correlated with itself (corrected item-total correlation)
+    level_mix        share of responses per knowledge level of the chosen option
+
+All of it derives from a handful of additive counters per question (see
+count_items), so the same statistics come from two places: offline, by
+counting a whole respondents x questions option matrix at once - the
+training dataset, or export files - and incrementally, from item rollups
+that every saved assessment adds its counts to, with the same $inc upserts
+as the statistics rollups. GET /api/analytics/items and analyze_items.py
+serve the result.
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import ReplaceOne, UpdateOne
+
+from src.core.answer_key import AnswerKey
+from src.core.feedback import decode_answers
+from src.core.rollups import INSERT_LAG, RECONCILE_PASSES, _field_key, _nested
+
+ITEM_SOURCES = ('assessments', 'dataset')
+# Classical rules of thumb for flagging items, applied from MIN_RESPONSES responses on
+TOO_EASY_P = 0.9
+TOO_HARD_P = 0.2
+LOW_DISCRIMINATION = 0.2
+MIN_RESPONSES = 30
+
+# Per-question sums the statistics are computed from; all of them add up across batches
+SUM_FIELDS = ('responses', 'correct', 'rest_sum', 'rest_sq_sum', 'correct_rest_sum')
+
+
+def answer_key_from_sheet(path) -> AnswerKey:
+    """Answer key of an answer sheet file, as the service loads it"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return AnswerKey([q_item for q_item in data.get('questions', []) if q_item.get('question')])
+
+
+def empty_counts(answer_key: AnswerKey) -> Dict[str, np.ndarray]:
+    n_questions, n_options = answer_key.weights.shape
+    counts = {field: np.zeros(n_questions, dtype=np.float64) for field in SUM_FIELDS}
+    counts['options'] = np.zeros((n_questions, n_options), dtype=np.int64)
+    counts['levels'] = np.zeros((n_questions, len(answer_key.level_names)), dtype=np.int64)
+    return counts
+
+
+def count_items(answer_key: AnswerKey, cols: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Item counters of an option matrix.
+
+    ``cols`` has one row per respondent and one column per answer sheet
+    question, holding the chosen option index or -1 when unanswered.
+    """
+    counts = empty_counts(answer_key)
+    if not cols.size or not len(answer_key):
+        return counts
+    rows = np.broadcast_to(np.arange(len(answer_key), dtype=np.int32), cols.shape)
+    scored = answer_key.score(rows, cols)
+    answered = cols >= 0
+    correct = answered & (scored['scores'] == answer_key.max_score[None, :]) & (answer_key.max_score[None, :] > 0)
+    rest = (scored['total_score'][:, None] - scored['scores']).astype(np.float64)
+
+    counts['responses'] = answered.sum(axis=0).astype(np.float64)
+    counts['correct'] = correct.sum(axis=0).astype(np.float64)
+    counts['rest_sum'] = np.where(answered, rest, 0).sum(axis=0)
+    counts['rest_sq_sum'] = np.where(answered, rest * rest, 0).sum(axis=0)
+    counts['correct_rest_sum'] = np.where(correct, rest, 0).sum(axis=0)
+    question = np.nonzero(answered.T)[0]
+    np.add.at(counts['options'], (question, cols.T[answered.T]), 1)
+    np.add.at(counts['levels'], (question, scored['level_codes'].T[answered.T]), 1)
+    return counts
+
+
+def add_counts(total: Dict[str, np.ndarray], counts: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    for field, values in counts.items():
+        total[field] += values
+    return total
+
+
+# Option matrices
+
+def document_answers(answer_key: AnswerKey, documents: Iterable[Dict]) -> np.ndarray:
+    """Option matrix of stored assessment documents, from their compact or full feedback"""
+    documents = list(documents)
+    cols = np.full((len(documents), len(answer_key)), -1, dtype=np.int32)
+    for i, document in enumerate(documents):
+        feedback = document.get('feedback')
+        if feedback:
+            answers = ((item['q'], item['o']) for item in feedback.get('items') or [])
+        else:
+            # Saved before the compact form: resolve the chosen option by its text
+            answers = (
+                (item.get('question_id'), answer_key.resolve(item.get('question_id'), item.get('question_text'),
+                                                             None, item.get('selected_option'))[1])
+                for item in document.get('detailed_feedback') or []
+            )
+        for question_id, option_index in answers:
+            row = answer_key.row_for(question_id)
+            if row >= 0 and option_index is not None and 0 <= option_index < answer_key.option_counts[row]:
+                cols[i, row] = option_index
+    return cols
+
+
+def frame_answers(answer_key: AnswerKey, frame: pd.DataFrame) -> np.ndarray:
+    """
+    Option matrix of a table of responses: an export with its ``answers``
+    column, or the training dataset with one column of chosen option texts
+    per question
+    """
+    cols = np.full((len(frame), len(answer_key)), -1, dtype=np.int32)
+    if 'answers' in frame.columns:
+        for i, answers in enumerate(frame['answers'].fillna('')):
+            for question_id, option_index in decode_answers(answers):
+                row = answer_key.row_for(question_id)
+                if row >= 0 and 0 <= option_index < answer_key.option_counts[row]:
+                    cols[i, row] = option_index
+        return cols
+    for column in frame.columns:
+        row = answer_key.row_for(question_text=str(column))
+        if row < 0:
+            continue
+        # Resolved once per distinct answer text, then mapped over the whole column
+        values = frame[column].astype('string').fillna('')
+        lookup = {value: answer_key.resolve_option(row, value) for value in values.unique()}
+        cols[:, row] = values.map(lookup).to_numpy(dtype=np.int32)
+    return cols
+
+
+# Rollups
+
+def _item_fields(answer_key: AnswerKey, counts: Dict[str, np.ndarray], row: int) -> Dict[str, Any]:
+    """The counters of one question as dotted $inc fields"""
+    fields = {field: float(counts[field][row]) for field in SUM_FIELDS}
+    fields.update({f"options.{col}": int(count) for col, count in enumerate(counts['options'][row]) if count})
+    fields.update({f"levels.{_field_key(answer_key.level_names[code])}": int(count)
+                   for code, count in enumerate(counts['levels'][row]) if count})
+    return fields
+
+
+def item_rollup_updates(answer_key: AnswerKey, category: str, counts: Dict[str, np.ndarray]) -> List[UpdateOne]:
+    """One $inc upsert per question with responses in ``counts``"""
+    now = datetime.now()
+    return [
+        UpdateOne(
+            {'category': category, 'question_id': answer_key.question_ids[row]},
+            {'$inc': _item_fields(answer_key, counts, row), '$max': {'updated_at': now}},
+            upsert=True
+        )
+        for row in np.nonzero(counts['responses'])[0]
+    ]
+
+
+def apply_item_rollups(collection, answer_key: AnswerKey, category: str, documents: Iterable[Dict]) -> int:
+    """Add saved assessment documents to the item rollups, returning the number of questions touched"""
+    updates = item_rollup_updates(answer_key, category, count_items(answer_key, document_answers(answer_key, documents)))
+    if updates:
+        collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def rollup_counts(answer_key: AnswerKey, rollups: Iterable[Dict]) -> Dict[str, np.ndarray]:
+    """Item counters of stored item rollups; questions or options no longer on the answer sheet are left out"""
+    counts = empty_counts(answer_key)
+    level_codes = {_field_key(name): code for code, name in enumerate(answer_key.level_names)}
+    for rollup in rollups:
+        row = answer_key.row_for(rollup.get('question_id'))
+        if row < 0:
+            continue
+        for field in SUM_FIELDS:
+            counts[field][row] += rollup.get(field, 0)
+        for col, count in (rollup.get('options') or {}).items():
+            if int(col) < answer_key.option_counts[row]:
+                counts['options'][row, int(col)] += count
+        for level, count in (rollup.get('levels') or {}).items():
+            if level in level_codes:
+                counts['levels'][row, level_codes[level]] += count
+    return counts
+
+
+def rebuild_item_rollups(assessments, item_rollups, answer_key: AnswerKey, category: str, batch_size: int = 1000,
+                         indexes: Optional[List[Any]] = None, archived: Iterable[Dict] = ()) -> Dict[str, int]:
+    """
+    Recompute the item rollups from the assessments (and ``archived`` ones).
+
+    Counted in memory - a few numbers per question - then written to a side
+    collection that is swapped in with a rename. Assessments saved while the
+    rebuild ran are reconciled after the swap, as rebuild_rollups does.
+    """
+    started_at = datetime.now()
+    # Assessments from the cutoff on are counted after the swap, by reconcile_item_rollups
+    cutoff = started_at - INSERT_LAG
+    fields = {'_id': 0, 'feedback': 1, 'detailed_feedback': 1}
+    counts = empty_counts(answer_key)
+    folded = 0
+
+    def fold(documents) -> int:
+        count = 0
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                add_counts(counts, count_items(answer_key, document_answers(answer_key, batch)))
+                count += len(batch)
+                batch = []
+        if batch:
+            add_counts(counts, count_items(answer_key, document_answers(answer_key, batch)))
+            count += len(batch)
+        return count
+
+    folded += fold(archived)
+    folded += fold(assessments.find({'category': category, 'created_at': {'$lt': cutoff}}, fields,
+                                    batch_size=batch_size))
+    staging = item_rollups.database[f"{item_rollups.name}_rebuild"]
+    staging.drop()
+    if indexes:
+        staging.create_indexes(indexes)
+    updates = item_rollup_updates(answer_key, category, counts)
+    if updates:
+        staging.bulk_write(updates, ordered=False)
+    if updates or indexes:
+        staging.rename(item_rollups.name, dropTarget=True)
+    else:
+        item_rollups.drop()
+    recent, settled = reconcile_item_rollups(assessments, item_rollups, answer_key, category, counts, cutoff)
+    caught_up = sum(1 for document in recent if document['created_at'] >= started_at)
+    return {'assessments': folded + len(recent), 'caught_up': caught_up, 'questions': len(updates),
+            'settled': settled}
+
+
+def reconcile_item_rollups(assessments, item_rollups, answer_key: AnswerKey, category: str,
+                           counts: Dict[str, np.ndarray], since: datetime,
+                           passes: int = RECONCILE_PASSES) -> Tuple[List[Dict], bool]:
+    """
+    Replace the item rollups that differ from ``counts`` plus the assessments from ``since``.
+
+    ``counts`` are the counters of everything before ``since``: item rollups
+    span all days, so only the assessments after it are read again. Repeated
+    like reconcile_rollups until a pass finds every question matching, at
+    most ``passes`` times; returns the assessments of the last pass and
+    whether it matched.
+    """
+    fields = {'_id': 0, 'created_at': 1, 'feedback': 1, 'detailed_feedback': 1}
+    recent: List[Dict] = []
+    for _ in range(max(1, passes)):
+        recent = list(assessments.find({'category': category, 'created_at': {'$gte': since}}, fields))
+        expected = add_counts({field: values.copy() for field, values in counts.items()},
+                              count_items(answer_key, document_answers(answer_key, recent)))
+        stored = rollup_counts(answer_key, item_rollups.find({'category': category}, {'_id': 0}))
+        stale = [
+            row for row in range(len(answer_key))
+            if not all(np.allclose(expected[field][row], stored[field][row]) for field in expected)
+        ]
+        if not stale:
+            return recent, True
+        now = datetime.now()
+        item_rollups.bulk_write([
+            ReplaceOne(
+                {'category': category, 'question_id': answer_key.question_ids[row]},
+                dict(category=category, question_id=answer_key.question_ids[row],
+                     **_nested(_item_fields(answer_key, expected, row)), updated_at=now),
+                upsert=True
+            )
+            for row in stale
+        ], ordered=False)
+    return recent, False
+
+
+# Statistics
+
+def item_statistics(answer_key: AnswerKey, counts: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Per-question p-value, option distribution, point-biserial and level mix of item counters"""
+    responses = counts['responses']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_value = counts['correct'] / responses
+        rest_mean = counts['rest_sum'] / responses
+        rest_sd = np.sqrt(np.maximum(counts['rest_sq_sum'] / responses - rest_mean ** 2, 0))
+        covariance = counts['correct_rest_sum'] / responses - p_value * rest_mean
+        point_biserial = covariance / (np.sqrt(p_value * (1 - p_value)) * rest_sd)
+
+    questions = []
+    for row in range(len(answer_key)):
+        n = int(responses[row])
+        n_options = int(answer_key.option_counts[row])
+        keyed = answer_key.weights[row, :n_options] == answer_key.max_score[row]
+        item = {
+            'question_id': answer_key.question_ids[row],
+            'question': answer_key.question_texts[row],
+            'responses': n,
+            'p_value': _rounded(p_value[row]) if n else None,
+            'point_biserial': _rounded(point_biserial[row]) if n else None,
+            'options': [
+                {
+                    'option_index': col,
+                    'option': answer_key.option_texts[row][col],
+                    'full_marks': bool(keyed[col]),
+                    'count': int(counts['options'][row, col]),
+                    'share': round(counts['options'][row, col] / n, 4) if n else None,
+                }
+                for col in range(n_options)
+            ],
+            'level_mix': {
+                answer_key.level_names[code]: round(count / n, 4)
+                for code, count in enumerate(counts['levels'][row]) if count
+            },
+        }
+        item['flags'] = _flags(item)
+        questions.append(item)
+    return {
+        'questions': questions,
+        'total_questions': len(questions),
+        'responses': int(responses.max()) if len(responses) else 0,
+        'thresholds': {'too_easy_p': TOO_EASY_P, 'too_hard_p': TOO_HARD_P,
+                       'low_discrimination': LOW_DISCRIMINATION, 'min_responses': MIN_RESPONSES},
+    }
+
+
+def _flags(item: Dict[str, Any]) -> List[str]:
+    if item['responses'] < MIN_RESPONSES:
+        return []
+    flags = []
+    if item['p_value'] is not None and item['p_value'] > TOO_EASY_P:
+        flags.append('too_easy')
+    if item['p_value'] is not None and item['p_value'] < TOO_HARD_P:
+        flags.append('too_hard')
+    # No spread in either variable leaves the correlation undefined, which discriminates nothing either
+    if item['point_biserial'] is None or item['point_biserial'] < LOW_DISCRIMINATION:
+        flags.append('low_discrimination')
+    return flags
+
+
+def _rounded(value: float) -> Optional[float]:
+    return round(float(value), 4) if np.isfinite(value) else None
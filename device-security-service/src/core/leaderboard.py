@@ -0,0 +1,160 @@
+"""
+Organization leaderboards: latest score per user
+
+Every saved assessment upserts the user's entry in the leaderboard
+collection twice - under its organization (case-insensitive) and under
+ALL_ORGANIZATIONS - so a leaderboard is the first k entries of one
+(category, organization) through the leaderboard_top index, however long the
+assessment history. The upsert only matches an older entry of the user; when
+a newer one is already there it fails on the unique index and is dropped, so
+replays and backfills never overwrite a later score.
+
+LeaderboardCache keeps the sorted top entries of recently read
+organizations in memory and applies this worker's saves to them, so hot
+leaderboards are served as a slice without a query.
+"""
+import itertools
+import threading
+from bisect import insort
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.core.cache import MemoryCache
+
+ALL_ORGANIZATIONS = '*'
+ENTRY_FIELDS = ('email', 'name', 'organization_name', 'percentage', 'overall_knowledge_level', 'created_at')
+ENTRY_PROJECTION = {'_id': 0, **{field: 1 for field in ENTRY_FIELDS}}
+ENTRY_SORT = [('percentage', -1), ('created_at', 1)]
+
+
+def organization_key(organization: Optional[str]) -> str:
+    """Leaderboard an organization name belongs to; no name means the overall one only"""
+    return (organization or '').strip().lower() or ALL_ORGANIZATIONS
+
+
+def leaderboard_entry(document: Dict) -> Optional[Dict]:
+    """Leaderboard entry of a stored assessment document, or None without an email"""
+    if not document.get('email'):
+        return None
+    profile = document.get('user_profile') or {}
+    return {
+        'email': document['email'],
+        'name': (profile.get('name') or '').strip() or None,
+        'organization_name': document.get('organization'),
+        'percentage': float(document.get('percentage') or 0),
+        'overall_knowledge_level': document.get('overall_knowledge_level'),
+        'created_at': document.get('created_at') or datetime.now(),
+    }
+
+
+def leaderboard_updates(documents: Iterable[Dict]) -> List[Tuple[str, Dict, UpdateOne]]:
+    """``(organization, entry, upsert)`` for each leaderboard a document's user appears on"""
+    updates = []
+    for document in documents:
+        entry = leaderboard_entry(document)
+        if entry is None:
+            continue
+        for organization in {ALL_ORGANIZATIONS, organization_key(document.get('organization'))}:
+            updates.append((organization, entry, UpdateOne(
+                {'category': document.get('category'), 'organization': organization, 'email': entry['email'],
+                 'created_at': {'$lt': entry['created_at']}},
+                {'$set': entry},
+                upsert=True
+            )))
+    return updates
+
+
+def apply_leaderboard(collection, documents: Iterable[Dict]) -> List[Tuple[str, Dict]]:
+    """Upsert the users' latest scores, returning the ``(organization, entry)`` pairs that were newer"""
+    updates = leaderboard_updates(documents)
+    if not updates:
+        return []
+    try:
+        collection.bulk_write([update for _, _, update in updates], ordered=False)
+        stale = set()
+    except BulkWriteError as e:
+        # Duplicate key: a newer score of that user is already on the leaderboard
+        errors = e.details.get('writeErrors', [])
+        if any(error.get('code') != 11000 for error in errors):
+            raise
+        stale = {error['index'] for error in errors}
+    return [(organization, entry) for position, (organization, entry, _) in enumerate(updates)
+            if position not in stale]
+
+
+def backfill_leaderboard(assessments, leaderboard, batch_size: int = 1000,
+                         archived: Iterable[Dict] = ()) -> Dict[str, int]:
+    """
+    Upsert the score of every assessment in ``batch_size`` chunks, the
+    ``archived`` ones included.
+
+    Safe while the service keeps saving: an older score never replaces a
+    newer one, so the order assessments are read in does not matter.
+    """
+    fields = {'_id': 0, 'category': 1, 'email': 1, 'user_profile': 1, 'organization': 1,
+              'percentage': 1, 'overall_knowledge_level': 1, 'created_at': 1}
+    counts = {'assessments': 0, 'entries': 0}
+    batch = []
+    for document in itertools.chain(archived, assessments.find({}, fields, batch_size=batch_size)):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            counts['entries'] += len(apply_leaderboard(leaderboard, batch))
+            counts['assessments'] += len(batch)
+            batch = []
+    if batch:
+        counts['entries'] += len(apply_leaderboard(leaderboard, batch))
+        counts['assessments'] += len(batch)
+    return counts
+
+
+def _rank_key(entry: Dict) -> Tuple:
+    return -entry['percentage'], entry['created_at'], entry['email']
+
+
+class LeaderboardCache:
+    """Sorted top entries of recently read organizations, kept current by this worker's saves"""
+
+    def __init__(self, max_k: int = 100, max_organizations: int = 1000, ttl_seconds: float = 30):
+        self.max_k = max(1, max_k)
+        # Other workers' saves are only seen after an entry expires and is read again
+        self._boards = MemoryCache(max_organizations, ttl_seconds)
+        self._lock = threading.Lock()
+
+    def get(self, organization: str, k: int) -> Optional[List[Dict]]:
+        """The top ``k`` entries, or None when they are not all in memory"""
+        board = self._boards.get(organization)
+        if board is None:
+            return None
+        with self._lock:
+            if k > len(board['entries']) and not board['complete']:
+                return None
+            return [entry for _, entry in board['entries'][:k]]
+
+    def put(self, organization: str, entries: List[Dict], complete: bool):
+        """Cache the top entries as read from the leaderboard index; ``complete`` when there are no more"""
+        board = {'entries': [(_rank_key(entry), entry) for entry in entries[:self.max_k]],
+                 'complete': complete and len(entries) <= self.max_k}
+        with self._lock:
+            self._boards.put(organization, board)
+
+    def update(self, organization: str, entry: Dict):
+        """Apply a user's newer score to a cached board"""
+        board = self._boards.get(organization)
+        if board is None:
+            return
+        with self._lock:
+            entries = [item for item in board['entries'] if item[1]['email'] != entry['email']]
+            # Entries past the last one kept are unknown, so only place the score if it ranks among them
+            item = (_rank_key(entry), entry)
+            if board['complete'] or (entries and item < entries[-1]):
+                insort(entries, item)
+            if len(entries) > self.max_k:
+                del entries[self.max_k:]
+                board['complete'] = False
+            board['entries'] = entries
+
+    def stats(self) -> Dict[str, Any]:
+        return {'max_k': self.max_k, **self._boards.stats()}
@@ -0,0 +1,73 @@
+"""
+Move assessments older than ARCHIVE_AFTER_DAYS from MongoDB to the local Parquet archive
+Run this script from the project root directory
+
+    python archive_assessments.py                       # e.g. nightly from cron
+    python archive_assessments.py --older-than-days 90 --dry-run
+
+Segments land in ARCHIVE_DIR, partitioned by category and month. History,
+the previous attempt lookup and exports keep reading archived assessments;
+the statistics rollups and the leaderboard stay in MongoDB untouched. A run
+that was interrupted is completed by the next one.
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from pymongo import MongoClient
+
+from config.settings import settings
+from src.core.archive import ArchiveError, AssessmentArchive, archive_assessments
+from src.core.service import ModelService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--older-than-days', type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--category', default=ModelService.CATEGORY)
+    parser.add_argument('--batch-size', type=int, default=1000, help="documents read and deleted per round trip")
+    parser.add_argument('--segment-rows', type=int, default=settings.ARCHIVE_SEGMENT_ROWS,
+                        help="most assessments per segment file")
+    parser.add_argument('--dry-run', action='store_true', help="count what would be archived, change nothing")
+    args = parser.parse_args()
+
+    archive = AssessmentArchive(settings.get_absolute_path(settings.ARCHIVE_DIR), args.category,
+                                settings.ARCHIVE_ROW_GROUP_ROWS)
+
+    # Talk to MongoDB directly: no circuit breaker or fault injection for an archival run
+    client = MongoClient(settings.MONGO_URI)
+    collection = client.get_default_database()[settings.MONGO_COLLECTION]
+    try:
+        client.admin.command('ping')
+    except Exception as e:
+        print(f"❌ MongoDB not reachable: {e}")
+        return 1
+
+    cutoff = datetime.now() - timedelta(days=max(0, args.older_than_days))
+    print(f"📁 {collection.full_name} -> {archive.path} (saved before {cutoff:%Y-%m-%d %H:%M})")
+    started = time.perf_counter()
+    try:
+        counts = archive_assessments(collection, archive, cutoff, max(1, args.batch_size),
+                                     max(1, args.segment_rows), dry_run=args.dry_run)
+    except ArchiveError as e:
+        print(f"❌ {e}")
+        return 1
+    if args.dry_run:
+        print(f"🔎 Would archive {counts['archived']} assessments "
+              f"({counts['already_archived']} already archived would only be deleted)")
+        return 0
+    print(f"✅ Archived {counts['archived']} assessments into {counts['segments']} segments and deleted "
+          f"{counts['deleted']} from MongoDB ({counts['already_archived']} were already archived) "
+          f"in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,38 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, Header, HTTPException, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
-from typing import List
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
 import sys
 from pathlib import Path
 from dotenv import load_dotenv
+import numpy as np
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.api.models import (
     Question, AssessmentSubmission, AssessmentResult,
-    QuestionFeedback, HealthCheck, UserProfile
+    QuestionFeedback, HealthCheck, UserProfile, BatchAssessmentResult, UserAnswer,
+    CompactAssessmentSubmission, CompactAssessmentResult, CompactQuestionFeedback
 )
 from src.core.service import model_service
+from src.core.executor import worker_pool
+from src.core.loop_monitor import loop_monitor
+from src.core.admission import AdmissionRejected, admission
+from src.core.deadline import ML_PENDING, SAVE_DEFERRED, Deadline, deferred_work
+from src.core.idempotency import IdempotencyConflict, IdempotencyGuard, submission_fingerprint
+from src.core.cache import cache_key
+from src.core.single_flight import SingleFlightCache
+from src.core.rollups import rollup_query
+from src.core.item_analysis import ITEM_SOURCES
+from src.core.statistics import summarize_statistics
+from src.core.history import history_query, improvement, parse_fields, previous_attempt
+from src.core.feedback import compact_feedback
+from src.core.export import EXPORT_FORMATS, MEDIA_TYPES, ExportError, encode_export, export_query, parse_date_bound
+from src.core.circuit_breaker import CircuitOpenError
+from src.core.csv_grading import CsvGrader, CsvUploadError, CsvUploadReader, format_results
 from config.settings import settings
 
 load_dotenv()
@@ -32,6 +51,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Question-Set-Version", "Idempotent-Replayed"],
 )
 
 
@@ -44,6 +64,22 @@ async def startup_event():
         print("⚠️ Warning: Some components failed to load")
     else:
         print("✅ All components loaded successfully")
+    worker_pool.start_processes()
+    await worker_pool.run(model_service.sync_score_distribution)
+    model_service.score_distribution.start(
+        lambda: worker_pool.run(model_service.sync_score_distribution), settings.PERCENTILE_SYNC_SECONDS
+    )
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Finish deferred assessment work, then stop the worker pools and the event loop monitor"""
+    await deferred_work.drain(settings.DEFERRED_DRAIN_SECONDS)
+    model_service.score_distribution.stop()
+    loop_monitor.stop()
+    worker_pool.shutdown()
 
 
 @app.get("/", tags=["Root"])
@@ -66,12 +102,45 @@ async def health_check():
         status="healthy" if all(status_info.values()) else "degraded",
         timestamp=datetime.now().isoformat(),
         model_loaded=status_info['model_loaded'],
-        components_status=status_info
+        components_status=status_info,
+        database_circuit=model_service.mongo_breaker.state
     )
 
 
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    """Service metrics: caches, worker pool, event loop lag, admission control, deferred work,
+    idempotency, statistics cache, percentile distribution, leaderboard cache and database"""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "caches": model_service.cache_stats(),
+        "worker_pool": worker_pool.stats(),
+        "event_loop": loop_monitor.stats(),
+        "admission": admission.stats(),
+        "deadlines": deferred_work.stats(),
+        "idempotency": idempotency.stats(),
+        "statistics": stats_refresh.stats(),
+        "percentiles": model_service.score_distribution.stats(),
+        "leaderboard": model_service.leaderboard_cache.stats(),
+        "database": model_service.database_status()
+    }
+
+
+if settings.MONGO_FAULT_INJECTION:
+    @app.post("/debug/mongo-faults", tags=["Debug"])
+    async def configure_mongo_faults(data: dict):
+        """
+        Change the injected MongoDB error rate and latency at runtime
+        
+        Only available when MONGO_FAULT_INJECTION is enabled. Body fields:
+        **error_rate** (0-1) and **latency_ms**; omitted fields keep their value.
+        """
+        model_service.fault_injector.configure(data.get('error_rate'), data.get('latency_ms'))
+        return model_service.database_status()
+
+
 @app.get("/api/questions", response_model=List[Question], tags=["Assessment"])
-async def get_questions():
+async def get_questions(response: Response):
     """Get all password security assessment questions"""
     try:
         questions = model_service.get_questions()
@@ -82,6 +151,8 @@ async def get_questions():
                 detail="Questions not available. Please ensure answer sheet is loaded."
             )
         
+        # Clients echo this back when submitting to /api/assess/compact
+        response.headers["X-Question-Set-Version"] = model_service.answer_key.version
         return questions
         
     except Exception as e:
@@ -91,84 +162,444 @@ async def get_questions():
         )
 
 
-@app.post("/api/assess", response_model=AssessmentResult, tags=["Assessment"])
-async def submit_assessment(submission: AssessmentSubmission):
+# Repeated submissions get the stored result instead of being graded and saved again
+idempotency = IdempotencyGuard(model_service.idempotency_cache, settings.IDEMPOTENCY_WINDOW_SECONDS)
+
+
+async def request_deadline(x_request_deadline_ms: Optional[float] = Header(None)) -> Deadline:
+    """Start the request's time budget; X-Request-Deadline-Ms overrides the configured one"""
+    return Deadline.for_request(x_request_deadline_ms)
+
+
+async def acquire_admission():
+    """Take an admission slot, answering with 503/429 and Retry-After when none is available"""
+    try:
+        await admission.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+async def admit_assessment(deadline: Deadline = Depends(request_deadline)):
+    """
+    Hold an admission slot for the duration of an assessment request
+    
+    Depends on the deadline so that its clock also covers the admission wait.
+    Streaming endpoints use AdmittedStreamingResponse instead: dependency
+    teardown runs before a streamed body is sent, which would free the slot
+    before any of the grading happened.
+    """
+    await acquire_admission()
+    try:
+        yield
+    finally:
+        admission.release()
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streamed response holding the admission slot its handler acquired
+    
+    The slot is released once the body has been sent, or sending has been
+    abandoned because the client disconnected or the body raised.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission.release()
+
+
+@app.post("/api/assess", response_model=AssessmentResult, tags=["Assessment"],
+          dependencies=[Depends(admit_assessment)])
+async def submit_assessment(submission: AssessmentSubmission, response: Response,
+                            deadline: Deadline = Depends(request_deadline),
+                            idempotency_key: Optional[str] = Header(None)):
     """Submit assessment answers and get detailed results with ML-powered personalized feedback"""
     try:
-        detailed_feedback = []
-        total_score = 0
-        max_score = 0
+        if not settings.IDEMPOTENCY_ENABLED:
+            return await _assess_within_deadline(submission, deadline)
         
-        for answer in submission.answers:
-            result = model_service.calculate_score(
-                answer.question_text,
-                answer.selected_option
-            )
-            
-            score = result['score']
-            level = result['level']
-            total_score += score
-            
-            question_options = model_service.answer_sheet.get(answer.question_text, {})
-            if question_options:
-                max_score += max(opt['weight'] for opt in question_options.values())
-            
-            explanation = model_service.get_explanation(
-                answer.question_id,
-                chr(65 + answer.selected_option_index),
-                submission.user_profile.dict()
+        fingerprint = submission_fingerprint(
+            submission.user_profile.dict(),
+            [(ans.question_id, ans.selected_option_index, ans.selected_option) for ans in submission.answers]
+        )
+        
+        async def assess(key: str) -> Dict:
+            return (await _assess_within_deadline(submission, deadline, key)).dict()
+        
+        # A pending, deferred or failed save is not replayed: retries grade again until one is saved
+        result, replayed = await idempotency.run(
+            idempotency.keys(submission.user_profile.email, fingerprint, idempotency_key), fingerprint, assess,
+            cacheable=lambda result: result['saved_to_database'] is True
+        )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return AssessmentResult(**result)
+        
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing assessment: {str(e)}"
+        )
+
+
+async def _assess_within_deadline(submission: AssessmentSubmission, deadline: Deadline,
+                                  idempotency_key: Optional[str] = None) -> AssessmentResult:
+    """
+    Grade, persist and build the result for a single submission within its deadline
+
+    Rule-based scoring and explanations always complete. ML inference and the
+    MongoDB write only get the budget that is left; when they overrun, the
+    result reports them as pending / deferred and they finish in the background.
+    """
+    # The previous attempt is read while this one is scored; it is saved only after both
+    previous_lookup = asyncio.ensure_future(
+        worker_pool.run(model_service.find_previous_attempt, submission.user_profile.email)
+    )
+    # Scoring, inference and the Mongo write run on the worker pool, off the event loop
+    graded, ml_inputs = await worker_pool.run(_grade_rule_based, submission)
+    ml_task = None
+    if ml_inputs is not None:
+        finished, outcome = await deadline.run(worker_pool.run(_complete_grading, submission, graded, *ml_inputs))
+        if finished:
+            graded = outcome
+        else:
+            ml_task = outcome
+    
+    detailed_feedback = [
+        QuestionFeedback(
+            question_id=answer.question_id,
+            question_text=answer.question_text,
+            selected_option=answer.selected_option,
+            **feedback
+        )
+        for answer, feedback in zip(submission.answers, graded['feedback'])
+    ]
+    
+    db_record = {
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "email": submission.user_profile.email,
+        "name": submission.user_profile.name,
+        "organization": submission.user_profile.organization,
+        "gender": submission.user_profile.gender,
+        "education_level": submission.user_profile.education_level,
+        "proficiency": submission.user_profile.proficiency,
+        "total_score": graded['total_score'],
+        "max_score": graded['max_score'],
+        "percentage": graded['percentage'],
+        "overall_knowledge_level": graded['overall_knowledge_level'],
+        "ml_awareness_level": graded.get('ml_awareness_level'),
+        "ml_confidence": graded.get('ml_confidence'),
+        "feedback": compact_feedback(
+            model_service.answer_key, model_service.explanation_bank_version, submission.answers,
+            [(feedback['score'], feedback['max_score'], feedback['level']) for feedback in graded['feedback']]
+        ),
+        "category": "Password Security",
+        "idempotency_key": idempotency_key
+    }
+    
+    # A lookup that overruns the deadline is dropped from the response
+    finished, outcome = await deadline.run(previous_lookup)
+    previous = previous_attempt(outcome) if finished else None
+    
+    # Ranked before the save adds this score to the distribution, so it is not ranked against itself
+    percentile_rank = model_service.score_distribution.percentile_rank(graded['percentage'])[0]
+    
+    if ml_task is not None:
+        # The stored record should carry the ML level, so the save waits for inference in the background
+        deferred_work.defer('ml_inference', _save_after_inference(ml_task, db_record))
+        saved = SAVE_DEFERRED
+    else:
+        finished, outcome = await deadline.run(worker_pool.run(model_service.save_assessment, db_record))
+        if finished:
+            saved = outcome
+        else:
+            deferred_work.defer('save', outcome)
+            saved = SAVE_DEFERRED
+    
+    message = "Assessment completed successfully with ML-based analysis!"
+    if ml_task is not None:
+        message = "Assessment scored; ML analysis is still running and the result will be saved shortly."
+    elif saved == SAVE_DEFERRED:
+        message = "Assessment completed with ML-based analysis; saving will finish shortly."
+    
+    result = AssessmentResult(
+        timestamp=datetime.now().isoformat(),
+        user_profile=submission.user_profile,
+        total_score=graded['total_score'],
+        max_score=graded['max_score'],
+        percentage=graded['percentage'],
+        overall_knowledge_level=graded['overall_knowledge_level'],
+        detailed_feedback=detailed_feedback,
+        ml_awareness_level=ML_PENDING if ml_task is not None else graded['ml_awareness_level'],
+        ml_confidence=graded.get('ml_confidence'),
+        ml_recommendations=graded.get('ml_recommendations'),
+        percentile_rank=percentile_rank,
+        previous_attempt=previous,
+        improvement=improvement(graded['percentage'], previous['percentage'] if previous else None),
+        saved_to_database=saved,
+        message=message
+    )
+    
+    return result
+
+
+def _grade_rule_based(submission: AssessmentSubmission) -> Tuple[Dict, Optional[Tuple]]:
+    """
+    Resolve and score one submission (blocking)
+    
+    Identical answer patterns with the same demographics grade identically, so
+    a cached grading comes back complete. Otherwise only the rule-based part is
+    graded here and the inputs for the ML prediction are returned with it.
+    """
+    rows, cols = _resolve_answers([submission])
+    user_profile = submission.user_profile.dict()
+    
+    cache_key = model_service.result_cache_key(rows[0], cols[0], user_profile)
+    graded = model_service.result_cache.get(cache_key) if cache_key else None
+    if graded is not None:
+        return graded, None
+    return _grade_answers(submission, rows, cols, user_profile), (rows, cols, user_profile, cache_key)
+
+
+def _complete_grading(submission: AssessmentSubmission, graded: Dict, rows: np.ndarray, cols: np.ndarray,
+                      user_profile: Dict, cache_key: Optional[str]) -> Dict:
+    """Add the ML prediction to a rule-based grading and cache the complete result (blocking)"""
+    graded = dict(graded, **_predict_awareness(submission, rows, cols, user_profile))
+    if cache_key:
+        model_service.result_cache.put(cache_key, graded)
+    return graded
+
+
+async def _save_after_inference(ml_task: asyncio.Task, db_record: Dict) -> bool:
+    """Wait for a deferred ML prediction, then save the assessment with it"""
+    graded = await ml_task
+    db_record.update(ml_awareness_level=graded['ml_awareness_level'], ml_confidence=graded['ml_confidence'])
+    return await worker_pool.run(model_service.save_assessment, db_record)
+
+
+@app.post("/api/assess/compact", response_model=CompactAssessmentResult, tags=["Assessment"],
+          dependencies=[Depends(admit_assessment)])
+async def submit_assessment_compact(submission: CompactAssessmentSubmission, response: Response,
+                                    deadline: Deadline = Depends(request_deadline),
+                                    idempotency_key: Optional[str] = Header(None)):
+    """
+    Submit an assessment in the compact, index-based format
+    
+    Send **question_ids** and **option_indices** (as served by /api/questions)
+    instead of full question and option texts. The response references
+    questions by id and options by index rather than echoing their texts.
+    
+    Pass the **X-Question-Set-Version** header value of /api/questions as
+    **question_set_version**; a stale version is rejected with 409 so the
+    client can refetch the questions.
+    """
+    answer_key = model_service.answer_key
+    if submission.question_set_version and submission.question_set_version != answer_key.version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Question set version {submission.question_set_version} is outdated, "
+                   f"current version is {answer_key.version}"
+        )
+    if len(submission.question_ids) != len(submission.option_indices):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="question_ids and option_indices must have the same length"
+        )
+    
+    answers = []
+    rows = []
+    invalid = []
+    for question_id, option_index in zip(submission.question_ids, submission.option_indices):
+        row = answer_key.row_for(question_id)
+        if row < 0 or not 0 <= option_index < answer_key.option_counts[row]:
+            invalid.append(f"{question_id}:{option_index}")
+            continue
+        rows.append(row)
+        answers.append(UserAnswer(
+            question_id=question_id,
+            question_text=answer_key.question_texts[row],
+            selected_option=answer_key.option_texts[row][option_index],
+            selected_option_index=option_index
+        ))
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown question ids or option indices: {', '.join(invalid)}"
+        )
+    
+    result = await submit_assessment(
+        AssessmentSubmission(user_profile=submission.user_profile, answers=answers),
+        response, deadline, idempotency_key
+    )
+    
+    return CompactAssessmentResult(
+        question_set_version=answer_key.version,
+        timestamp=result.timestamp,
+        email=result.user_profile.email,
+        total_score=result.total_score,
+        max_score=result.max_score,
+        percentage=result.percentage,
+        overall_knowledge_level=result.overall_knowledge_level,
+        feedback=[
+            CompactQuestionFeedback(
+                question_id=feedback.question_id,
+                option_index=answer.selected_option_index,
+                score=feedback.score,
+                max_score=int(answer_key.max_score[row]),
+                level=feedback.level,
+                explanation=feedback.explanation,
+                enhancement_advice=feedback.enhancement_advice
             )
-            
-            enhancement = model_service.get_enhancement_advice(
-                answer.question_text,
-                level
+            for feedback, answer, row in zip(result.detailed_feedback, answers, rows)
+        ],
+        ml_awareness_level=result.ml_awareness_level,
+        ml_confidence=result.ml_confidence,
+        ml_recommendations=result.ml_recommendations,
+        percentile_rank=result.percentile_rank,
+        previous_attempt=result.previous_attempt,
+        improvement=result.improvement,
+        saved_to_database=result.saved_to_database
+    )
+
+
+def _resolve_answers(submissions: List[AssessmentSubmission]) -> Tuple[np.ndarray, np.ndarray]:
+    """Map submitted answers to answer sheet (row, option) indices, -1 where unknown"""
+    return model_service.answer_key.resolve_batch([
+        [
+            (ans.question_id, ans.question_text, ans.selected_option_index, ans.selected_option)
+            for ans in submission.answers
+        ]
+        for submission in submissions
+    ])
+
+
+def _grade_answers(submission: AssessmentSubmission, rows: np.ndarray, cols: np.ndarray,
+                   user_profile: Dict) -> Dict:
+    """Score and explain one resolved submission (everything but the per-user fields and ML)"""
+    answer_key = model_service.answer_key
+    scored = answer_key.score(rows, cols)
+    total_score = int(scored['total_score'][0])
+    max_score = int(scored['max_score'][0])
+    
+    feedback = []
+    for j, answer in enumerate(submission.answers):
+        level = answer_key.level_names[scored['level_codes'][0, j]]
+        feedback.append({
+            'score': int(scored['scores'][0, j]),
+            'max_score': int(scored['question_max'][0, j]),
+            'level': level,
+            'explanation': model_service.get_explanation(
+                answer_key.question_id_for(rows[0, j], answer.question_id),
+                answer_key.option_label(rows[0, j], cols[0, j], answer.selected_option_index),
+                user_profile
+            ),
+            'enhancement_advice': model_service.get_enhancement_advice(answer.question_text, level)
+        })
+    
+    percentage = (total_score / max_score * 100) if max_score > 0 else 0
+    
+    return {
+        'total_score': total_score,
+        'max_score': max_score,
+        'percentage': round(percentage, 2),
+        'overall_knowledge_level': model_service.get_overall_level(percentage),
+        'feedback': feedback
+    }
+
+
+def _predict_awareness(submission: AssessmentSubmission, rows: np.ndarray, cols: np.ndarray,
+                       user_profile: Dict) -> Dict:
+    """ML awareness prediction and recommendations for one resolved submission"""
+    answer_key = model_service.answer_key
+    ml_awareness_level = None
+    ml_confidence = None
+    ml_recommendations = None
+    try:
+        answers_for_ml = [
+            {
+                'question_text': ans.question_text,
+                'selected_option': answer_key.option_text(rows[0, j], cols[0, j], ans.selected_option)
+            }
+            for j, ans in enumerate(submission.answers)
+        ]
+        ml_awareness_level, ml_confidence = model_service.predict_awareness_level(answers_for_ml, user_profile)
+        if ml_awareness_level != "Unknown":
+            ml_recommendations = model_service.get_ml_based_recommendations(
+                ml_awareness_level, ml_confidence, user_profile
             )
-            
+    except Exception as e:
+        print(f"⚠️ ML prediction failed: {e}")
+    
+    return {
+        'ml_awareness_level': ml_awareness_level,
+        'ml_confidence': round(ml_confidence, 4) if ml_confidence else None,
+        'ml_recommendations': ml_recommendations
+    }
+
+def _grade_submissions(submissions: List[AssessmentSubmission]) -> Tuple[List[AssessmentResult], List[Dict]]:
+    """
+    Grade many submissions with vectorized scoring and one batched model prediction
+    
+    Runs on the worker pool, possibly in a process forked before the score
+    distribution was synced, so percentile ranks are left to _rank_results.
+    """
+    answer_key = model_service.answer_key
+    rows, cols = _resolve_answers(submissions)
+    scored = answer_key.score(rows, cols)
+    percentages = answer_key.percentages(scored['total_score'], scored['max_score'])
+    predictions = model_service.predict_awareness_batch([
+        [answer_key.option_text(rows[i, j], cols[i, j], ans.selected_option)
+         for j, ans in enumerate(submission.answers)]
+        for i, submission in enumerate(submissions)
+    ])
+    
+    now = datetime.now()
+    results = []
+    db_records = []
+    for i, submission in enumerate(submissions):
+        user_profile = submission.user_profile.dict()
+        detailed_feedback = []
+        for j, answer in enumerate(submission.answers):
+            level = answer_key.level_names[scored['level_codes'][i, j]]
             detailed_feedback.append(
                 QuestionFeedback(
                     question_id=answer.question_id,
                     question_text=answer.question_text,
                     selected_option=answer.selected_option,
-                    score=score,
-                    max_score=max_score,
+                    score=int(scored['scores'][i, j]),
+                    max_score=int(scored['question_max'][i, j]),
                     level=level,
-                    explanation=explanation,
-                    enhancement_advice=enhancement
+                    explanation=model_service.get_explanation(
+                        answer_key.question_id_for(rows[i, j], answer.question_id),
+                        answer_key.option_label(rows[i, j], cols[i, j], answer.selected_option_index),
+                        user_profile
+                    ),
+                    enhancement_advice=model_service.get_enhancement_advice(answer.question_text, level)
                 )
             )
         
-        percentage = (total_score / max_score * 100) if max_score > 0 else 0
+        total_score = int(scored['total_score'][i])
+        max_score = int(scored['max_score'][i])
+        percentage = round(float(percentages[i]), 2)
         overall_level = model_service.get_overall_level(percentage)
-        
-        ml_awareness_level = None
-        ml_confidence = None
+        ml_awareness_level, ml_confidence = predictions[i]
         ml_recommendations = None
-        
-        try:
-            answers_for_ml = [
-                {
-                    'question_text': ans.question_text,
-                    'selected_option': ans.selected_option
-                }
-                for ans in submission.answers
-            ]
-            
-            ml_awareness_level, ml_confidence = model_service.predict_awareness_level(
-                answers_for_ml,
-                submission.user_profile.dict()
+        if ml_awareness_level != "Unknown":
+            ml_recommendations = model_service.get_ml_based_recommendations(
+                ml_awareness_level, ml_confidence, user_profile
             )
-            
-            if ml_awareness_level != "Unknown":
-                ml_recommendations = model_service.get_ml_based_recommendations(
-                    ml_awareness_level,
-                    ml_confidence,
-                    submission.user_profile.dict()
-                )
-        except Exception as e:
-            print(f"⚠️ ML prediction failed: {e}")
+        ml_confidence = round(ml_confidence, 4) if ml_confidence else None
         
-        db_record = {
-            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        db_records.append({
+            "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'),
             "email": submission.user_profile.email,
             "name": submission.user_profile.name,
             "organization": submission.user_profile.organization,
@@ -177,38 +608,422 @@ async def submit_assessment(submission: AssessmentSubmission):
             "proficiency": submission.user_profile.proficiency,
             "total_score": total_score,
             "max_score": max_score,
-            "percentage": round(percentage, 2),
+            "percentage": percentage,
             "overall_knowledge_level": overall_level,
             "ml_awareness_level": ml_awareness_level,
-            "ml_confidence": round(ml_confidence, 4) if ml_confidence else None,
+            "ml_confidence": ml_confidence,
+            "feedback": compact_feedback(
+                answer_key, model_service.explanation_bank_version, submission.answers,
+                [(feedback.score, feedback.max_score, feedback.level) for feedback in detailed_feedback],
+                zip(rows[i], cols[i])
+            ),
             "category": "Password Security"
-        }
+        })
+        results.append(
+            AssessmentResult(
+                timestamp=now.isoformat(),
+                user_profile=submission.user_profile,
+                total_score=total_score,
+                max_score=max_score,
+                percentage=percentage,
+                overall_knowledge_level=overall_level,
+                detailed_feedback=detailed_feedback,
+                ml_awareness_level=ml_awareness_level,
+                ml_confidence=ml_confidence,
+                ml_recommendations=ml_recommendations,
+                saved_to_database=False,
+                message="Assessment completed successfully with ML-based analysis!"
+            )
+        )
+    
+    return results, db_records
+
+
+def _rank_results(results: List[AssessmentResult]) -> List[AssessmentResult]:
+    """
+    Fill in percentile ranks from this worker's score distribution, which is
+    kept in sync; called before the results are saved, which adds them to it
+    """
+    for result in results:
+        result.percentile_rank = model_service.score_distribution.percentile_rank(result.percentage)[0]
+    return results
+
+
+def _batch_chunks(submissions: List[AssessmentSubmission]) -> List[List[AssessmentSubmission]]:
+    chunk_size = max(1, settings.BATCH_CHUNK_SIZE)
+    return [submissions[start:start + chunk_size] for start in range(0, len(submissions), chunk_size)]
+
+
+async def _stream_graded_submissions(submissions: List[AssessmentSubmission]) -> AsyncIterator[str]:
+    """Grade and persist a batch chunk by chunk, yielding one NDJSON line per result"""
+    for chunk in _batch_chunks(submissions):
+        results, db_records = await worker_pool.run_cpu(_grade_submissions, chunk)
+        _rank_results(results)
+        saved = await worker_pool.run(model_service.save_assessments, db_records) == len(db_records)
+        for result in results:
+            result.saved_to_database = saved
+            yield result.model_dump_json() + "\n"
+
+
+@app.post("/api/assess/batch", response_model=BatchAssessmentResult, tags=["Assessment"])
+async def submit_assessment_batch(submissions: List[AssessmentSubmission], request: Request, stream: bool = False):
+    """
+    Grade many assessment submissions in one request
+    
+    Intended for classroom and workforce sessions that submit results in bulk.
+    Scoring is vectorized against the compiled answer sheet, awareness levels
+    come from a single batched model prediction and results are persisted with
+    one bulk insert.
+    
+    **Body**: JSON array of assessment submissions (same shape as `/api/assess`)
+    
+    **Streaming**: pass `?stream=true` or `Accept: application/x-ndjson` to receive
+    one JSON result per line as chunks are graded, instead of a single document.
+    """
+    if len(submissions) > settings.BATCH_MAX_SUBMISSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch too large: {len(submissions)} submissions (max {settings.BATCH_MAX_SUBMISSIONS})"
+        )
+    
+    await acquire_admission()
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        return AdmittedStreamingResponse(
+            _stream_graded_submissions(submissions),
+            media_type="application/x-ndjson"
+        )
+    
+    try:
+        # Chunks are graded concurrently on the worker pool (processes when configured)
+        graded = await asyncio.gather(*(
+            worker_pool.run_cpu(_grade_submissions, chunk) for chunk in _batch_chunks(submissions)
+        ))
+        results = _rank_results([result for chunk_results, _ in graded for result in chunk_results])
+        db_records = [record for _, chunk_records in graded for record in chunk_records]
+        saved_count = await worker_pool.run(model_service.save_assessments, db_records)
+        for result in results:
+            result.saved_to_database = saved_count == len(db_records)
+        
+        return BatchAssessmentResult(
+            total_submissions=len(results),
+            saved_count=saved_count,
+            results=results
+        )
         
-        saved = model_service.save_assessment(db_record)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing assessment batch: {str(e)}"
+        )
+    finally:
+        admission.release()
+
+
+@app.post("/api/assess/upload", tags=["Assessment"])
+async def upload_assessment_csv(request: Request, format: str = "csv"):
+    """
+    Grade a survey export CSV and stream the graded rows back
+    
+    The CSV uses the training data layout: `gender`, `proficiency`, `education`
+    (optionally `email`, `name`, `organization`) followed by one column per
+    question text holding the selected option text.
+    
+    Send it as `multipart/form-data` (field `file`) or as a raw `text/csv` body.
+    Rows are parsed while the upload streams in and graded in chunks of
+    `UPLOAD_CHUNK_ROWS` with vectorized scoring and one batched model
+    prediction per chunk, so memory use does not grow with the file size.
+    Graded rows are not saved to the database.
+    
+    **Output**: CSV by default; pass `?format=ndjson` or `Accept: application/x-ndjson`
+    for one JSON object per row.
+    """
+    await acquire_admission()
+    try:
+        reader = CsvUploadReader(request.stream(), request.headers.get("content-type", ""))
+        grader = CsvGrader(model_service, await reader.read_header())
+    except CsvUploadError as e:
+        admission.release()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid survey upload: {str(e)}"
+        )
+    except BaseException:
+        admission.release()
+        raise
+    
+    output_format = "ndjson" if format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "") else "csv"
+    
+    async def graded_rows():
+        if output_format == "csv":
+            yield format_results([], grader.fieldnames, output_format, include_header=True)
+        next_row = 1
+        async for records in reader.batches(settings.UPLOAD_CHUNK_ROWS):
+            results = await worker_pool.run(grader.grade, records, first_row=next_row)
+            next_row += len(records)
+            yield format_results(results, grader.fieldnames, output_format)
+    
+    if output_format == "ndjson":
+        return AdmittedStreamingResponse(graded_rows(), media_type="application/x-ndjson")
+    return AdmittedStreamingResponse(
+        graded_rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=graded_assessments.csv"}
+    )
+
+
+# Dashboards poll this; the rollups are re-read at most once per STATS_CACHE_TTL_SECONDS per worker
+stats_refresh = SingleFlightCache(model_service.stats_cache, settings.STATS_CACHE_TTL_SECONDS)
+
+
+def _compute_statistics(organization: Optional[str], since: Optional[str]) -> Dict:
+    query = rollup_query(model_service.CATEGORY, organization, since)
+    return summarize_statistics(model_service.read_rollups(query))
+
+
+@app.get("/api/stats", tags=["Statistics"])
+async def get_statistics(organization: Optional[str] = None, days: Optional[int] = None):
+    """
+    Get overall assessment statistics
+    
+    Count, mean, spread and percentiles of the percentage score plus the
+    knowledge and ML awareness level distributions, merged from the daily
+    statistics rollups rather than scanned from every assessment.
+    Optionally limited to one **organization** and/or the last **days**
+    days. Served from a short-lived cache that a single query refreshes, so
+    the figures may be up to STATS_CACHE_TTL_SECONDS old (see
+    **cache_age_seconds**).
+    """
+    if days is not None and days < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="days must be at least 1"
+        )
+    since = (datetime.now() - timedelta(days=days - 1)).date().isoformat() if days else None
+    try:
+        entry = await stats_refresh.get(
+            cache_key(organization or '', since or ''),
+            lambda: worker_pool.run(_compute_statistics, organization, since)
+        )
+        generated_at = datetime.fromtimestamp(entry['computed_at'])
+        return {
+            **entry['value'],
+            "generated_at": generated_at.isoformat(),
+            "cache_age_seconds": round((datetime.now() - generated_at).total_seconds(), 1)
+        }
         
-        result = AssessmentResult(
-            timestamp=datetime.now().isoformat(),
-            user_profile=submission.user_profile,
-            total_score=total_score,
-            max_score=max_score,
-            percentage=round(percentage, 2),
-            overall_knowledge_level=overall_level,
-            detailed_feedback=detailed_feedback,
-            ml_awareness_level=ml_awareness_level,
-            ml_confidence=round(ml_confidence, 4) if ml_confidence else None,
-            ml_recommendations=ml_recommendations,
-            saved_to_database=saved,
-            message="Assessment completed successfully with ML-based analysis!"
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving statistics: {str(e)}"
+        )
+
+
+@app.get("/api/percentile", tags=["Statistics"])
+async def get_percentile_rank(score: float, organization: Optional[str] = None, gender: Optional[str] = None,
+                              education_level: Optional[str] = None, proficiency: Optional[str] = None):
+    """
+    Get the percentile rank of a score
+    
+    The percentage of saved assessments in this category that scored below
+    **score** (0-100), optionally among one **organization**, **gender**,
+    **education_level** or **proficiency** group only. Answered from
+    in-memory score histograms; **percentile_rank** is null while the group
+    has fewer than PERCENTILE_MIN_SAMPLE assessments.
+    """
+    groups = {
+        dimension: value for dimension, value in (
+            ('organization', organization), ('gender', gender),
+            ('education_level', education_level), ('proficiency', proficiency)
+        ) if value
+    }
+    if not 0 <= score <= 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="score must be between 0 and 100"
+        )
+    if len(groups) > 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give at most one of organization, gender, education_level and proficiency"
+        )
+    
+    dimension, value = next(iter(groups.items()), (None, None))
+    rank, sample_size = model_service.score_distribution.percentile_rank(score, dimension, value)
+    return {
+        "score": score,
+        "percentile_rank": rank,
+        "sample_size": sample_size,
+        "group": groups or None
+    }
+
+
+@app.get("/api/leaderboard", tags=["Statistics"])
+async def get_leaderboard(organization: Optional[str] = None, limit: int = 10):
+    """
+    Get the leaderboard
+    
+    Users ranked by the percentage of their latest assessment, within one
+    **organization** (case-insensitive) or across all of them. Read through
+    the leaderboard index; the top entries of recently read organizations
+    are served from memory.
+    """
+    if not 1 <= limit <= settings.LEADERBOARD_TOP_K:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {settings.LEADERBOARD_TOP_K}"
         )
+    try:
+        entries = await worker_pool.run(model_service.get_leaderboard, organization, limit)
+        return {
+            "organization": organization,
+            "entries": [
+                {
+                    "rank": rank,
+                    "name": entry.get('name') or entry['email'],
+                    "organization": entry.get('organization_name'),
+                    "percentage": entry['percentage'],
+                    "overall_knowledge_level": entry.get('overall_knowledge_level'),
+                    "assessed_at": entry['created_at']
+                }
+                for rank, entry in enumerate(entries, start=1)
+            ]
+        }
         
-        return result
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving leaderboard: {str(e)}"
+        )
+
+
+
+@app.get("/api/users/{email}/history", tags=["Statistics"])
+async def get_user_history(email: str, limit: int = 20, cursor: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Get a user's assessment history, newest first
+    
+    Pages of up to **limit** attempts are read through the (email, created_at)
+    index; pass the returned **next_cursor** as **cursor** for the next page
+    (it is null on the last one). **fields** is a comma-separated subset of
+    the stored result fields; by default everything but the per-question
+    **detailed_feedback** is returned. Each attempt carries its
+    **improvement** in percentage points over the attempt before it.
+    """
+    if not 1 <= limit <= settings.HISTORY_MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {settings.HISTORY_MAX_PAGE_SIZE}"
+        )
+    try:
+        selected = parse_fields(fields)
+        history_query(email, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        page = await worker_pool.run(model_service.get_history, email, limit, list(selected), cursor)
+        return {"email": email.strip().lower(), **page}
         
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing assessment: {str(e)}"
+            detail=f"Error retrieving assessment history: {str(e)}"
+        )
+
+
+@app.get("/api/export", tags=["Statistics"])
+async def export_assessments(format: str = "csv", organization: Optional[str] = None, since: Optional[str] = None,
+                             until: Optional[str] = None, category: Optional[str] = None):
+    """
+    Export stored assessments as CSV or Parquet
+    
+    Streams every assessment of **category** (this service's by default),
+    optionally of one **organization** and created between **since** and
+    **until** (ISO dates or datetimes; a date as **until** includes that day),
+    oldest first. Rows are read through a server-side cursor and sent with
+    chunked transfer as they are encoded - CSV in blocks, **format=parquet**
+    as one row group per block - so memory use does not depend on the
+    export size.
+    """
+    try:
+        query = export_query(
+            category or model_service.CATEGORY, organization,
+            parse_date_bound(since), parse_date_bound(until, end=True)
+        )
+        if format not in EXPORT_FORMATS:
+            raise ExportError(f"Unknown export format: {format} (choose from {', '.join(EXPORT_FORMATS)})")
+        rows = await worker_pool.run(model_service.export_assessments, query, settings.EXPORT_BATCH_SIZE)
+        chunks = encode_export(rows, format, settings.EXPORT_CHUNK_ROWS)
+        # The cursor's first batch is read above and the first block holds rows,
+        # so a database failure still gets an error status
+        first = await worker_pool.run(next, chunks, b'')
+    except ExportError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error exporting assessments: {str(e)}"
         )
+    
+    def blocks():
+        yield first
+        yield from chunks
+    
+    filename = f"{model_service.CATEGORY}-assessments-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{format}"
+    # A sync iterator is advanced in Starlette's threadpool, so the blocking cursor stays off the event loop
+    return StreamingResponse(
+        blocks(), media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# Item statistics move slowly; they are recomputed at most once per ITEM_ANALYSIS_CACHE_TTL_SECONDS per worker
+item_analysis_refresh = SingleFlightCache(model_service.stats_cache, settings.ITEM_ANALYSIS_CACHE_TTL_SECONDS)
+
 
+@app.get("/api/analytics/items", tags=["Statistics"])
+async def get_item_analysis(source: str = 'assessments'):
+    """
+    Get per-question difficulty and discrimination statistics
+    
+    For every question: the **p_value** (share of responses with full
+    marks), the **options** chosen and how often, the **point_biserial**
+    correlation of full marks with the score on the other questions, and
+    the **level_mix** of the chosen options. Questions are **flags**ged as
+    too_easy, too_hard or low_discrimination once they have enough responses.
+    
+    **source** is `assessments` (default; the saved assessments, through
+    item rollups kept current on every save) or `dataset` (the training
+    dataset). Served from a cache refreshed by a single query, so the
+    figures may be up to ITEM_ANALYSIS_CACHE_TTL_SECONDS old.
+    """
+    if source not in ITEM_SOURCES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown source: {source} (choose from {', '.join(ITEM_SOURCES)})"
+        )
+    try:
+        entry = await item_analysis_refresh.get(
+            cache_key('items', source), lambda: worker_pool.run(model_service.item_analysis, source)
+        )
+        generated_at = datetime.fromtimestamp(entry['computed_at'])
+        return {
+            **entry['value'],
+            "generated_at": generated_at.isoformat(),
+            "cache_age_seconds": round((datetime.now() - generated_at).total_seconds(), 1)
+        }
+        
+    except FileNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Item analysis source not available: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error computing item analysis: {str(e)}"
+        )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,179 @@
+"""
+Streaming export of stored assessments as CSV or Parquet
+
+Assessments are read through a server-side cursor in created_at order (the
+category_created_at index serves both the range and the order) and encoded
+a chunk at a time: CSV in blocks of rows, Parquet as one row group per
+chunk. Only the current chunk is ever held in memory, so GET /api/export
+and export_assessments.py handle collections of any size. The ``answers``
+column holds the chosen option of every question (``Q1=0;Q2=3``), which
+item analysis reads.
+"""
+import csv
+import io
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.core.feedback import encode_answers
+
+EXPORT_FORMATS = ('csv', 'parquet')
+MEDIA_TYPES = {'csv': 'text/csv; charset=utf-8', 'parquet': 'application/vnd.apache.parquet'}
+EXPORT_COLUMNS = (
+    'assessment_id', 'created_at', 'timestamp', 'email', 'name', 'organization', 'gender', 'education_level',
+    'proficiency', 'category', 'total_score', 'max_score', 'percentage', 'overall_knowledge_level',
+    'ml_awareness_level', 'ml_confidence', 'answers',
+)
+PROFILE_COLUMNS = ('name', 'gender', 'education_level', 'proficiency')
+EXPORT_PROJECTION = {
+    '_id': 1, 'created_at': 1, 'timestamp': 1, 'email': 1, 'organization': 1, 'category': 1, 'total_score': 1,
+    'max_score': 1, 'percentage': 1, 'overall_knowledge_level': 1, 'ml_awareness_level': 1, 'ml_confidence': 1,
+    'feedback': 1,
+    **{f"user_profile.{field}": 1 for field in PROFILE_COLUMNS + ('email', 'organization')},
+}
+EXPORT_SORT = [('created_at', 1)]
+
+
+class ExportError(ValueError):
+    """Raised for export parameters that cannot be served"""
+
+
+def parse_date_bound(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """
+    Parse an ISO date or datetime filter value. A bare date as the ``end``
+    bound covers that whole day.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"Invalid date: {value} (expected YYYY-MM-DD or an ISO datetime)")
+    if end and len(value) <= 10:
+        parsed += timedelta(days=1)
+    return parsed.replace(tzinfo=None)
+
+
+def export_query(category: str, organization: Optional[str] = None,
+                 since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict[str, Any]:
+    """Filter of the assessments to export; ``until`` is exclusive"""
+    query: Dict[str, Any] = {'category': category}
+    if organization:
+        query['organization'] = organization
+    created_at = {}
+    if since:
+        created_at['$gte'] = since
+    if until:
+        created_at['$lt'] = until
+    if created_at:
+        query['created_at'] = created_at
+    return query
+
+
+def export_row(document: Dict) -> Dict[str, Any]:
+    """Flatten a stored assessment document into an export row"""
+    profile = document.get('user_profile') or {}
+    row = {column: document.get(column) for column in EXPORT_COLUMNS}
+    row['assessment_id'] = str(document.get('_id', ''))
+    row['email'] = document.get('email') or profile.get('email')
+    row['organization'] = document.get('organization') or profile.get('organization')
+    for field in PROFILE_COLUMNS:
+        row[field] = profile.get(field)
+    row['answers'] = encode_answers(document.get('feedback'))
+    return row
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_chunks(rows: Iterable[Dict], chunk_rows: int) -> Iterator[bytes]:
+    """
+    Encode rows as CSV, ``chunk_rows`` rows per yielded block
+
+    The header goes out with the first block rather than on its own, so the
+    first block has read rows - and surfaced any error reading them.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    rows_written = False
+    for chunk in _chunks(rows, chunk_rows):
+        for row in chunk:
+            if isinstance(row.get('created_at'), datetime):
+                row = dict(row, created_at=row['created_at'].isoformat())
+            writer.writerow(row)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        rows_written = True
+    if not rows_written:
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _DrainingSink(io.RawIOBase):
+    """Write-only file whose contents are handed out and dropped after every row group"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _parquet_schema():
+    strings = [column for column in EXPORT_COLUMNS
+               if column not in ('created_at', 'total_score', 'max_score', 'percentage', 'ml_confidence')]
+    types = {column: pa.string() for column in strings}
+    types.update(created_at=pa.timestamp('us'), total_score=pa.int64(), max_score=pa.int64(),
+                 percentage=pa.float64(), ml_confidence=pa.float64())
+    return pa.schema([(column, types[column]) for column in EXPORT_COLUMNS])
+
+
+def parquet_chunks(rows: Iterable[Dict], row_group_rows: int) -> Iterator[bytes]:
+    """Encode rows as a Parquet file, one row group of ``row_group_rows`` per yielded block"""
+    schema = _parquet_schema()
+    sink = _DrainingSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for chunk in _chunks(rows, row_group_rows):
+            columns = {column: [row.get(column) for row in chunk] for column in EXPORT_COLUMNS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema), row_group_size=len(chunk))
+            yield sink.drain()
+    finally:
+        writer.close()
+    # The footer is written on close
+    yield sink.drain()
+
+
+def encode_export(rows: Iterable[Dict], output_format: str, chunk_rows: int) -> Iterator[bytes]:
+    """Encode export rows in ``output_format``, chunk by chunk"""
+    if output_format == 'csv':
+        return csv_chunks(rows, chunk_rows)
+    if output_format == 'parquet':
+        return parquet_chunks(rows, chunk_rows)
+    raise ExportError(f"Unknown export format: {output_format} (choose from {', '.join(EXPORT_FORMATS)})")
@@ -0,0 +1,121 @@
+"""
+Per-user assessment history, newest first
+
+Pages are read through the (email, created_at) index with a keyset cursor
+instead of skip/limit, so every page costs the same however deep the user
+scrolls. The cursor is the created_at of the last attempt returned plus the
+ids already returned at that instant: the next page starts at that
+created_at inclusive and drops those ids, so attempts saved in the same
+microsecond are neither skipped nor repeated. Only the requested fields
+are projected; the per-question feedback is left out unless asked for,
+and is then rehydrated from its compact stored form (see feedback.py).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+HISTORY_FIELDS = (
+    'timestamp', 'organization', 'total_score', 'max_score', 'percentage', 'overall_knowledge_level',
+    'ml_awareness_level', 'ml_confidence', 'detailed_feedback',
+)
+DEFAULT_FIELDS = tuple(field for field in HISTORY_FIELDS if field != 'detailed_feedback')
+PREVIOUS_ATTEMPT_PROJECTION = {'_id': 1, 'total_score': 1, 'percentage': 1, 'overall_knowledge_level': 1,
+                               'created_at': 1}
+HISTORY_SORT = [('created_at', -1)]
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Validate a comma-separated ``fields`` parameter; None selects DEFAULT_FIELDS"""
+    if not fields:
+        return DEFAULT_FIELDS
+    selected = tuple(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+    unknown = [field for field in selected if field not in HISTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}; choose from {', '.join(HISTORY_FIELDS)}")
+    return selected
+
+
+def encode_cursor(created_at: datetime, seen_ids: List[str]) -> str:
+    payload = json.dumps({'t': created_at.isoformat(), 'ids': seen_ids}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, List[str]]:
+    """``(created_at, seen_ids)`` of a cursor returned by a previous page; ValueError when malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload['t']), [str(seen) for seen in payload['ids']]
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def history_query(email: str, cursor: Optional[str] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """Filter of the page after ``cursor`` and the ids to drop from its start"""
+    query: Dict[str, Any] = {'email': email.strip().lower()}
+    if not cursor:
+        return query, []
+    created_at, seen_ids = decode_cursor(cursor)
+    query['created_at'] = {'$lte': created_at}
+    return query, seen_ids
+
+
+def history_projection(fields: Iterable[str]) -> Dict[str, int]:
+    # created_at and _id make up the cursor; percentage is needed for the improvement
+    projection = {'_id': 1, 'created_at': 1, 'percentage': 1, **{field: 1 for field in fields}}
+    if 'detailed_feedback' in projection:
+        # The compact feedback and the profile its explanations are personalized for
+        projection.update(feedback=1, user_profile=1)
+    return projection
+
+
+def history_page(documents: List[Dict], limit: int, fields: Iterable[str],
+                 cursor: Optional[str] = None, seen_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Build a page from up to ``limit + len(seen_ids) + 1`` documents read with history_query.
+
+    Each attempt carries its ``improvement`` in percentage points over the
+    attempt before it when that one was read too - the extra document past
+    the page provides it for the last attempt.
+    """
+    seen = set(seen_ids or [])
+    documents = [document for document in documents if str(document['_id']) not in seen]
+    page, rest = documents[:limit], documents[limit:]
+    fields = list(fields)
+
+    attempts = []
+    for position, document in enumerate(page):
+        attempt = {'assessment_id': str(document['_id']), 'assessed_at': document['created_at'].isoformat()}
+        attempt.update({field: document.get(field) for field in fields})
+        older = documents[position + 1] if position + 1 < len(documents) else None
+        attempt['improvement'] = improvement(document.get('percentage'), older.get('percentage') if older else None)
+        attempts.append(attempt)
+
+    next_cursor = None
+    if rest and page:
+        last_at = page[-1]['created_at']
+        tied = [str(document['_id']) for document in page if document['created_at'] == last_at]
+        if cursor and decode_cursor(cursor)[0] == last_at:
+            tied = list(seen) + tied
+        next_cursor = encode_cursor(last_at, tied)
+    return {'attempts': attempts, 'count': len(attempts), 'next_cursor': next_cursor}
+
+
+def improvement(percentage: Optional[float], previous_percentage: Optional[float]) -> Optional[float]:
+    """Percentage points gained over the previous attempt, or None without one"""
+    if percentage is None or previous_percentage is None:
+        return None
+    return round(float(percentage) - float(previous_percentage), 2)
+
+
+def previous_attempt(document: Optional[Dict]) -> Optional[Dict[str, Any]]:
+    """The previous-attempt summary attached to an assessment result"""
+    if not document:
+        return None
+    return {
+        'assessment_id': str(document['_id']),
+        'total_score': document.get('total_score', 0),
+        'percentage': document.get('percentage', 0),
+        'overall_knowledge_level': document.get('overall_knowledge_level'),
+        'assessed_at': document['created_at'].isoformat(),
+    }
@@ -0,0 +1,119 @@
+"""
+MongoDB indexes of the assessment collection and the query shapes they serve
+
+ASSESSMENT_INDEXES is the single list of indexes the read and write paths
+rely on; ensure_indexes creates whichever are missing and is safe to run on
+every startup (MongoDB treats re-creating an identical index as a no-op).
+QUERY_SHAPES are representative filters and sorts of those paths;
+explain_query_shapes runs each through explain() and reports whether the
+winning plan uses an index or falls back to a collection scan or an
+in-memory sort. migrate_indexes.py runs both against a live database.
+ROLLUP_INDEXES, LEADERBOARD_INDEXES and ITEM_ROLLUP_INDEXES are those of
+the statistics rollup, leaderboard and item rollup collections.
+"""
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from src.core.rollups import ROLLUP_DIMENSIONS
+
+ASSESSMENT_INDEXES = [
+    # User history: newest attempts of one email first
+    IndexModel([('email', ASCENDING), ('created_at', DESCENDING)], name='email_created_at'),
+    # Organization leaderboards: best percentage first
+    IndexModel([('organization', ASCENDING), ('percentage', DESCENDING)], name='organization_percentage'),
+    # Category statistics and exports over a time range
+    IndexModel([('category', ASCENDING), ('created_at', DESCENDING)], name='category_created_at'),
+    # Idempotent submissions; partial, so results saved without a key are not indexed
+    IndexModel(
+        [('idempotency_key', ASCENDING)], name='idempotency_key_unique', unique=True,
+        partialFilterExpression={'idempotency_key': {'$type': 'string'}}
+    ),
+]
+
+ROLLUP_INDEXES = [
+    # One rollup per key; its category + day prefix also serves the statistics range reads
+    IndexModel(
+        [(field, ASCENDING) for field in ROLLUP_DIMENSIONS], name='rollup_key_unique', unique=True
+    ),
+]
+
+LEADERBOARD_INDEXES = [
+    # One entry per user and leaderboard; the latest-score upserts rely on it being unique
+    IndexModel(
+        [('category', ASCENDING), ('organization', ASCENDING), ('email', ASCENDING)],
+        name='leaderboard_user_unique', unique=True
+    ),
+    # Top k of a leaderboard: best percentage first, earliest first among ties
+    IndexModel(
+        [('category', ASCENDING), ('organization', ASCENDING), ('percentage', DESCENDING), ('created_at', ASCENDING)],
+        name='leaderboard_top'
+    ),
+]
+
+ITEM_ROLLUP_INDEXES = [
+    # One rollup per question; the category prefix serves the item analysis read
+    IndexModel([('category', ASCENDING), ('question_id', ASCENDING)], name='item_rollup_unique', unique=True),
+]
+
+# Representative query of each read path: (filter, sort)
+QUERY_SHAPES: Dict[str, Dict[str, Any]] = {
+    'user_history': {
+        'filter': {'email': 'probe@example.com'},
+        'sort': [('created_at', DESCENDING)],
+    },
+    'user_history_page': {
+        'filter': {'email': 'probe@example.com', 'created_at': {'$lte': datetime(2000, 1, 1)}},
+        'sort': [('created_at', DESCENDING)],
+    },
+    'organization_leaderboard': {
+        'filter': {'organization': 'probe'},
+        'sort': [('percentage', DESCENDING)],
+    },
+    'category_range': {
+        'filter': {'category': 'probe', 'created_at': {'$gte': datetime(2000, 1, 1)}},
+        'sort': [('created_at', DESCENDING)],
+    },
+    'idempotency_lookup': {
+        'filter': {'idempotency_key': 'probe'},
+        'sort': None,
+    },
+}
+
+
+def ensure_indexes(collection, indexes: List[IndexModel] = ASSESSMENT_INDEXES) -> List[str]:
+    """Create any missing indexes (the assessment ones by default), returning the names of all of them"""
+    return collection.create_indexes(indexes)
+
+
+def _plan_stages(plan: Dict) -> List[Dict]:
+    """Flatten a winning plan tree into its stages"""
+    stages = [plan]
+    for child in ('inputStage', 'queryPlan'):
+        if isinstance(plan.get(child), dict):
+            stages.extend(_plan_stages(plan[child]))
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def explain_query_shapes(collection) -> Dict[str, Dict[str, Any]]:
+    """explain() every query shape and summarize its winning plan"""
+    report = {}
+    for name, shape in QUERY_SHAPES.items():
+        cursor = collection.find(shape['filter'])
+        if shape['sort']:
+            cursor = cursor.sort(shape['sort'])
+        winning_plan = cursor.explain()['queryPlanner']['winningPlan']
+        stages = _plan_stages(winning_plan)
+        stage_names = [stage['stage'] for stage in stages if stage.get('stage')]
+        report[name] = {
+            'stages': stage_names,
+            'indexes': [stage['indexName'] for stage in stages if stage.get('indexName')],
+            'uses_index': 'COLLSCAN' not in stage_names and any(
+                stage_name in ('IXSCAN', 'EXPRESS_IXSCAN', 'IDHACK') for stage_name in stage_names
+            ),
+            'in_memory_sort': 'SORT' in stage_names,
+        }
+    return report
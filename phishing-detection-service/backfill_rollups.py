@@ -0,0 +1,101 @@
+"""
+Rebuild the statistics and item rollups and the leaderboard from the assessments already in MongoDB
+Run this script from the project root directory
+
+    python backfill_rollups.py                  # rebuild both, e.g. after the first deployment
+    python backfill_rollups.py --batch-size 5000
+
+The service keeps both up to date on every save; a rebuild is only needed
+to seed them from existing assessments or to repair them after their writes
+failed. The new rollups are swapped in atomically; leaderboard entries are
+upserted in place, never replacing a user's newer score. Assessments moved
+to the archive by archive_assessments.py are read from there.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from pymongo import MongoClient
+
+from config.settings import settings
+from src.core.archive import ArchiveError, AssessmentArchive
+from src.core.indexes import ITEM_ROLLUP_INDEXES, LEADERBOARD_INDEXES, ROLLUP_INDEXES, ensure_indexes
+from src.core.item_analysis import answer_key_from_sheet, rebuild_item_rollups
+from src.core.leaderboard import backfill_leaderboard
+from src.core.rollups import rebuild_rollups
+from src.core.service import ModelService
+
+
+def archived_assessments():
+    """A reader of the archived assessments, or None when there are none to read"""
+    archive = AssessmentArchive(settings.get_absolute_path(settings.ARCHIVE_DIR), ModelService.CATEGORY,
+                                settings.ARCHIVE_ROW_GROUP_ROWS)
+    if archive.archived_before is None:
+        return None
+    print(f"📦 Including {len(archive.segments())} archived segments from {archive.path}")
+    return lambda: archive.find({})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--batch-size', type=int, default=1000, help="assessments folded per bulk write")
+    args = parser.parse_args()
+
+    # Talk to MongoDB directly: no circuit breaker or fault injection for a backfill
+    client = MongoClient(settings.MONGO_URI)
+    db = client.get_default_database()
+    try:
+        client.admin.command('ping')
+    except Exception as e:
+        print(f"❌ MongoDB not reachable: {e}")
+        return 1
+
+    assessments = db[settings.MONGO_COLLECTION]
+    rollups = db[settings.MONGO_ROLLUP_COLLECTION]
+    leaderboard = db[settings.MONGO_LEADERBOARD_COLLECTION]
+    item_rollups = db[settings.MONGO_ITEM_ROLLUP_COLLECTION]
+    print(f"📁 {assessments.full_name} -> {rollups.full_name}, {leaderboard.full_name}, {item_rollups.full_name}")
+    try:
+        archived = archived_assessments()
+    except ArchiveError as e:
+        print(f"❌ Archived assessments cannot be read, the rebuild would lose them: {e}")
+        return 1
+
+    started = time.perf_counter()
+    counts = rebuild_rollups(assessments, rollups, max(1, args.batch_size), ROLLUP_INDEXES,
+                             archived() if archived else ())
+    print(f"✅ Folded {counts['assessments']} assessments ({counts['caught_up']} saved during the rebuild) "
+          f"into {counts['rollups']} rollups in {time.perf_counter() - started:.1f}s")
+    if not counts['settled']:
+        print("⚠️ Saves kept changing the latest rollups while they were caught up; run the backfill again")
+
+    started = time.perf_counter()
+    ensure_indexes(leaderboard, LEADERBOARD_INDEXES)
+    counts = backfill_leaderboard(assessments, leaderboard, max(1, args.batch_size),
+                                  archived() if archived else ())
+    print(f"✅ Upserted {counts['entries']} leaderboard entries from {counts['assessments']} assessments "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    try:
+        answer_key = answer_key_from_sheet(settings.get_absolute_path(settings.ANSWER_SHEET_PATH))
+    except FileNotFoundError as e:
+        print(f"⚠️ Item rollups not rebuilt, no answer sheet: {e}")
+        return 0
+    started = time.perf_counter()
+    counts = rebuild_item_rollups(assessments, item_rollups, answer_key, ModelService.CATEGORY,
+                                  max(1, args.batch_size), ITEM_ROLLUP_INDEXES, archived() if archived else ())
+    print(f"✅ Counted {counts['assessments']} assessments ({counts['caught_up']} saved during the rebuild) "
+          f"into {counts['questions']} item rollups in {time.perf_counter() - started:.1f}s")
+    if not counts['settled']:
+        print("⚠️ Saves kept changing the item rollups while they were caught up; run the backfill again")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Export stored assessments to a CSV or Parquet file, streaming
+Run this script from the project root directory
+
+    python export_assessments.py assessments.csv
+    python export_assessments.py assessments.parquet --organization Acme --since 2025-01-01 --until 2025-06-30
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from pymongo import MongoClient
+
+from config.settings import settings
+from src.core.export import EXPORT_FORMATS, EXPORT_PROJECTION, EXPORT_SORT, ExportError, encode_export, \
+    export_query, export_row, parse_date_bound
+from src.core.service import ModelService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('output', help="file to write; the format follows its extension unless --format is given")
+    parser.add_argument('--format', choices=EXPORT_FORMATS)
+    parser.add_argument('--organization')
+    parser.add_argument('--since', help="first day (or ISO datetime) to include")
+    parser.add_argument('--until', help="last day to include, or an exclusive ISO datetime")
+    parser.add_argument('--category', default=ModelService.CATEGORY)
+    parser.add_argument('--batch-size', type=int, default=settings.EXPORT_BATCH_SIZE)
+    parser.add_argument('--chunk-rows', type=int, default=settings.EXPORT_CHUNK_ROWS,
+                        help="rows per CSV block / Parquet row group")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output_format = args.format or ('parquet' if output.suffix.lower() == '.parquet' else 'csv')
+    try:
+        query = export_query(args.category, args.organization,
+                             parse_date_bound(args.since), parse_date_bound(args.until, end=True))
+    except ExportError as e:
+        print(f"❌ {e}")
+        return 1
+
+    # Talk to MongoDB directly: no circuit breaker or fault injection for an offline export
+    client = MongoClient(settings.MONGO_URI)
+    collection = client.get_default_database()[settings.MONGO_COLLECTION]
+    try:
+        client.admin.command('ping')
+    except Exception as e:
+        print(f"❌ MongoDB not reachable: {e}")
+        return 1
+
+    print(f"📁 Collection: {collection.full_name}")
+    exported = 0
+
+    def rows():
+        nonlocal exported
+        cursor = collection.find(query, EXPORT_PROJECTION, sort=EXPORT_SORT, batch_size=args.batch_size)
+        for document in cursor:
+            exported += 1
+            yield export_row(document)
+
+    temporary = output.with_name(f"{output.name}.tmp")
+    try:
+        with open(temporary, 'wb') as f:
+            for block in encode_export(rows(), output_format, args.chunk_rows):
+                f.write(block)
+    except ExportError as e:
+        temporary.unlink(missing_ok=True)
+        print(f"❌ {e}")
+        return 1
+    temporary.replace(output)
+    print(f"✅ Exported {exported} assessments to {output} ({output_format})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Bounded worker pools for CPU-bound and blocking work
+
+The API handlers are ``async def``, so scoring, explanation lookups, sklearn
+inference and the synchronous pymongo writes run on a bounded thread pool
+instead of the event loop; one slow assessment no longer stalls every other
+connection on the worker. Inference-heavy batch chunks can optionally go to
+a process pool, forked at startup after the model is loaded so the children
+inherit it. Queue depth is tracked so saturation shows up in /metrics.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config.settings import settings
+
+
+class WorkerPool:
+    """Bounded thread pool (plus optional process pool) with queue depth accounting"""
+
+    def __init__(self, threads: int = 8, processes: int = 0):
+        self.threads = max(1, threads)
+        self.processes = max(0, processes)
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='assessment-worker')
+        self._process_executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.max_queued = 0
+        self.process_in_flight = 0
+
+    def start_processes(self):
+        """Fork the process pool; call once the model is loaded so children inherit it"""
+        if self.processes and self._process_executor is None:
+            self._process_executor = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context('fork')
+            )
+            # Fork every child now, before request threads exist
+            for future in [self._process_executor.submit(int) for _ in range(self.processes)]:
+                future.result()
+            print(f"✅ Started {self.processes} inference worker processes")
+
+    def _enqueued(self):
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def _run_tracked(self, func: Callable, args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    def _dequeue_if_cancelled(self, future: Future):
+        # A task cancelled while still queued never reaches _run_tracked
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking or CPU-bound call on the thread pool and await its result"""
+        self._enqueued()
+        future = self._executor.submit(self._run_tracked, func, args, kwargs)
+        future.add_done_callback(self._dequeue_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    async def run_cpu(self, func: Callable, *args) -> Any:
+        """
+        Run an inference-heavy call on the process pool when one is configured.
+
+        ``func`` and its arguments must be picklable; without a process pool
+        the call goes to the thread pool instead.
+        """
+        if self._process_executor is None:
+            return await self.run(func, *args)
+        with self._lock:
+            self.process_in_flight += 1
+        try:
+            return await asyncio.wrap_future(self._process_executor.submit(func, *args))
+        finally:
+            with self._lock:
+                self.process_in_flight -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._process_executor is not None:
+            self._process_executor.shutdown(wait=False, cancel_futures=True)
+            self._process_executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'threads': self.threads,
+            'queued': self.queued,
+            'active': self.active,
+            'completed': self.completed,
+            'max_queued': self.max_queued,
+            'saturated': self.active >= self.threads,
+            'processes': self.processes if self._process_executor is not None else 0,
+            'process_in_flight': self.process_in_flight,
+        }
+
+
+# Global worker pool instance
+worker_pool = WorkerPool(settings.WORKER_THREADS, settings.WORKER_PROCESSES)
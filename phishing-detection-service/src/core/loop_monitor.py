@@ -0,0 +1,135 @@
+"""
+Event-loop lag monitor
+
+A sampler task sleeps for a fixed interval and records how late it wakes up
+- the scheduling delay every other coroutine on the loop sees - in a
+fixed-bucket histogram. A watchdog thread watches the sampler's heartbeat;
+when the loop has been stuck for longer than the threshold it captures the
+loop thread's current stack and the route of the request being executed and
+logs it once per stall. Both only wake once per interval, so the monitor is
+cheap enough to leave on in production.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from config.settings import settings
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is +Inf)
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LoopLagMonitor:
+    """Samples event-loop scheduling delay and reports stalls with their stack and route"""
+
+    def __init__(self, interval_ms: float = 100, threshold_ms: float = 250, max_stack_frames: int = 30):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.max_stack_frames = max_stack_frames
+        self.bucket_counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.samples = 0
+        self.lag_sum_ms = 0.0
+        self.lag_max_ms = 0.0
+        self.stalls = 0
+        self.last_stall: Optional[Dict[str, Any]] = None
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start sampling; must be called from the event loop thread"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-lag-watchdog', daemon=True)
+        self._watchdog.start()
+        print(f"✅ Event loop monitor started (stall threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            self.observe((time.perf_counter() - started - self.interval) * 1000)
+
+    def observe(self, lag_ms: float):
+        lag_ms = max(0.0, lag_ms)
+        self.bucket_counts[bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+        self.samples += 1
+        self.lag_sum_ms += lag_ms
+        self.lag_max_ms = max(self.lag_max_ms, lag_ms)
+
+    def _watch(self):
+        reported_heartbeat = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            stalled_for = time.monotonic() - heartbeat - self.interval
+            if stalled_for > self.threshold and heartbeat != reported_heartbeat:
+                reported_heartbeat = heartbeat
+                self._report_stall(stalled_for)
+
+    def _report_stall(self, stalled_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.format_stack(frame)[-self.max_stack_frames:]
+        route = self._route_of(frame)
+        self.stalls += 1
+        self.last_stall = {
+            'timestamp': time.time(),
+            'stalled_ms': round(stalled_for * 1000, 1),
+            'route': route,
+            'stack': stack,
+        }
+        print(f"⚠️ Event loop blocked for {stalled_for * 1000:.0f}ms+ in {route}\n{''.join(stack)}")
+
+    @staticmethod
+    def _route_of(frame) -> str:
+        """Find the ASGI scope of the request running on the loop by walking the stack"""
+        while frame is not None:
+            scope = frame.f_locals.get('scope')
+            if isinstance(scope, dict) and scope.get('type') in ('http', 'websocket'):
+                route = getattr(scope.get('route'), 'path', None) or scope.get('path', '?')
+                return f"{scope.get('method', 'WS')} {route}"
+            frame = frame.f_back
+        return 'no request (background task or startup)'
+
+    def stats(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets: List[Dict[str, Any]] = []
+        for bound, count in zip(list(LAG_BUCKETS_MS) + ['+Inf'], self.bucket_counts):
+            cumulative += count
+            buckets.append({'le_ms': bound, 'count': cumulative})
+        last_stall = None
+        if self.last_stall is not None:
+            last_stall = {key: value for key, value in self.last_stall.items() if key != 'stack'}
+        return {
+            'enabled': self._task is not None,
+            'interval_ms': self.interval * 1000,
+            'threshold_ms': self.threshold * 1000,
+            'samples': self.samples,
+            'lag_mean_ms': round(self.lag_sum_ms / self.samples, 3) if self.samples else 0.0,
+            'lag_max_ms': round(self.lag_max_ms, 3),
+            'histogram': buckets,
+            'stalls': self.stalls,
+            'last_stall': last_stall,
+        }
+
+
+# Global event loop monitor instance
+loop_monitor = LoopLagMonitor(settings.LOOP_MONITOR_INTERVAL_MS, settings.LOOP_MONITOR_THRESHOLD_MS)
@@ -0,0 +1,259 @@
+"""
+Daily statistics rollups of the assessment collection
+
+Every saved assessment is also folded into one rollup document per
+(category, day, organization, gender, education level, proficiency) with
+$inc updates: count, score sum and sum of squares, min/max, a fixed-bin
+histogram of the percentage and the knowledge and ML awareness level
+counts. Statistics are then merged from O(days x groups) rollups instead of
+scanning every assessment. Increments of a batch that share a key are
+combined into a single upsert.
+
+rebuild_rollups recomputes everything from the assessments, for the first
+deployment or after rollup writes failed; backfill_rollups.py runs it.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReplaceOne, UpdateOne
+
+from src.core.statistics import SCORE_BINS
+
+ROLLUP_DIMENSIONS = ('category', 'day', 'organization', 'gender', 'education_level', 'proficiency')
+UNKNOWN = 'Unknown'
+# A save reaches the collection within this long of its created_at; catch-ups after a rebuild reach back as far
+INSERT_LAG = timedelta(minutes=1)
+# Catch-up passes before giving up on a moment without concurrent saves
+RECONCILE_PASSES = 5
+
+
+def score_bin(percentage: float) -> int:
+    """Fixed histogram bin of a percentage score"""
+    return min(SCORE_BINS - 1, max(0, int(math.floor(percentage))))
+
+
+def _field_key(value: Any) -> str:
+    # Rollup counters are keyed by value; '.' and a leading '$' are not allowed in MongoDB field names
+    key = str(value if value not in (None, '') else UNKNOWN).replace('.', '_')
+    return key.lstrip('$') or UNKNOWN
+
+
+def rollup_key(document: Dict) -> Dict[str, str]:
+    """Rollup dimensions of a stored assessment document"""
+    profile = document.get('user_profile') or {}
+    created_at = document.get('created_at') or datetime.now()
+    key = {
+        'category': document.get('category') or UNKNOWN,
+        'day': created_at.date().isoformat() if isinstance(created_at, datetime) else str(created_at)[:10],
+        'organization': document.get('organization') or profile.get('organization'),
+    }
+    for field in ROLLUP_DIMENSIONS[3:]:
+        key[field] = profile.get(field)
+    return {field: value if value not in (None, '') else UNKNOWN for field, value in key.items()}
+
+
+def rollup_increments(document: Dict) -> Dict[str, float]:
+    """$inc fields one assessment adds to its rollup"""
+    percentage = float(document.get('percentage') or 0)
+    return {
+        'count': 1,
+        'score_sum': percentage,
+        'score_sum_sq': percentage * percentage,
+        f"histogram.{score_bin(percentage)}": 1,
+        f"levels.{_field_key(document.get('overall_knowledge_level'))}": 1,
+        f"ml_levels.{_field_key(document.get('ml_awareness_level'))}": 1,
+    }
+
+
+def _nested(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Dotted $inc fields as the document fields they end up in"""
+    document: Dict[str, Any] = {}
+    for field, value in fields.items():
+        parent, _, child = field.partition('.')
+        if child:
+            document.setdefault(parent, {})[child] = value
+        else:
+            document[parent] = value
+    return document
+
+
+def _merged_increments(documents: Iterable[Dict]) -> Dict[Tuple, Dict[str, Any]]:
+    """Increments and score bounds of ``documents``, combined per rollup key"""
+    merged: Dict[Tuple, Dict[str, Any]] = {}
+    for document in documents:
+        key = rollup_key(document)
+        entry = merged.setdefault(
+            tuple(key[field] for field in ROLLUP_DIMENSIONS), {'key': key, 'inc': {}, 'min': None, 'max': None}
+        )
+        for field, amount in rollup_increments(document).items():
+            entry['inc'][field] = entry['inc'].get(field, 0) + amount
+        percentage = float(document.get('percentage') or 0)
+        entry['min'] = percentage if entry['min'] is None else min(entry['min'], percentage)
+        entry['max'] = percentage if entry['max'] is None else max(entry['max'], percentage)
+    return merged
+
+
+def rollup_updates(documents: Iterable[Dict]) -> List[UpdateOne]:
+    """One upsert per rollup key touched by ``documents``"""
+    now = datetime.now()
+    return [
+        UpdateOne(
+            entry['key'],
+            {
+                '$inc': entry['inc'],
+                '$min': {'score_min': entry['min']},
+                '$max': {'score_max': entry['max'], 'updated_at': now},
+            },
+            upsert=True
+        )
+        for entry in _merged_increments(documents).values()
+    ]
+
+
+def rollup_documents(documents: Iterable[Dict]) -> Dict[Tuple, Dict[str, Any]]:
+    """The complete rollups of ``documents``, as their upserts would leave empty rollups"""
+    return {
+        dimensions: dict(entry['key'], **_nested(entry['inc']), score_min=entry['min'], score_max=entry['max'])
+        for dimensions, entry in _merged_increments(documents).items()
+    }
+
+
+def _same_rollup(expected: Dict[str, Any], stored: Optional[Dict[str, Any]]) -> bool:
+    if stored is None:
+        return False
+    for field, value in expected.items():
+        if field in ('score_sum', 'score_sum_sq'):
+            # Float sums depend on the order they were added up in
+            if not math.isclose(value, stored.get(field, 0), rel_tol=1e-9, abs_tol=1e-6):
+                return False
+        elif stored.get(field) != value:
+            return False
+    return True
+
+
+def apply_rollups(collection, documents: Iterable[Dict]) -> int:
+    """Fold saved assessment documents into their rollups, returning the number of rollups touched"""
+    updates = rollup_updates(documents)
+    if updates:
+        collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def merge_rollups(rollups: Iterable[Dict]) -> Dict[str, Any]:
+    """Add rollup documents up into overall totals"""
+    totals = {
+        'count': 0, 'score_sum': 0.0, 'score_sum_sq': 0.0, 'score_min': None, 'score_max': None,
+        'histogram': [0] * SCORE_BINS, 'levels': {}, 'ml_levels': {},
+    }
+    for rollup in rollups:
+        totals['count'] += rollup.get('count', 0)
+        totals['score_sum'] += rollup.get('score_sum', 0)
+        totals['score_sum_sq'] += rollup.get('score_sum_sq', 0)
+        for bound, pick in (('score_min', min), ('score_max', max)):
+            if rollup.get(bound) is not None:
+                totals[bound] = rollup[bound] if totals[bound] is None else pick(totals[bound], rollup[bound])
+        for bin_key, count in (rollup.get('histogram') or {}).items():
+            totals['histogram'][score_bin(float(bin_key))] += count
+        for field in ('levels', 'ml_levels'):
+            for level, count in (rollup.get(field) or {}).items():
+                totals[field][level] = totals[field].get(level, 0) + count
+    return totals
+
+
+def rollup_query(category: str, organization: Optional[str] = None, since: Optional[str] = None) -> Dict:
+    """Filter selecting the rollups of a category, optionally one organization and days from ``since``"""
+    query: Dict[str, Any] = {'category': category}
+    if organization:
+        query['organization'] = organization
+    if since:
+        query['day'] = {'$gte': since}
+    return query
+
+
+def rebuild_rollups(assessments, rollups, batch_size: int = 1000,
+                    indexes: Optional[List[Any]] = None, archived: Iterable[Dict] = ()) -> Dict[str, int]:
+    """
+    Recompute all rollups from the assessments in ``batch_size`` chunks.
+
+    The rollups are built in a side collection and swapped in with a rename,
+    so readers never see a half-built state. Assessments saved while the
+    rebuild runs were counted in the old rollups, and whether a save's own
+    increment landed before or after the rename is not known; so once
+    renamed, the days the rebuild overlapped are recomputed from the
+    assessments and replaced, which is the same however often it runs.
+    ``indexes`` are created on the new rollups before they are filled.
+    ``archived`` assessments, no longer in the collection, are folded in as
+    well.
+    """
+    started_at = datetime.now()
+    staging = rollups.database[f"{rollups.name}_rebuild"]
+    staging.drop()
+    if indexes:
+        staging.create_indexes(indexes)
+    fields = {'_id': 0, 'category': 1, 'created_at': 1, 'organization': 1, 'user_profile': 1,
+              'percentage': 1, 'overall_knowledge_level': 1, 'ml_awareness_level': 1}
+
+    def fold(cursor, target) -> int:
+        folded = 0
+        batch = []
+        for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                apply_rollups(target, batch)
+                folded += len(batch)
+                batch = []
+        if batch:
+            apply_rollups(target, batch)
+            folded += len(batch)
+        return folded
+
+    assessments_folded = fold(archived, staging)
+    assessments_folded += fold(
+        assessments.find({'created_at': {'$lt': started_at}}, fields, batch_size=batch_size), staging
+    )
+    # The staging collection only exists once an index or a rollup created it
+    if assessments_folded or indexes:
+        staging.rename(rollups.name, dropTarget=True)
+    else:
+        rollups.drop()
+    # From here on every save's increment lands in the new rollups
+    recent, settled = reconcile_rollups(assessments, rollups, started_at - INSERT_LAG)
+    caught_up = sum(1 for document in recent if document['created_at'] >= started_at)
+    return {'assessments': assessments_folded + caught_up, 'caught_up': caught_up,
+            'rollups': rollups.count_documents({}), 'settled': settled}
+
+
+def reconcile_rollups(assessments, rollups, since: datetime,
+                      passes: int = RECONCILE_PASSES) -> Tuple[List[Dict], bool]:
+    """
+    Recompute the rollups of the days from ``since`` and replace the ones that differ.
+
+    Rollups are per day, so the whole days are read. A save racing a pass
+    can leave its key off by that save; the pass is repeated until one finds
+    every rollup matching, at most ``passes`` times. Returns the assessments
+    of the last pass and whether it matched.
+    """
+    since = datetime.combine(since.date(), datetime.min.time())
+    fields = {'_id': 0, 'category': 1, 'created_at': 1, 'organization': 1, 'user_profile': 1,
+              'percentage': 1, 'overall_knowledge_level': 1, 'ml_awareness_level': 1}
+    recent: List[Dict] = []
+    for _ in range(max(1, passes)):
+        recent = list(assessments.find({'created_at': {'$gte': since}}, fields))
+        stored = {
+            tuple(rollup.get(field) for field in ROLLUP_DIMENSIONS): rollup
+            for rollup in rollups.find({'day': {'$gte': since.date().isoformat()}}, {'_id': 0})
+        }
+        stale = [
+            expected for dimensions, expected in rollup_documents(recent).items()
+            if not _same_rollup(expected, stored.get(dimensions))
+        ]
+        if not stale:
+            return recent, True
+        now = datetime.now()
+        rollups.bulk_write([
+            ReplaceOne({field: expected[field] for field in ROLLUP_DIMENSIONS}, dict(expected, updated_at=now),
+                       upsert=True)
+            for expected in stale
+        ], ordered=False)
+    return recent, False
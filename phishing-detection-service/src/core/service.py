@@ -1,53 +1,195 @@
+import hashlib
+import itertools
 import json
 import os
 import sys
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 import joblib
 import numpy as np
 import pandas as pd
 from datetime import datetime
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
 
 # Add project root to path
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from config.settings import settings
+from src.core.content_store import ExplanationStore, open_explanation_store
+from src.core.answer_key import AnswerKey
+from src.core.archive import AssessmentArchive, merge_documents
+from src.core.cache import DiskCache, MemoryCache, TieredCache, cache_key
+from src.core.circuit_breaker import CLOSED, CircuitBreaker, CircuitOpenError
+from src.core.deadline import SAVE_DEFERRED
+from src.core.distribution import GROUP_DIMENSIONS, ScoreDistribution
+from src.core.fault_injection import FaultInjectingCollection, InMemoryCollection
+from src.core.export import EXPORT_PROJECTION, EXPORT_SORT, export_row
+from src.core.feedback import rehydrate_feedback
+from src.core.history import HISTORY_SORT, PREVIOUS_ATTEMPT_PROJECTION, history_page, history_projection, history_query
+from src.core.indexes import ITEM_ROLLUP_INDEXES, LEADERBOARD_INDEXES, ROLLUP_INDEXES, ensure_indexes
+from src.core.item_analysis import apply_item_rollups, count_items, frame_answers, item_statistics, rollup_counts
+from src.core.leaderboard import ENTRY_PROJECTION, ENTRY_SORT, LeaderboardCache, apply_leaderboard, organization_key
+from src.core.rollups import apply_rollups, merge_rollups
 
 
 class ModelService:
     """Service for loading and managing the ML model and data with ML-based predictions"""
     
+    # Category stored on every assessment document and statistics rollup
+    CATEGORY = 'phishing-detection'
+    
     def __init__(self):
         self.model = None
         self.scaler = None
         self.feature_names = None
         self.answer_sheet = {}
         self.questions_data = []
-        self.explanation_bank = []
+        self.answer_key = AnswerKey([])
+        self._feature_columns: Dict[Tuple[int, str], List[int]] = {}
+        self.explanation_store: Optional[ExplanationStore] = None
+        self.model_version = 'none'
+        self._init_caches()
         self.mongo_client = None
         self.db = None
         self.assessments_collection = None
+        self.rollups_collection = None
+        self.leaderboard_collection = None
+        self.item_rollups_collection = None
+        self.score_distribution = ScoreDistribution(
+            settings.get_absolute_path(settings.PERCENTILE_SNAPSHOT_PATH), settings.PERCENTILE_MIN_SAMPLE
+        )
+        self.leaderboard_cache = LeaderboardCache(
+            settings.LEADERBOARD_TOP_K, settings.LEADERBOARD_CACHE_ORGANIZATIONS, settings.LEADERBOARD_CACHE_TTL_SECONDS
+        )
+        self.archive = self._open_archive()
         self._init_mongodb()
     
+    def _open_archive(self) -> AssessmentArchive:
+        """The local archive of old assessments, empty until archive_assessments.py first runs"""
+        return AssessmentArchive(
+            settings.get_absolute_path(settings.ARCHIVE_DIR), self.CATEGORY, settings.ARCHIVE_ROW_GROUP_ROWS
+        )
+    
+    def _init_caches(self):
+        """Create the named caches, sharing one on-disk tier between them"""
+        self.disk_cache = None
+        if settings.CACHE_DISK_ENABLED:
+            self.disk_cache = DiskCache(
+                settings.get_absolute_path(settings.CACHE_DISK_PATH),
+                settings.CACHE_DISK_MAX_MB * 1024 * 1024
+            )
+        namespace = settings.CACHE_NAMESPACE
+        self.result_cache = TieredCache(
+            f"{namespace}:results",
+            MemoryCache(
+                settings.RESULT_CACHE_MAX_ENTRIES if settings.RESULT_CACHE_ENABLED else 0,
+                settings.RESULT_CACHE_TTL_SECONDS
+            ),
+            self.disk_cache if settings.RESULT_CACHE_ENABLED else None
+        )
+        # Rebuilding these from the answer sheet and the mmap'd store is cheaper than a disk read
+        self.questions_cache = TieredCache(f"{namespace}:questions", MemoryCache(1, 0))
+        self.explanation_cache = TieredCache(
+            f"{namespace}:explanations", MemoryCache(settings.CACHE_MEMORY_MAX_ENTRIES, 0)
+        )
+        # Results of recent submissions by idempotency key, shared with other workers through the disk tier
+        self.idempotency_cache = TieredCache(
+            f"{namespace}:idempotency",
+            MemoryCache(
+                settings.CACHE_MEMORY_MAX_ENTRIES if settings.IDEMPOTENCY_ENABLED else 0,
+                settings.IDEMPOTENCY_TTL_SECONDS
+            ),
+            self.disk_cache if settings.IDEMPOTENCY_ENABLED else None
+        )
+        # Last good MongoDB query results, served while the database circuit is open
+        self.read_cache = TieredCache(
+            f"{namespace}:mongo-reads", MemoryCache(1000, settings.MONGO_READ_CACHE_TTL_SECONDS)
+        )
+        # Aggregated statistics; entries outlive their TTL so a stale one can be served during a refresh
+        self.stats_cache = TieredCache(
+            f"{namespace}:stats",
+            MemoryCache(100, settings.STATS_CACHE_TTL_SECONDS + settings.MONGO_READ_CACHE_TTL_SECONDS),
+            self.disk_cache
+        )
+    
+    def cache_stats(self) -> Dict:
+        """Hit rate, size and eviction counters of every cache tier"""
+        caches = [self.questions_cache, self.explanation_cache, self.result_cache, self.idempotency_cache, self.read_cache, self.stats_cache]
+        stats = {cache.namespace: cache.stats() for cache in caches}
+        stats['disk'] = self.disk_cache.stats() if self.disk_cache is not None else None
+        return stats
+    
     def _init_mongodb(self):
-        """Initialize MongoDB connection"""
+        """Initialize MongoDB connection behind a circuit breaker"""
+        self.mongo_breaker = CircuitBreaker(
+            'mongodb',
+            window_size=settings.MONGO_BREAKER_WINDOW,
+            min_calls=settings.MONGO_BREAKER_MIN_CALLS,
+            failure_rate=settings.MONGO_BREAKER_FAILURE_RATE,
+            slow_call_ms=settings.MONGO_BREAKER_SLOW_CALL_MS,
+            slow_call_rate=settings.MONGO_BREAKER_SLOW_CALL_RATE,
+            open_seconds=settings.MONGO_BREAKER_OPEN_SECONDS,
+            half_open_probes=settings.MONGO_BREAKER_HALF_OPEN_PROBES,
+            ignored_errors=(DuplicateKeyError, BulkWriteError)
+        )
+        self.fallback_path = settings.get_absolute_path(settings.MONGO_FALLBACK_PATH)
+        self._fallback_lock = threading.Lock()
+        self.fault_injector: Optional[FaultInjectingCollection] = None
+        self._indexes_ready = False
+        connected = False
         try:
             mongo_uri = settings.MONGO_URI
             self.mongo_client = MongoClient(mongo_uri)
+            # The client reconnects by itself, so the handles stay usable if MongoDB is down right now
+            self.db = self.mongo_client.get_default_database()
+            self.assessments_collection = self.db[settings.MONGO_COLLECTION]
+            self.rollups_collection = self.db[settings.MONGO_ROLLUP_COLLECTION]
+            self.leaderboard_collection = self.db[settings.MONGO_LEADERBOARD_COLLECTION]
+            self.item_rollups_collection = self.db[settings.MONGO_ITEM_ROLLUP_COLLECTION]
             # Test connection
             self.mongo_client.admin.command('ping')
-            self.db = self.mongo_client.get_default_database()
-            self.assessments_collection = self.db['phishing_assessments']
+            connected = True
             print(f"✅ Connected to MongoDB: {self.db.name}")
         except ConnectionFailure as e:
             print(f"⚠️ MongoDB connection failed: {e}")
-            print("   Assessment results will not be saved to database")
+            print("   Assessment results go to the local fallback until MongoDB is reachable")
+            self.mongo_breaker.trip('MongoDB unreachable at startup')
         except Exception as e:
             print(f"⚠️ MongoDB initialization error: {e}")
         
+        if settings.MONGO_FAULT_INJECTION:
+            # Test stand-in: without a reachable MongoDB, faults are injected into an in-memory collection
+            collection = self.assessments_collection if connected else InMemoryCollection(settings.MONGO_COLLECTION)
+            self.fault_injector = FaultInjectingCollection(
+                collection, settings.MONGO_FAULT_ERROR_RATE, settings.MONGO_FAULT_LATENCY_MS
+            )
+            self.assessments_collection = self.fault_injector
+            # Faults are only injected into the assessment writes; rollups and leaderboard follow whether those succeed
+            if not connected:
+                self.rollups_collection = InMemoryCollection(settings.MONGO_ROLLUP_COLLECTION)
+                self.leaderboard_collection = InMemoryCollection(settings.MONGO_LEADERBOARD_COLLECTION)
+                self.item_rollups_collection = InMemoryCollection(settings.MONGO_ITEM_ROLLUP_COLLECTION)
+            self.mongo_breaker.reset()
+            print(f"⚠️ MongoDB fault injection enabled ({type(collection).__name__})")
+        
+        if self.assessments_collection is not None and self.mongo_breaker.state == CLOSED:
+            self._ensure_indexes()
+    
+    def _ensure_indexes(self):
+        """Create the collection's indexes if missing; safe to repeat, retried after a later write on failure"""
+        try:
+            names = self.mongo_breaker.call(ensure_indexes, self.assessments_collection)
+            names += self.mongo_breaker.call(ensure_indexes, self.rollups_collection, ROLLUP_INDEXES)
+            names += self.mongo_breaker.call(ensure_indexes, self.leaderboard_collection, LEADERBOARD_INDEXES)
+            names += self.mongo_breaker.call(ensure_indexes, self.item_rollups_collection, ITEM_ROLLUP_INDEXES)
+            self._indexes_ready = True
+            print(f"✅ MongoDB indexes in place: {', '.join(names)}")
+        except Exception as e:
+            print(f"⚠️ Could not create MongoDB indexes: {e}")
+        
     def load_components(self):
         """Load all required components"""
         try:
@@ -72,19 +214,20 @@ class ModelService:
                             self.answer_sheet[question_text] = options_dict
                             self.questions_data.append(q_item)
                 
+                self.answer_key = AnswerKey(self.questions_data)
                 print(f"✅ Loaded {len(self.questions_data)} questions from answer sheet")
             except FileNotFoundError:
                 print("⚠️ Answer sheet not found - service running with empty questions")
             
-            # Load explanation bank
             try:
-                explanation_path = settings.get_absolute_path(settings.EXPLANATION_BANK_PATH)
-                with open(explanation_path, 'r', encoding='utf-8') as f:
-                    self.explanation_bank = json.load(f)
-                print(f"✅ Loaded {len(self.explanation_bank)} explanations")
+                self.explanation_store = open_explanation_store(
+                    settings.get_absolute_path(settings.EXPLANATION_BANK_PATH),
+                    settings.get_absolute_path(settings.EXPLANATION_STORE_PATH)
+                )
+                print(f"✅ Loaded {len(self.explanation_store)} explanations (store {self.explanation_store.version[:8]})")
             except FileNotFoundError:
                 print("⚠️ Explanation bank not found, using fallback explanations")
-                self.explanation_bank = []
+                self.explanation_store = None
             
             # Load trained ML model
             try:
@@ -108,19 +251,54 @@ class ModelService:
             try:
                 feature_names_path = settings.get_absolute_path(settings.FEATURE_NAMES_PATH)
                 self.feature_names = joblib.load(feature_names_path)
+                self._feature_columns = {}
                 print(f"✅ Loaded {len(self.feature_names)} feature names")
             except Exception as e:
                 print(f"⚠️ Could not load feature names: {e}")
                 self.feature_names = None
             
+            # Cached payloads are only valid for the content and artifacts that produced them
+            self.model_version = self._artifact_version(
+                settings.MODEL_PATH, settings.SCALER_PATH, settings.FEATURE_NAMES_PATH
+            )
+            bank_version = self.explanation_bank_version
+            self.questions_cache.set_version(self.answer_key.version)
+            self.explanation_cache.set_version(bank_version)
+            self.result_cache.set_version(cache_key(self.answer_key.version, self.model_version, bank_version))
+            
             return True
             
         except Exception as e:
             print(f"❌ Error loading components: {e}")
             return False
     
+    def _artifact_version(self, *relative_paths: str) -> str:
+        """Content hash of the model artifacts that exist on disk"""
+        digest = hashlib.blake2b(digest_size=8)
+        for relative_path in relative_paths:
+            path = settings.get_absolute_path(relative_path)
+            if path.exists():
+                digest.update(path.read_bytes())
+        return digest.hexdigest()
+    
+    def result_cache_key(self, rows: np.ndarray, cols: np.ndarray, user_profile: Dict) -> Optional[str]:
+        """Result cache key for a resolved submission, None when an answer did not resolve"""
+        if (rows < 0).any() or (cols < 0).any():
+            return None
+        return cache_key(
+            rows,
+            cols,
+            user_profile.get('gender', ''),
+            user_profile.get('education_level', ''),
+            user_profile.get('proficiency', '')
+        )
+    
     def get_questions(self) -> List[Dict]:
         """Get all questions with options"""
+        questions = self.questions_cache.get('all')
+        if questions is not None:
+            return questions
+        
         questions = []
         for idx, q_item in enumerate(self.questions_data, 1):
             question_id = q_item.get('questionId', f"Q{idx:02d}")
@@ -137,61 +315,44 @@ class ModelService:
                 ],
                 'category': 'Phishing Detection'
             })
+        self.questions_cache.put('all', questions)
         return questions
     
-    def calculate_score(self, question_text: str, selected_option: str) -> Dict:
+    def calculate_score(self, question_text: str, selected_option: str,
+                        question_id: Optional[str] = None, selected_option_index: Optional[int] = None) -> Dict:
         """Calculate score for a single answer"""
-        if question_text in self.answer_sheet:
-            options = self.answer_sheet[question_text]
-            if selected_option in options:
-                return {
-                    'score': options[selected_option]['weight'],
-                    'level': options[selected_option]['level']
-                }
+        row, col = self.answer_key.resolve(question_id, question_text, selected_option_index, selected_option)
+        if row >= 0 and col >= 0:
+            return {
+                'score': int(self.answer_key.weights[row, col]),
+                'level': self.answer_key.level_names[self.answer_key.levels[row, col]]
+            }
         return {'score': 0, 'level': 'wrong'}
     
     def get_explanation(self, question_id: str, option: str, user_profile: Dict) -> str:
         """Get fully personalized explanation based on user demographics"""
+        key = '\x1f'.join(str(part) for part in (
+            question_id, option,
+            user_profile.get('gender'), user_profile.get('education_level'), user_profile.get('proficiency')
+        ))
+        explanation = self.explanation_cache.get(key)
+        if explanation is None:
+            explanation = self._lookup_explanation(question_id, option, user_profile)
+            self.explanation_cache.put(key, explanation)
+        return explanation
+    
+    def _lookup_explanation(self, question_id: str, option: str, user_profile: Dict) -> str:
+        """Look up the closest-profile explanation in the compiled store"""
         gender = user_profile.get('gender', 'Male')
         education = user_profile.get('education_level', 'Degree')
         proficiency = user_profile.get('proficiency', 'High')
         
-        normalized_qid = question_id
-        if question_id.startswith('Q0'):
-            normalized_qid = question_id.replace('Q0', 'Q')
-        
-        print(f"🔍 [Phishing] Looking for explanation: Q={normalized_qid}, Option={option}, Gender={gender}, Edu={education}, Prof={proficiency}")
-        
-        if proficiency in ['School', 'school']:
-            proficiency = 'School'
-        elif proficiency in ['High', 'High Education', 'high', 'high education']:
-            proficiency = 'High'
-        
-        # Search explanation bank for exact match
-        for exp in self.explanation_bank:
-            if (exp.get('questionId') == normalized_qid and 
-                exp.get('option') == option):
-                profile = exp.get('profile', {})
-                if (profile.get('gender') == gender and
-                    profile.get('education') == education and
-                    profile.get('proficiency') == proficiency):
-                    print(f"✅ [Phishing] Found exact match!")
-                    return exp.get('explanation', '')
-        
-        # Fallback: Try without proficiency match
-        for exp in self.explanation_bank:
-            if (exp.get('questionId') == normalized_qid and 
-                exp.get('option') == option):
-                profile = exp.get('profile', {})
-                if (profile.get('gender') == gender and
-                    profile.get('education') == education):
-                    return exp.get('explanation', '')
-        
-        # Try just question and option match
-        for exp in self.explanation_bank:
-            if (exp.get('questionId') == normalized_qid and 
-                exp.get('option') == option):
-                return exp.get('explanation', '')
+        if self.explanation_store is not None:
+            explanation = self.explanation_store.lookup(
+                question_id, option, gender, education, proficiency
+            )
+            if explanation is not None:
+                return explanation
         
         return f"Consider reviewing your understanding of phishing detection. Focus on security best practices."
     
@@ -207,32 +368,365 @@ class ModelService:
         }
         return advice_map.get(level_lower, 'Continue learning about phishing detection.')
     
-    def save_assessment(self, result: Dict) -> bool:
-        """Save assessment result to MongoDB"""
+    def _assessment_document(self, result: Dict, created_at: Optional[datetime] = None) -> Dict:
+        """Prepare an assessment result for MongoDB"""
+        profile_fields = ('email', 'name', 'organization', 'gender', 'education_level', 'proficiency')
+        user_profile = result.get('user_profile') or {field: result.get(field) for field in profile_fields}
+        document = {
+            'timestamp': result.get('timestamp'),
+            'user_profile': user_profile,
+            # Top-level copies of the fields the history and leaderboard indexes are built on
+            'email': (user_profile.get('email') or '').strip().lower() or None,
+            'organization': user_profile.get('organization'),
+            'total_score': result.get('total_score', 0),
+            'max_score': result.get('max_score', 0),
+            'percentage': result.get('percentage', 0),
+            'overall_knowledge_level': result.get('overall_knowledge_level', 'Beginner'),
+            'ml_awareness_level': result.get('ml_awareness_level'),
+            'ml_confidence': result.get('ml_confidence'),
+            'category': self.CATEGORY,
+            'created_at': created_at or datetime.now()
+        }
+        # Per-question feedback is stored compact; its texts are rehydrated on read
+        if result.get('feedback'):
+            document['feedback'] = result['feedback']
+        elif result.get('detailed_feedback'):
+            document['detailed_feedback'] = result['detailed_feedback']
+        if result.get('idempotency_key'):
+            document['idempotency_key'] = result['idempotency_key']
+        return document
+    
+    def save_assessment(self, result: Dict) -> Union[bool, str]:
+        """Save assessment result to MongoDB, spooling it locally while the circuit is open"""
         try:
             if self.assessments_collection is None:
                 print("⚠️ MongoDB not connected, assessment not saved")
                 return False
             
-            assessment_doc = {
-                'timestamp': result.get('timestamp'),
-                'user_profile': result.get('user_profile', {}),
-                'total_score': result.get('total_score', 0),
-                'max_score': result.get('max_score', 0),
-                'percentage': result.get('percentage', 0),
-                'overall_knowledge_level': result.get('overall_knowledge_level', 'Beginner'),
-                'detailed_feedback': result.get('detailed_feedback', []),
-                'category': 'phishing-detection',
-                'created_at': datetime.now()
-            }
-            
-            insert_result = self.assessments_collection.insert_one(assessment_doc)
+            # Insert into MongoDB
+            document = self._assessment_document(result)
+            insert_result = self.mongo_breaker.call(self.assessments_collection.insert_one, document)
             print(f"✅ Assessment saved to MongoDB: {insert_result.inserted_id}")
+            self._record_saved([document])
+            self._after_write()
             return True
             
+        except DuplicateKeyError:
+            print("↩️ Duplicate submission, assessment was already saved")
+            return True
+        except CircuitOpenError:
+            return self._spool([result])
         except Exception as e:
             print(f"❌ Error saving assessment to MongoDB: {e}")
+            return self._spool([result])
+    
+    def save_assessments(self, results: List[Dict]) -> int:
+        """Save many assessment results with a single bulk insert, returning the saved count"""
+        if not results:
+            return 0
+        try:
+            if self.assessments_collection is None:
+                return 0
+            
+            documents = [self._assessment_document(result) for result in results]
+            insert_result = self.mongo_breaker.call(
+                self.assessments_collection.insert_many, documents, ordered=False
+            )
+            self._record_saved(documents)
+            self._after_write()
+            return len(insert_result.inserted_ids)
+            
+        except CircuitOpenError:
+            self._spool(results)
+            return 0
+        except BulkWriteError as e:
+            inserted = e.details.get('nInserted', 0)
+            print(f"❌ Bulk insert partially failed ({inserted}/{len(results)} saved): {e}")
+            self._record_saved(self._inserted_documents(documents, e))
+            return inserted
+        except Exception as e:
+            print(f"❌ Error saving assessments to MongoDB: {e}")
+            self._spool(results)
+            return 0
+    
+    def _spool(self, results: List[Dict]) -> Union[bool, str]:
+        """Append results to the local fallback file, to be replayed once MongoDB is back"""
+        spooled_at = datetime.now().isoformat()
+        lines = ''.join(
+            json.dumps({'spooled_at': spooled_at, 'result': result}, default=str) + '\n' for result in results
+        )
+        try:
+            with self._fallback_lock:
+                self.fallback_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.fallback_path, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+            print(f"📥 {len(results)} assessment(s) spooled to {self.fallback_path.name} until MongoDB is back")
+            return SAVE_DEFERRED
+        except OSError as e:
+            print(f"❌ Error spooling assessment to the fallback file: {e}")
+            return False
+    
+    @staticmethod
+    def _inserted_documents(documents: List[Dict], error: BulkWriteError) -> List[Dict]:
+        """Documents of an unordered bulk insert that were not rejected"""
+        rejected = {write_error['index'] for write_error in error.details.get('writeErrors', [])}
+        return [document for position, document in enumerate(documents) if position not in rejected]
+    
+    def _record_saved(self, documents: List[Dict]):
+        """
+        Feed newly saved assessments to the score distribution, the statistics
+        and item rollups and the leaderboard; a failed rollup or leaderboard
+        write leaves them behind until a backfill
+        """
+        if not documents:
+            return
+        self.score_distribution.add(documents)
+        if self.rollups_collection is None:
+            return
+        try:
+            self.mongo_breaker.call(apply_rollups, self.rollups_collection, documents)
+        except Exception as e:
+            print(f"⚠️ Statistics rollups not updated for {len(documents)} assessment(s), "
+                  f"run backfill_rollups.py to repair: {e}")
+        try:
+            updated = self.mongo_breaker.call(apply_leaderboard, self.leaderboard_collection, documents)
+            for organization, entry in updated:
+                self.leaderboard_cache.update(organization, entry)
+        except Exception as e:
+            print(f"⚠️ Leaderboard not updated for {len(documents)} assessment(s), "
+                  f"run backfill_rollups.py to repair: {e}")
+        try:
+            self.mongo_breaker.call(
+                apply_item_rollups, self.item_rollups_collection, self.answer_key, self.CATEGORY, documents
+            )
+        except Exception as e:
+            print(f"⚠️ Item rollups not updated for {len(documents)} assessment(s), "
+                  f"run backfill_rollups.py to repair: {e}")
+    
+    def _after_write(self):
+        """Once a write succeeded: create any missing indexes, then replay the fallback spool"""
+        if not self._indexes_ready:
+            self._ensure_indexes()
+        self._replay_fallback()
+    
+    def _replay_fallback(self):
+        """Insert spooled assessments once MongoDB accepts writes again"""
+        claimed = self.fallback_path.with_name(f"{self.fallback_path.name}.{os.getpid()}.replay")
+        if not (self.fallback_path.exists() or claimed.exists()):
+            return
+        if not self._fallback_lock.acquire(blocking=False):
+            return
+        documents: List[Dict] = []
+        try:
+            # Claim the spool first so new appends, from this or any other worker, start a fresh file
+            if not claimed.exists():
+                os.replace(self.fallback_path, claimed)
+            entries = [json.loads(line) for line in claimed.read_text(encoding='utf-8').splitlines() if line.strip()]
+            documents = [
+                self._assessment_document(entry['result'], datetime.fromisoformat(entry['spooled_at']))
+                for entry in entries
+            ]
+            if documents:
+                self.mongo_breaker.call(self.assessments_collection.insert_many, documents, ordered=False)
+                self._record_saved(documents)
+            claimed.unlink()
+            print(f"✅ Replayed {len(entries)} spooled assessments into MongoDB")
+        except FileNotFoundError:
+            pass
+        except BulkWriteError as e:
+            # Whatever was rejected (e.g. duplicates of already saved results) will not succeed on retry
+            claimed.unlink(missing_ok=True)
+            print(f"⚠️ Replayed spooled assessments with errors: {e.details.get('nInserted', 0)} inserted")
+            self._record_saved(self._inserted_documents(documents, e))
+        except Exception as e:
+            print(f"⚠️ Replaying spooled assessments failed, will retry: {e}")
+        finally:
+            self._fallback_lock.release()
+    
+    def find_assessments(self, query: Dict, projection: Optional[Dict] = None,
+                         sort: Optional[List[Tuple[str, int]]] = None, limit: int = 0) -> List[Dict]:
+        """
+        Query assessments through the circuit breaker
+        
+        While the circuit is open, or when the query fails, the last good result
+        of the same query is served from the read cache, or an empty list.
+        """
+        return self._read_through(
+            ['find', query, projection, sort, limit],
+            lambda: list(self.assessments_collection.find(query, projection, sort=sort, limit=limit))
+        )
+    
+    def _read_through(self, query_parts: List, read) -> List[Dict]:
+        key = cache_key(json.dumps(query_parts, sort_keys=True, default=str))
+        if self.assessments_collection is not None:
+            try:
+                documents = self.mongo_breaker.call(read)
+                self.read_cache.put(key, documents)
+                return documents
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                print(f"❌ Error reading assessments from MongoDB: {e}")
+        return self.read_cache.get(key) or []
+    
+    def read_rollups(self, query: Dict) -> Dict:
+        """Merged statistics rollups matching ``query``, with the same fallback as find_assessments"""
+        return merge_rollups(self._read_through(
+            ['rollups', query], lambda: list(self.rollups_collection.find(query, {'_id': 0}))
+        ))
+    
+    def item_analysis(self, source: str) -> Dict:
+        """
+        Per-question statistics of the saved assessments, merged from the item
+        rollups, or of the training dataset, counted from the CSV in one pass
+        """
+        if source == 'dataset':
+            frame = pd.read_csv(settings.get_absolute_path(settings.DATASET_CSV))
+            counts = count_items(self.answer_key, frame_answers(self.answer_key, frame))
+        else:
+            rollups = self._read_through(
+                ['item-rollups', self.CATEGORY],
+                lambda: list(self.item_rollups_collection.find({'category': self.CATEGORY}, {'_id': 0, 'updated_at': 0}))
+            )
+            counts = rollup_counts(self.answer_key, rollups)
+        return {**item_statistics(self.answer_key, counts), 'source': source,
+                'question_set_version': self.answer_key.version}
+    
+    def get_leaderboard(self, organization: Optional[str], limit: int) -> List[Dict]:
+        """Top ``limit`` users by latest percentage, from the in-memory top k or the leaderboard index"""
+        key = organization_key(organization)
+        entries = self.leaderboard_cache.get(key, limit)
+        if entries is not None:
+            return entries
+        fetch = max(limit, self.leaderboard_cache.max_k)
+        entries = self._read_through(
+            ['leaderboard', key, fetch],
+            lambda: list(self.leaderboard_collection.find(
+                {'category': self.CATEGORY, 'organization': key}, ENTRY_PROJECTION, sort=ENTRY_SORT, limit=fetch
+            ))
+        )
+        self.leaderboard_cache.put(key, entries, complete=len(entries) < fetch)
+        return entries[:limit]
+    
+    def get_history(self, email: str, limit: int, fields: List[str], cursor: Optional[str] = None) -> Dict:
+        """One page of a user's attempts, newest first, through the (email, created_at) index"""
+        query, seen_ids = history_query(email, cursor)
+        projection = history_projection(fields)
+        # One more than the page: it tells whether there is a next one and gives the last attempt's improvement
+        wanted = limit + len(seen_ids) + 1
+        documents = self.find_assessments(query, projection, sort=HISTORY_SORT, limit=wanted)
+        if self._reaches_archive(documents, wanted):
+            archived = self.archive.history(query, projection, limit=wanted)
+            documents = list(merge_documents([documents, archived], newest_first=True))[:wanted]
+        if 'detailed_feedback' in fields:
+            # Copies: the documents may be the read-through cache's own entries
+            documents = [dict(document, detailed_feedback=self.stored_feedback(document)) for document in documents]
+        return history_page(documents, limit, fields, cursor, seen_ids)
+    
+    def _reaches_archive(self, documents: List[Dict], wanted: int) -> bool:
+        """Whether a newest-first read could continue into the archive"""
+        archived_before = self.archive.archived_before
+        if archived_before is None:
             return False
+        return len(documents) < wanted or documents[-1]['created_at'] < archived_before
+    
+    def stored_feedback(self, document: Dict) -> List[Dict]:
+        """Per-question feedback of a stored assessment, rehydrating its compact form"""
+        if not document.get('feedback'):
+            return document.get('detailed_feedback') or []
+        return rehydrate_feedback(
+            document['feedback'], document.get('user_profile') or {}, self.answer_key,
+            self.get_explanation, self.get_enhancement_advice
+        )
+    
+    @property
+    def explanation_bank_version(self) -> str:
+        """Version of the loaded explanation bank, which compact feedback references"""
+        return self.explanation_store.version if self.explanation_store is not None else 'none'
+    
+    def find_previous_attempt(self, email: str) -> Optional[Dict]:
+        """
+        The user's latest saved attempt, a single find_one on the (email, created_at)
+        index, or from the archive when none is left in MongoDB
+        """
+        if self.assessments_collection is None or not email:
+            return None
+        try:
+            document = self.mongo_breaker.call(
+                self.assessments_collection.find_one,
+                {'email': email.strip().lower()}, PREVIOUS_ATTEMPT_PROJECTION, sort=HISTORY_SORT
+            )
+            if document is None and self._reaches_archive([], 1):
+                document = self.archive.latest(email.strip().lower(), PREVIOUS_ATTEMPT_PROJECTION)
+            return document
+        except CircuitOpenError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Could not look up the previous attempt: {e}")
+            return None
+    
+    def export_assessments(self, query: Dict, batch_size: int) -> Iterator[Dict]:
+        """
+        Export rows of the matching assessments in created_at order, read
+        through a server-side cursor ``batch_size`` documents at a time
+        
+        Raises CircuitOpenError while the circuit is open: a partial export is
+        worse than none, so there is no cached fallback. Archived assessments
+        are merged in by created_at, a month at a time.
+        """
+        if self.assessments_collection is None:
+            raise ConnectionFailure("MongoDB not connected")
+        
+        def open_cursor():
+            cursor = iter(self.assessments_collection.find(
+                query, EXPORT_PROJECTION, sort=EXPORT_SORT, batch_size=batch_size
+            ))
+            # find() is lazy: fetch the first batch here, so the breaker sees a server that cannot be reached
+            first = next(cursor, None)
+            return cursor if first is None else itertools.chain([first], cursor)
+        
+        documents = self.mongo_breaker.call(open_cursor)
+        if self.archive.archived_before is not None:
+            documents = merge_documents([self.archive.find(query, EXPORT_PROJECTION), documents])
+        return (export_row(document) for document in documents)
+    
+    def sync_score_distribution(self) -> bool:
+        """
+        Reload the percentile score distribution from the rollups and snapshot it
+        
+        Without MongoDB, an empty distribution is loaded from the last snapshot instead.
+        """
+        if self.rollups_collection is not None and self.mongo_breaker.state == CLOSED:
+            try:
+                fields = {'_id': 0, 'histogram': 1, **{dimension: 1 for dimension in GROUP_DIMENSIONS}}
+                rollups = self.mongo_breaker.call(
+                    lambda: list(self.rollups_collection.find({'category': self.CATEGORY}, fields))
+                )
+                counted = self.score_distribution.load_rollups(rollups)
+                self.score_distribution.save_snapshot()
+                print(f"✅ Score distribution synced: {counted} assessments")
+                return True
+            except Exception as e:
+                print(f"⚠️ Could not sync the score distribution: {e}")
+        if self.score_distribution.source == 'empty' and self.score_distribution.load_snapshot():
+            print("📥 Score distribution loaded from the local snapshot")
+        return False
+    
+    def database_status(self) -> Dict:
+        """Circuit breaker state, fallback spool backlog and fault injection settings"""
+        spooled = 0
+        for path in [self.fallback_path, *self.fallback_path.parent.glob(f"{self.fallback_path.name}.*.replay")]:
+            try:
+                with open(path, 'rb') as f:
+                    spooled += sum(1 for _ in f)
+            except OSError:
+                pass
+        return {
+            'configured': self.assessments_collection is not None,
+            'circuit': self.mongo_breaker.stats(),
+            'fallback': {'path': str(self.fallback_path), 'spooled': spooled},
+            'fault_injection': self.fault_injector.stats() if self.fault_injector is not None else None,
+        }
     
     def get_overall_level(self, percentage: float) -> str:
         """Determine overall knowledge level based on percentage"""
@@ -315,29 +809,7 @@ class ModelService:
             
             print(f"🔮 [ML] Raw prediction: {prediction}, Confidence: {confidence:.2%}")
             
-            # The model directly predicts awareness levels: "High Awareness", "Moderate Awareness", "Low Awareness"
-            if isinstance(prediction, str):
-                # Check if prediction is already an awareness level
-                valid_awareness_levels = ["High Awareness", "Moderate Awareness", "Low Awareness"]
-                if prediction in valid_awareness_levels:
-                    awareness_level = prediction
-                else:
-                    # Fallback mapping for other prediction formats
-                    awareness_map_str = {
-                        'Beginner': "Low Awareness",
-                        'Basic': "Low Awareness",
-                        'Intermediate': "Moderate Awareness",
-                        'Advanced': "High Awareness",
-                        'Expert': "High Awareness"
-                    }
-                    awareness_level = awareness_map_str.get(prediction, "Unknown")
-            else:
-                awareness_map_num = {
-                    0: "Low Awareness",
-                    1: "Moderate Awareness",
-                    2: "High Awareness"
-                }
-                awareness_level = awareness_map_num.get(prediction, "Unknown")
+            awareness_level = self._awareness_from_prediction(prediction)
             
             print(f"✅ [ML] Awareness Level: {awareness_level}")
             return awareness_level, confidence
@@ -354,6 +826,88 @@ class ModelService:
             print(f"❌ Error in ML prediction: {e}")
             return "Unknown", 0.0
     
+    def _awareness_from_prediction(self, prediction) -> str:
+        """Map a raw model prediction to an awareness level"""
+        # The model directly predicts awareness levels: "High Awareness", "Moderate Awareness", "Low Awareness"
+        if isinstance(prediction, str):
+            # Check if prediction is already an awareness level
+            valid_awareness_levels = ["High Awareness", "Moderate Awareness", "Low Awareness"]
+            if prediction in valid_awareness_levels:
+                return prediction
+            else:
+                # Fallback mapping for other prediction formats
+                awareness_map_str = {
+                    'Beginner': "Low Awareness",
+                    'Basic': "Low Awareness",
+                    'Intermediate': "Moderate Awareness",
+                    'Advanced': "High Awareness",
+                    'Expert': "High Awareness"
+                }
+                return awareness_map_str.get(prediction, "Unknown")
+        else:
+            awareness_map_num = {
+                0: "Low Awareness",
+                1: "Moderate Awareness",
+                2: "High Awareness"
+            }
+            return awareness_map_num.get(prediction, "Unknown")
+    
+    def _feature_candidates(self, position: int, selected_option: str) -> List[int]:
+        """Feature columns an answer at the given position may activate, cached per option text"""
+        key = (position, selected_option)
+        if key not in self._feature_columns:
+            feature_names = list(self.feature_names)
+            feature_name = f"Q_{position}_{selected_option}"
+            if feature_name in feature_names:
+                candidates = [feature_names.index(feature_name)]
+            else:
+                candidates = [
+                    col for col, fn in enumerate(feature_names)
+                    if fn.endswith(f"_{selected_option}")
+                ]
+            self._feature_columns[key] = candidates
+        return self._feature_columns[key]
+    
+    def prepare_feature_matrix(self, answer_lists: List[List[str]]) -> Optional[np.ndarray]:
+        """Prepare one feature row per submission from lists of selected option texts"""
+        if not self.feature_names or not self.model:
+            print("⚠️ [ML] Feature names or model not loaded")
+            return None
+        
+        matrix = np.zeros((len(answer_lists), len(self.feature_names)))
+        for row, selected_options in enumerate(answer_lists):
+            for position, selected_option in enumerate(selected_options):
+                # First candidate not already set wins (see prepare_features)
+                for col in self._feature_candidates(position, selected_option):
+                    if matrix[row, col] == 0:
+                        matrix[row, col] = 1
+                        break
+        return matrix
+    
+    def predict_awareness_batch(self, answer_lists: List[List[str]]) -> List[Tuple[str, float]]:
+        """Predict awareness levels for many submissions with a single model call"""
+        unknown = [("Unknown", 0.0)] * len(answer_lists)
+        if not answer_lists or not self.model or not self.scaler:
+            return unknown
+        
+        try:
+            features = self.prepare_feature_matrix(answer_lists)
+            if features is None:
+                return unknown
+            
+            features_scaled = self.scaler.transform(features)
+            predictions = self.model.predict(features_scaled)
+            confidences = self.model.predict_proba(features_scaled).max(axis=1)
+            
+            return [
+                (self._awareness_from_prediction(prediction), float(confidence))
+                for prediction, confidence in zip(predictions, confidences)
+            ]
+            
+        except Exception as e:
+            print(f"❌ [ML] Batch prediction error: {e}")
+            return unknown
+    
     def get_ml_based_recommendations(self, awareness_level: str, confidence: float, 
                                      user_profile: Dict) -> List[str]:
         """Generate personalized recommendations based on ML prediction and user profile"""
@@ -396,7 +950,8 @@ class ModelService:
             'feature_names_loaded': self.feature_names is not None,
             'answer_sheet_loaded': len(self.answer_sheet) > 0,
             'questions_loaded': len(self.questions_data) > 0,
-            'explanation_bank_loaded': len(self.explanation_bank) > 0,
+            'explanation_bank_loaded': self.explanation_store is not None and len(self.explanation_store) > 0,
+            'database_circuit_closed': self.mongo_breaker.state == CLOSED,
         }
 
 
@@ -0,0 +1,79 @@
+"""
+Short-TTL cached values refreshed by a single task
+
+For read endpoints backed by expensive queries (statistics, leaderboards)
+that many clients poll. A value younger than the TTL is served as is. Once
+it goes stale, the first caller starts one refresh and everyone - including
+that caller - keeps getting the stale value until the refresh lands, so
+polling never runs the query concurrently within a process. Only a cold
+cache makes callers wait, and then all of them wait on the same refresh.
+Values are stored in a TieredCache, so workers on the same host also pick
+up each other's results through its disk tier.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from src.core.cache import TieredCache
+
+
+class SingleFlightCache:
+    """TTL cache whose stale entries are refreshed by at most one task per key"""
+
+    def __init__(self, cache: TieredCache, ttl_seconds: float):
+        self.cache = cache
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.fresh = 0
+        self.stale = 0
+        self.waited = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+        """
+        Return ``{'value', 'computed_at'}`` for ``key``.
+
+        ``loader`` computes a fresh, JSON-serializable value; it is only
+        called when no refresh of ``key`` is already running.
+        """
+        entry = self.cache.get(key)
+        if entry is not None and time.time() - entry['computed_at'] < self.ttl_seconds:
+            self.fresh += 1
+            return entry
+
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(key, loader))
+            # A failed background refresh is already logged; nobody may be awaiting it
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._refreshing[key] = task
+        if entry is not None:
+            self.stale += 1
+            return entry
+        self.waited += 1
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+        try:
+            entry = {'value': await loader(), 'computed_at': time.time()}
+            self.cache.put(key, entry)
+            self.refreshes += 1
+            return entry
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ Refresh of {self.cache.namespace}:{key} failed: {e}")
+            raise
+        finally:
+            self._refreshing.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'ttl_seconds': self.ttl_seconds,
+            'refreshing': len(self._refreshing),
+            'fresh': self.fresh,
+            'stale': self.stale,
+            'waited': self.waited,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+        }
@@ -0,0 +1,66 @@
+"""
+Assessment statistics from fixed-bin score histograms
+
+Scores are summarized by count, sum and sum of squares plus a histogram of
+the percentage in fixed one-point bins, which the daily rollups (see
+rollups.py) maintain incrementally. Mean and standard deviation follow from
+the sums; percentiles are read off the histogram, exact to within a bin.
+"""
+import math
+from typing import Any, Dict, List, Optional
+
+# Percentage scores fall in [0, 100]; bin b holds scores in [b, b + 1), bin 100 holds exactly 100
+SCORE_BINS = 101
+PERCENTILES = (25, 50, 75, 90, 99)
+
+
+def histogram_percentile(histogram: List[int], percentile: float) -> Optional[float]:
+    """Score below which ``percentile`` percent of the histogram falls, interpolated within its bin"""
+    total = sum(histogram)
+    if not total:
+        return None
+    target = total * percentile / 100
+    cumulative = 0
+    for score, count in enumerate(histogram):
+        if count and cumulative + count >= target:
+            width = 1 if score < SCORE_BINS - 1 else 0
+            return round(score + width * (target - cumulative) / count, 2)
+        cumulative += count
+    return float(SCORE_BINS - 1)
+
+
+def _distribution(counts: Dict[str, int]) -> Dict[str, int]:
+    return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+
+def summarize_statistics(totals: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn merged rollup totals into the /api/stats response body"""
+    total = totals.get('count', 0)
+    if not total:
+        return {
+            "total_assessments": 0,
+            "average_score": 0,
+            "message": "No assessments found"
+        }
+
+    mean = totals['score_sum'] / total
+    variance = max(0.0, totals['score_sum_sq'] / total - mean * mean)
+    # Interpolating within a bin can overshoot the extremes actually observed
+    low, high = totals.get('score_min'), totals.get('score_max')
+    percentiles = {}
+    for p in PERCENTILES:
+        value = histogram_percentile(totals['histogram'], p)
+        if value is not None and low is not None and high is not None:
+            value = min(high, max(low, value))
+        percentiles[f"p{p}"] = value
+    return {
+        "total_assessments": total,
+        "average_score": round(mean, 2),
+        "std_dev": round(math.sqrt(variance), 2),
+        "min_score": low,
+        "max_score": high,
+        "percentiles": percentiles,
+        "level_distribution": _distribution(totals.get('levels', {})),
+        "ml_awareness_distribution": _distribution(totals.get('ml_levels', {})),
+        "message": "Statistics retrieved successfully"
+    }
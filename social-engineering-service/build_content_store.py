@@ -0,0 +1,37 @@
+"""
+Compile the explanation bank into the memory-mapped content store
+Run this script from the project root directory
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from config.settings import settings
+from src.core.content_store import ExplanationStore, compile_explanation_bank
+
+
+def main():
+    source_path = settings.get_absolute_path(settings.EXPLANATION_BANK_PATH)
+    store_path = settings.get_absolute_path(settings.EXPLANATION_STORE_PATH)
+
+    if not source_path.exists():
+        print(f"❌ Explanation bank not found: {source_path}")
+        return 1
+
+    print(f"📁 Source: {source_path}")
+    count = compile_explanation_bank(source_path, store_path)
+
+    store = ExplanationStore(store_path)
+    print(f"✅ Compiled {count} explanations -> {store_path}")
+    print(f"   Size: {store_path.stat().st_size} bytes (source {source_path.stat().st_size} bytes)")
+    print(f"   Version: {store.version}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Check the MongoDB circuit breaker, the fallback spool and duplicate submissions offline
+Run this script from the project root directory
+
+    python check_resilience.py
+
+Runs the write paths against the fault-injecting in-memory collection, with
+the spool and caches in a temporary directory, so no MongoDB is needed:
+the breaker goes open -> half-open -> closed (and back to open on a failed
+probe), spooled assessments are replayed exactly once, and a resubmitted
+idempotency key is saved once. Exits 1 when any check fails.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+# Settings are read when first imported: point every write at a scratch directory and an unreachable MongoDB
+scratch = Path(tempfile.mkdtemp(prefix='check_resilience_'))
+os.environ.update({
+    'MONGO_URI': 'mongodb://127.0.0.1:1/gamification?serverSelectionTimeoutMS=200&connectTimeoutMS=200',
+    'MONGO_FAULT_INJECTION': 'true',
+    'MONGO_FAULT_ERROR_RATE': '0',
+    'MONGO_FAULT_LATENCY_MS': '0',
+    'MONGO_BREAKER_MIN_CALLS': '3',
+    'MONGO_BREAKER_OPEN_SECONDS': '0.2',
+    'MONGO_BREAKER_HALF_OPEN_PROBES': '2',
+    'MONGO_FALLBACK_PATH': str(scratch / 'pending_assessments.jsonl'),
+    'PERCENTILE_SNAPSHOT_PATH': str(scratch / 'score_distribution.json'),
+    'CACHE_DISK_ENABLED': 'false',
+})
+
+from src.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from src.core.fault_injection import FaultInjectingCollection, InMemoryCollection
+from src.core.service import SAVE_DEFERRED, ModelService
+
+failures = []
+
+
+def check(description: str, passed: bool):
+    """Print one check and remember a failure"""
+    print(f"{'✅' if passed else '❌'} {description}")
+    if not passed:
+        failures.append(description)
+
+
+def result_for(number: int, idempotency_key: str = None) -> dict:
+    """A minimal graded result, shaped like the one the API saves"""
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'user_profile': {'email': f"check{number}@example.com", 'name': f"Check {number}",
+                         'organization': 'Resilience check', 'gender': 'Other',
+                         'education_level': 'Other', 'proficiency': 'Beginner'},
+        'total_score': number % 10,
+        'max_score': 10,
+        'percentage': (number % 10) * 10.0,
+        'overall_knowledge_level': 'Beginner',
+        'ml_awareness_level': 'Beginner',
+        'ml_confidence': 0.5,
+    }
+    if idempotency_key:
+        result['idempotency_key'] = idempotency_key
+    return result
+
+
+def check_breaker():
+    """open -> half-open -> closed, and a failed probe opens the circuit again"""
+    print("\n🔌 Circuit breaker")
+    collection = FaultInjectingCollection(InMemoryCollection('breaker_check'), 1.0, 0)
+    breaker = CircuitBreaker('check', window_size=10, min_calls=3, failure_rate=0.5,
+                             open_seconds=0.2, half_open_probes=2)
+    for number in range(3):
+        try:
+            breaker.call(collection.insert_one, {'number': number})
+        except Exception:
+            pass
+    check("opens once the failure rate is reached", breaker.state == OPEN)
+
+    injected = collection.stats()['injected_errors']
+    try:
+        breaker.call(collection.insert_one, {'number': 3})
+        short_circuited = False
+    except CircuitOpenError:
+        short_circuited = True
+    check("short-circuits without calling the collection while open",
+          short_circuited and collection.stats()['injected_errors'] == injected)
+
+    time.sleep(0.25)
+    check("admits a probe after the open period", breaker.allow() and breaker.state == HALF_OPEN)
+    breaker.record(True, 0.0, RuntimeError('probe failed'))
+    check("a failed probe opens the circuit again", breaker.state == OPEN and breaker.times_opened == 2)
+
+    time.sleep(0.25)
+    collection.configure(error_rate=0.0)
+    breaker.call(collection.insert_one, {'number': 4})
+    check("stays half-open until every probe succeeded", breaker.state == HALF_OPEN)
+    breaker.call(collection.insert_one, {'number': 5})
+    check("closes after the probes succeeded", breaker.state == CLOSED)
+    check("only the probes reached the collection", collection.count_documents({}) == 2)
+
+
+def check_spool_replay():
+    """Saves spool while MongoDB fails and are replayed once when it is back"""
+    print("\n📥 Fallback spool")
+    service = ModelService()
+    claimed = service.fallback_path.with_name(f"{service.fallback_path.name}.{os.getpid()}.replay")
+    service.fault_injector.configure(error_rate=1.0)
+    outcomes = [service.save_assessment(result_for(number)) for number in range(5)]
+    check("failed saves are deferred to the spool", outcomes == [SAVE_DEFERRED] * 5)
+    check("the circuit opened", service.mongo_breaker.state == OPEN)
+    spooled = len(service.fallback_path.read_text(encoding='utf-8').splitlines())
+    check("every deferred save is in the spool", spooled == 5)
+
+    time.sleep(0.25)
+    service.fault_injector.configure(error_rate=0.0)
+    check("the save after the outage succeeds", service.save_assessment(result_for(5)) is True)
+    check("the spool was replayed and removed",
+          service.assessments_collection.count_documents({}) == 6
+          and not service.fallback_path.exists() and not claimed.exists())
+    check("the circuit closed", service.mongo_breaker.state == CLOSED)
+
+    service.save_assessment(result_for(6))
+    service._replay_fallback()
+    check("later saves do not replay it again", service.assessments_collection.count_documents({}) == 7)
+    emails = [document['email'] for document in service.assessments_collection.find({})]
+    check("no assessment was stored twice", len(emails) == len(set(emails)))
+
+    # A replay that fails keeps its claimed file and is retried once, by the next successful save
+    service.fault_injector.configure(error_rate=1.0)
+    service.save_assessment(result_for(7))
+    service.mongo_breaker.reset()
+    service._replay_fallback()
+    check("a failed replay keeps the claimed spool", claimed.exists())
+    service.fault_injector.configure(error_rate=0.0)
+    service.save_assessment(result_for(8))
+    service.save_assessment(result_for(9))
+    check("the retried replay stores the spool exactly once",
+          service.assessments_collection.count_documents({}) == 10 and not claimed.exists())
+
+
+def check_duplicates():
+    """A resubmitted idempotency key hits the unique index and is not stored twice"""
+    print("\n↩️ Duplicate submissions")
+    service = ModelService()
+    first = service.save_assessment(result_for(20, idempotency_key='check-duplicate'))
+    failures_before = service.mongo_breaker.failures
+    second = service.save_assessment(result_for(20, idempotency_key='check-duplicate'))
+    check("both saves report success", first is True and second is True)
+    check("the assessment is stored once",
+          service.assessments_collection.count_documents({'idempotency_key': 'check-duplicate'}) == 1)
+    check("the duplicate does not count as a breaker failure",
+          service.mongo_breaker.failures == failures_before and service.mongo_breaker.state == CLOSED)
+    check("nothing was spooled", not service.fallback_path.exists())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.parse_args()
+
+    try:
+        check_breaker()
+        check_spool_replay()
+        check_duplicates()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        return 1
+    print("\n✅ All resilience checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
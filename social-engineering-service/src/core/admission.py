@@ -0,0 +1,148 @@
+"""
+Admission control for the assessment endpoints
+
+At most ``max_in_flight`` assessment requests run at once per worker; up to
+``max_queue`` more wait in FIFO order for a free slot, each for no longer than
+the queue deadline. Anything beyond that is rejected immediately (429 when
+the queue is full, 503 when the deadline passes) with a Retry-After hint, so
+latency stays bounded under spikes instead of growing with the backlog.
+Lightweight routes (/api/questions, /health) never pass through here and
+keep being served while assessments are throttled.
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List
+
+from config.settings import settings
+
+# Queue wait histogram bucket upper bounds in milliseconds (the last bucket is +Inf)
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and Retry-After"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """In-flight limit with a bounded, deadline-aware FIFO wait queue (event loop only)"""
+
+    def __init__(self, max_in_flight: int = 16, max_queue: int = 64,
+                 queue_timeout_ms: float = 2000, retry_after_seconds: int = 1):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.retry_after_seconds = retry_after_seconds
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    def _record_wait(self, wait_ms: float):
+        self.wait_counts[bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+        self.wait_sum_ms += wait_ms
+        self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    async def acquire(self):
+        if not self.enabled:
+            return
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            self._record_wait(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(
+                429, "Too many assessments in progress, please retry shortly", self.retry_after_seconds
+            )
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._waiters.remove(waiter)
+                waiter.cancel()
+                self.rejected_timeout += 1
+                raise AdmissionRejected(
+                    503, "Assessment queue wait exceeded its deadline, please retry", self.retry_after_seconds
+                )
+            # The slot was handed over just as the deadline fired - keep it
+        except asyncio.CancelledError:
+            # Client went away while queued: give up the place, or pass on a slot already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+                waiter.cancel()
+            raise
+        self.admitted += 1
+        self._record_wait((time.perf_counter() - started) * 1000)
+
+    def release(self):
+        if not self.enabled:
+            return
+        # Hand the slot straight to the oldest waiter so in_flight never drops below the backlog
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets: List[Dict[str, Any]] = []
+        for bound, count in zip(list(WAIT_BUCKETS_MS) + ['+Inf'], self.wait_counts):
+            cumulative += count
+            buckets.append({'le_ms': bound, 'count': cumulative})
+        return {
+            'enabled': self.enabled,
+            'max_in_flight': self.max_in_flight,
+            'max_queue': self.max_queue,
+            'queue_timeout_ms': self.queue_timeout * 1000,
+            'in_flight': self.in_flight,
+            'queued': len(self._waiters),
+            'admitted': self.admitted,
+            'rejected_queue_full': self.rejected_queue_full,
+            'rejected_timeout': self.rejected_timeout,
+            'queue_wait_mean_ms': round(self.wait_sum_ms / self.admitted, 3) if self.admitted else 0.0,
+            'queue_wait_max_ms': round(self.wait_max_ms, 3),
+            'queue_wait_histogram': buckets,
+        }
+
+
+# Global admission controller for the assessment endpoints
+admission = AdmissionController(
+    settings.ADMISSION_MAX_IN_FLIGHT,
+    settings.ADMISSION_MAX_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT_MS,
+    settings.ADMISSION_RETRY_AFTER_SECONDS
+)
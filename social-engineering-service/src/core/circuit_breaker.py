@@ -0,0 +1,164 @@
+"""
+Circuit breaker for the MongoDB data-access layer
+
+The breaker keeps a sliding window of recent call outcomes. Once enough
+calls in the window failed - or succeeded but took longer than the slow-call
+threshold - it opens, and every call fails fast with CircuitOpenError
+instead of each request paying a full server-selection timeout. After a
+cool-down it lets a few probe calls through (half-open): if they all
+succeed it closes again, if one fails it re-opens for another cool-down.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Type
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling through while the circuit is open"""
+
+
+class CircuitBreaker:
+    """Failure-rate and slow-call-rate circuit breaker with half-open probing (thread-safe)"""
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 5,
+                 failure_rate: float = 0.5, slow_call_ms: float = 1000, slow_call_rate: float = 0.8,
+                 open_seconds: float = 30, half_open_probes: int = 2,
+                 ignored_errors: Tuple[Type[BaseException], ...] = ()):
+        self.name = name
+        self.window_size = max(1, window_size)
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call_ms / 1000
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        # Errors that mean the backend answered (e.g. duplicate keys) and so do not count as failures
+        self.ignored_errors = ignored_errors
+        self.state = CLOSED
+        # (failed, slow) per call, most recent last
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=self.window_size)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+        self.last_failure: Optional[str] = None
+
+    def _open(self, reason: str):
+        # Caller holds the lock
+        if self.state != OPEN:
+            self.times_opened += 1
+            print(f"⚠️ Circuit '{self.name}' opened: {reason}")
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def trip(self, reason: str = 'tripped manually'):
+        """Open the circuit now, e.g. when the database is unreachable at startup"""
+        with self._lock:
+            self._open(reason)
+
+    def reset(self):
+        """Close the circuit and forget recent outcomes"""
+        with self._lock:
+            self.state = CLOSED
+            self._window.clear()
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; half-open admits a limited number of probes"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+                print(f"🔎 Circuit '{self.name}' half-open, probing")
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record(self, failed: bool, duration: float, error: Optional[BaseException] = None):
+        slow = not failed and duration >= self.slow_call
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+            self.slow_calls += slow
+            if failed:
+                self.last_failure = f"{type(error).__name__}: {error}" if error is not None else 'failed'
+
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or slow:
+                    self._open('probe failed' if failed else 'probe was slow')
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self.state = CLOSED
+                    self._window.clear()
+                    print(f"✅ Circuit '{self.name}' closed")
+                return
+            if self.state == OPEN:
+                # A call admitted before the circuit opened; it does not change the state
+                return
+
+            self._window.append((failed, slow))
+            if len(self._window) < self.min_calls:
+                return
+            failed_share = sum(outcome[0] for outcome in self._window) / len(self._window)
+            slow_share = sum(outcome[1] for outcome in self._window) / len(self._window)
+            if failed_share >= self.failure_rate:
+                self._open(f"{failed_share:.0%} of the last {len(self._window)} calls failed")
+            elif slow_share >= self.slow_call_rate:
+                self._open(f"{slow_share:.0%} of the last {len(self._window)} calls were slow")
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Call through the breaker; raises CircuitOpenError without calling while open"""
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except self.ignored_errors:
+            self.record(False, time.monotonic() - started)
+            raise
+        except Exception as e:
+            self.record(True, time.monotonic() - started, e)
+            raise
+        self.record(False, time.monotonic() - started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            window = list(self._window)
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1)
+            return {
+                'name': self.name,
+                'state': self.state,
+                'window_calls': len(window),
+                'window_failure_rate': round(sum(o[0] for o in window) / len(window), 4) if window else 0.0,
+                'window_slow_rate': round(sum(o[1] for o in window) / len(window), 4) if window else 0.0,
+                'calls': self.calls,
+                'failures': self.failures,
+                'slow_calls': self.slow_calls,
+                'short_circuited': self.short_circuited,
+                'times_opened': self.times_opened,
+                'probe_in_seconds': retry_in,
+                'last_failure': self.last_failure,
+            }
@@ -0,0 +1,234 @@
+"""
+Compiled, memory-mapped explanation store
+
+The JSON explanation bank is compiled once into a single read-only binary
+file made of a string table plus fixed-width index records keyed by
+(question id, option, gender, education, proficiency). Serving processes
+``mmap`` the file and only decode explanation text on lookup, so every
+worker on a host shares one page-cache copy and startup skips JSON parsing.
+
+File layout (little-endian):
+
+    header   magic, format version, symbol/record counts, section offsets,
+             16-byte digest of the source bank (used as the bank version)
+    symbols  (offset, length) pairs into the string table - the distinct
+             key values (question ids, options, profile values), sorted
+    records  fixed-width rows of symbol ids + source ordinal + text span,
+             sorted by key so a (question, option) range is found by bisect
+    strings  UTF-8 string table holding symbols and explanation texts
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+MAGIC = b"EXPB"
+FORMAT_VERSION = 1
+
+# magic, version, reserved, n_symbols, n_records, symbols_off, records_off, strings_off, digest
+_HEADER = struct.Struct("<4sHHIIIII16s")
+# offset, length into the string table
+_SYMBOL = struct.Struct("<II")
+# qid, option, gender, education, proficiency (symbol ids), pad, ordinal, text offset, text length
+_RECORD = struct.Struct("<5HxxIII")
+
+_QUESTION_ID_RE = re.compile(r"^(?:q|map)0*(\d+)$", re.IGNORECASE)
+
+PathLike = Union[str, Path]
+
+
+def canonical_question_id(question_id: str) -> str:
+    """Normalize question ids so Q01, Q1, q1 and map1 all map to Q1"""
+    match = _QUESTION_ID_RE.match((question_id or "").strip())
+    if match:
+        return f"Q{int(match.group(1))}"
+    return question_id
+
+
+def canonical_proficiency(proficiency: str) -> str:
+    """Normalize proficiency values to the explanation bank vocabulary"""
+    if proficiency in ['School', 'school']:
+        return 'School'
+    if proficiency in ['High', 'High Education', 'high', 'high education']:
+        return 'High'
+    return proficiency
+
+
+def _bank_key(entry: Dict) -> Tuple[str, str, str, str, str]:
+    profile = entry.get('profile', {}) or {}
+    return (
+        canonical_question_id(str(entry.get('questionId', ''))),
+        str(entry.get('option', '')),
+        str(profile.get('gender', '')),
+        str(profile.get('education', '')),
+        canonical_proficiency(str(profile.get('proficiency', ''))),
+    )
+
+
+def compile_explanation_bank(source_path: PathLike, target_path: PathLike) -> int:
+    """
+    Compile a JSON explanation bank into the binary store format.
+
+    The file is written next to the target and atomically renamed into place,
+    so concurrently starting workers never observe a partial store.
+    Returns the number of compiled records.
+    """
+    source_path = Path(source_path)
+    target_path = Path(target_path)
+
+    raw = source_path.read_bytes()
+    bank = json.loads(raw.decode('utf-8'))
+    digest = hashlib.blake2b(raw, digest_size=16).digest()
+
+    entries = [(_bank_key(entry), ordinal, entry.get('explanation', '') or '')
+               for ordinal, entry in enumerate(bank)]
+
+    symbols = sorted({value for key, _, _ in entries for value in key})
+    symbol_ids = {value: idx for idx, value in enumerate(symbols)}
+
+    strings = bytearray()
+    symbol_spans = []
+    for value in symbols:
+        encoded = value.encode('utf-8')
+        symbol_spans.append((len(strings), len(encoded)))
+        strings += encoded
+
+    records = []
+    for key, ordinal, text in entries:
+        encoded = text.encode('utf-8')
+        records.append((tuple(symbol_ids[v] for v in key), ordinal, len(strings), len(encoded)))
+        strings += encoded
+    records.sort(key=lambda r: (r[0], r[1]))
+
+    symbols_off = _HEADER.size
+    records_off = symbols_off + _SYMBOL.size * len(symbols)
+    strings_off = records_off + _RECORD.size * len(records)
+
+    buf = bytearray(strings_off)
+    _HEADER.pack_into(buf, 0, MAGIC, FORMAT_VERSION, 0, len(symbols), len(records),
+                      symbols_off, records_off, strings_off, digest)
+    for idx, span in enumerate(symbol_spans):
+        _SYMBOL.pack_into(buf, symbols_off + idx * _SYMBOL.size, *span)
+    for idx, (key, ordinal, offset, length) in enumerate(records):
+        _RECORD.pack_into(buf, records_off + idx * _RECORD.size, *key, ordinal, offset, length)
+    buf += strings
+
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target_path.with_name(f"{target_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(buf)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, target_path)
+    return len(records)
+
+
+class ExplanationStore:
+    """Read-only, memory-mapped view over a compiled explanation bank"""
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, _, n_symbols, n_records,
+         symbols_off, records_off, strings_off, digest) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"Unsupported explanation store format: {self.path}")
+
+        self._n_records = n_records
+        self._records_off = records_off
+        self._strings_off = strings_off
+        self.version = digest.hex()
+
+        # Only the small key vocabulary is decoded eagerly; texts stay in the map
+        self._symbol_ids: Dict[str, int] = {}
+        for idx in range(n_symbols):
+            offset, length = _SYMBOL.unpack_from(self._mm, symbols_off + idx * _SYMBOL.size)
+            self._symbol_ids[self._decode(offset, length)] = idx
+
+    def __len__(self) -> int:
+        return self._n_records
+
+    def close(self):
+        self._mm.close()
+
+    def _decode(self, offset: int, length: int) -> str:
+        start = self._strings_off + offset
+        return self._mm[start:start + length].decode('utf-8')
+
+    def _record(self, idx: int) -> Tuple:
+        return _RECORD.unpack_from(self._mm, self._records_off + idx * _RECORD.size)
+
+    def _lower_bound(self, qid: int, option: int) -> int:
+        lo, hi = 0, self._n_records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[:2] < (qid, option):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, question_id: str, option: str, gender: Optional[str] = None,
+               education: Optional[str] = None, proficiency: Optional[str] = None) -> Optional[str]:
+        """
+        Find the explanation for a question option, preferring the closest profile.
+
+        Matches the full profile first, then gender + education, then any
+        profile; ties go to the entry that came first in the source bank.
+        """
+        qid = self._symbol_ids.get(canonical_question_id(question_id))
+        opt = self._symbol_ids.get(option)
+        if qid is None or opt is None:
+            return None
+
+        wanted = (
+            self._symbol_ids.get(gender),
+            self._symbol_ids.get(education),
+            self._symbol_ids.get(canonical_proficiency(proficiency) if proficiency else None),
+        )
+
+        best = None
+        idx = self._lower_bound(qid, opt)
+        while idx < self._n_records:
+            record = self._record(idx)
+            if record[:2] != (qid, opt):
+                break
+            if record[2:5] == wanted:
+                tier = 0
+            elif record[2:4] == wanted[:2]:
+                tier = 1
+            else:
+                tier = 2
+            rank = (tier, record[5])
+            if best is None or rank < best[0]:
+                best = (rank, record[6], record[7])
+            idx += 1
+
+        if best is None:
+            return None
+        return self._decode(best[1], best[2])
+
+
+def open_explanation_store(source_path: PathLike, store_path: PathLike) -> ExplanationStore:
+    """
+    Open the compiled store, (re)building it when the JSON bank is newer.
+
+    Raises FileNotFoundError when neither the store nor the source bank exist.
+    """
+    source_path = Path(source_path)
+    store_path = Path(store_path)
+
+    if source_path.exists():
+        if not store_path.exists() or store_path.stat().st_mtime < source_path.stat().st_mtime:
+            compile_explanation_bank(source_path, store_path)
+    elif not store_path.exists():
+        raise FileNotFoundError(f"Explanation bank not found: {source_path}")
+
+    return ExplanationStore(store_path)
@@ -0,0 +1,108 @@
+"""
+Idempotent assessment submissions
+
+A submission is identified by the client's Idempotency-Key header (scoped to
+the user's email) or, without one, by a fingerprint of the profile and
+answers within a time window. The first request with a key computes and
+saves the result; repeats within the TTL get that stored result back
+without grading again or inserting a second document. Duplicates that
+arrive while the first is still running wait for it instead of starting
+their own. Results live in a cache with a disk tier shared by every worker,
+and the key is stored on the MongoDB document under a unique index, so a
+duplicate that still slips through on another worker is rejected there.
+Only results whose save went through are kept: a retry of a failed or
+deferred save is graded again, and the unique index still stores it once.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.core.cache import TieredCache, cache_key
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an Idempotency-Key is reused for a different submission"""
+
+
+def submission_fingerprint(user_profile: Dict, answers: Iterable[Tuple]) -> str:
+    """Content hash of a profile (email case-insensitive) and its answers"""
+    profile = dict(user_profile, email=str(user_profile.get('email', '')).strip().lower())
+    return cache_key(json.dumps([profile, list(answers)], sort_keys=True, ensure_ascii=False, default=str))
+
+
+class IdempotencyGuard:
+    """Single-flight per process plus a TTL result cache shared through the cache's disk tier"""
+
+    def __init__(self, cache: TieredCache, window_seconds: float = 60):
+        self.cache = cache
+        self.window_seconds = max(1.0, window_seconds)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.computed = 0
+        self.replayed = 0
+        self.joined = 0
+        self.conflicts = 0
+
+    def keys(self, email: str, fingerprint: str, client_key: Optional[str] = None) -> List[str]:
+        """Keys to look a submission up by; the first is the one its result is stored under"""
+        email = email.strip().lower()
+        if client_key:
+            return [cache_key('client', email, client_key.strip())]
+        # Also match the previous window so a retry just after a window boundary is still caught
+        bucket = int(time.time() // self.window_seconds)
+        return [cache_key('derived', fingerprint, bucket), cache_key('derived', fingerprint, bucket - 1)]
+
+    def _replay(self, stored: Dict, fingerprint: str) -> Any:
+        if stored['fingerprint'] != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict("Idempotency-Key was already used for a different submission")
+        self.replayed += 1
+        return stored['result']
+
+    async def run(self, keys: List[str], fingerprint: str, compute: Callable[[str], Awaitable[Any]],
+                  cacheable: Callable[[Any], bool] = lambda result: True) -> Tuple[Any, bool]:
+        """
+        Return ``(result, replayed)`` for a submission.
+
+        ``compute`` receives the idempotency key to store with the result and
+        must return something JSON-serializable. A result ``cacheable`` rejects
+        is still shared with duplicates already waiting for it, but not kept
+        for later ones.
+        """
+        for key in keys:
+            stored = self.cache.get(key)
+            if stored is not None:
+                return self._replay(stored, fingerprint), True
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.joined += 1
+                stored = await asyncio.shield(future)
+                if stored is not None:
+                    return self._replay(stored, fingerprint), True
+                # The first attempt failed; compute it here instead
+                break
+
+        key = keys[0]
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        stored = None
+        try:
+            result = await compute(key)
+            stored = {'fingerprint': fingerprint, 'result': result}
+            if cacheable(result):
+                self.cache.put(key, stored)
+            self.computed += 1
+            return result, False
+        finally:
+            self._in_flight.pop(key, None)
+            future.set_result(stored)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'window_seconds': self.window_seconds,
+            'in_flight': len(self._in_flight),
+            'computed': self.computed,
+            'replayed': self.replayed,
+            'joined_in_flight': self.joined,
+            'conflicts': self.conflicts,
+        }